@@ -0,0 +1,279 @@
+"""
+bench_core.py
+Core Data Path Benchmarks
+=========================
+This module benchmarks the data paths that run on the kiosks: session persistence in
+`exercise_data_manager`, history previews, feedback updates, heart-rate ingestion through
+`HeartRateCollector._notify_listeners`, the per-tick cost of both simulators (including the
+vectorized multi-lane treadmill batch and lock-free snapshot reads) and pre-generating
+multi-lane sessions with the physiological heart-rate model.
+All file benchmarks run against a temporary data folder filled by a synthetic data
+generator, so the real `data/` folder is never touched. Session length, history size and
+listener count are configurable.
+Results are written as JSON and can be compared against a stored baseline; the run exits
+with status 1 when any benchmark's median is slower than the baseline by more than the
+allowed threshold. Record a baseline on the target hardware with `--save-baseline`:
+    python -m benchmarks.bench_core --save-baseline
+    python -m benchmarks.bench_core --baseline benchmarks/baseline.json
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from core import exercise_data_manager
+from core.exercise_data_manager import (
+    save_exercise_data,
+    load_exercise_data,
+    get_history_record_previews,
+    update_exercise_data_feedback,
+)
+from core.heart_rate_collector import HeartRateCollector, HeartRateListener
+from core.session_store import CsvSessionStore, SqliteSessionStore
+from simulator.heart_rate_model import HeartRateModel
+from simulator.heart_rate_simulator import HeartRateSimulator
+from simulator.treadmill_simulator import TreadmillSimulator, TreadmillSimulatorBatch
+
+DEFAULT_BASELINE_PATH = os.path.join("benchmarks", "baseline.json")
+DEFAULT_OUTPUT_PATH = os.path.join("benchmarks", "results", "latest.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def generate_session_data(session_seconds, seed=0):
+    """生成一段随机游走的心率数据，格式与 HeartRateCollector.get_session_data() 相同"""
+    rng = random.Random(seed)
+    heart_rate = 90
+    session_data = []
+    for second in range(session_seconds):
+        heart_rate = min(200, max(60, heart_rate + rng.randint(-3, 4)))
+        session_data.append((float(second), heart_rate))
+    return session_data
+
+
+def generate_history(store, history_size, session_seconds, seed=0):
+    """向存储中写入 history_size 条合成会话，返回文件名列表"""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1, 8, 0, 0)
+    filenames = []
+    for index in range(history_size):
+        started_at = start + datetime.timedelta(minutes=37 * index)
+        filename = f"heart_rate_log_{started_at.strftime('%Y%m%d-%H%M%S')}.csv"
+        session_data = generate_session_data(session_seconds, seed=seed + index)
+        store.save(filename, session_data, str(rng.randint(2, 10)), 200.0, rng.randint(18, 70),
+                   session_seconds, session_seconds // 60, session_seconds * 2.2, rng.choice(["", "舒适", "一般"]))
+        filenames.append(filename)
+    return filenames
+
+
+def measure(function, repeats, operations=1):
+    """运行 repeats 次，返回每次操作耗时（秒）的统计"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) / operations)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "mean_s": statistics.fmean(samples),
+        "repeats": repeats,
+        "operations": operations,
+    }
+
+
+class _NullListener(HeartRateListener):
+    def on_heart_rate_received(self, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate):
+        pass
+
+
+def run_benchmarks(session_seconds, history_size, listener_count, repeats):
+    results = {}
+    original_data_folder = exercise_data_manager.DATA_FOLDER
+    with tempfile.TemporaryDirectory() as temp_folder:
+        exercise_data_manager.DATA_FOLDER = temp_folder
+        try:
+            session_data = generate_session_data(session_seconds)
+            filename = "heart_rate_log_20250101-070000.csv"
+
+            results["save_exercise_data"] = measure(
+                lambda: save_exercise_data(filename, session_data, "5", 200.0, 30, session_seconds, 10, 2000.0), repeats)
+            results["load_exercise_data"] = measure(lambda: load_exercise_data(filename), repeats)
+            results["update_exercise_data_feedback"] = measure(lambda: update_exercise_data_feedback(filename, "舒适"), repeats)
+
+            csv_store = CsvSessionStore()
+            csv_store.save(filename, session_data, "5", 200.0, 30, session_seconds, 10, 2000.0)
+
+            def load_and_release_samples():
+                csv_store.load_samples(filename).close()
+
+            results["load_samples_mmap"] = measure(load_and_release_samples, repeats)
+
+            generate_history(csv_store, history_size, session_seconds)
+            results["get_history_record_previews"] = measure(get_history_record_previews, repeats)
+
+            sqlite_store = SqliteSessionStore(os.path.join(temp_folder, "bench.db"))
+            try:
+                sqlite_filenames = generate_history(sqlite_store, history_size, session_seconds)
+                results["sqlite_preview"] = measure(sqlite_store.preview, repeats)
+                results["sqlite_load"] = measure(lambda: sqlite_store.load(sqlite_filenames[0]), repeats)
+            finally:
+                sqlite_store.close()
+        finally:
+            exercise_data_manager.DATA_FOLDER = original_data_folder
+
+    heart_rates = [heart_rate for _, heart_rate in generate_session_data(session_seconds)]
+
+    def ingest_session():
+        collector = HeartRateCollector()
+        for _ in range(listener_count):
+            collector.add_listener(_NullListener())
+        for heart_rate in heart_rates:
+            collector._notify_listeners(heart_rate)
+
+    results[f"collector_ingest_{listener_count}_listeners"] = measure(ingest_session, repeats, operations=len(heart_rates))
+
+    tick_count = 10000
+    treadmill = TreadmillSimulator(initial_speed=8.0)
+
+    def treadmill_ticks():
+        for _ in range(tick_count):
+            treadmill._tick(time.time())
+
+    results["treadmill_simulator_tick"] = measure(treadmill_ticks, repeats, operations=tick_count)
+
+    def treadmill_snapshot_reads():
+        for _ in range(tick_count):
+            treadmill.get_distance_covered()
+
+    results["treadmill_snapshot_read"] = measure(treadmill_snapshot_reads, repeats, operations=tick_count)
+
+    batch_lane_count = 100
+    treadmill_batch = TreadmillSimulatorBatch(batch_lane_count, initial_speed=8.0)
+
+    def treadmill_batch_ticks():
+        for _ in range(tick_count):
+            treadmill_batch.advance(time.time())
+
+    # 按跑道计的单次推进耗时，可与 treadmill_simulator_tick 直接比较
+    results[f"treadmill_batch_tick_{batch_lane_count}_lanes"] = measure(
+        treadmill_batch_ticks, repeats, operations=tick_count * batch_lane_count)
+
+    heart_rate_simulator = HeartRateSimulator(HeartRateCollector())
+    heart_rate_simulator.set_rate_range((130, 150))
+
+    def heart_rate_ticks():
+        for _ in range(tick_count):
+            heart_rate_simulator._tick()
+
+    results["heart_rate_simulator_tick"] = measure(heart_rate_ticks, repeats, operations=tick_count)
+
+    model_simulator = HeartRateSimulator(HeartRateCollector(), seed=0)
+    model_simulator.follow_speed(treadmill, age=40)
+
+    def heart_rate_model_ticks():
+        for _ in range(tick_count):
+            model_simulator._tick()
+
+    results["heart_rate_model_tick"] = measure(heart_rate_model_ticks, repeats, operations=tick_count)
+
+    lane_count = 100
+    speed_profile = [8.0] * session_seconds
+
+    def generate_lanes():
+        HeartRateModel([40] * lane_count, seed=0).generate(speed_profile)
+
+    results[f"heart_rate_model_generate_{lane_count}_lanes"] = measure(generate_lanes, repeats, operations=lane_count * session_seconds)
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """返回 (名称, 当前中位数, 基线中位数, 比值) 列表中超出阈值的回归项"""
+    regressions = []
+    for name, result in results.items():
+        baseline_result = baseline.get("results", {}).get(name)
+        if not baseline_result or not baseline_result.get("median_s"):
+            continue
+        ratio = result["median_s"] / baseline_result["median_s"]
+        result["baseline_ratio"] = ratio
+        if ratio > 1 + threshold:
+            regressions.append((name, result["median_s"], baseline_result["median_s"], ratio))
+    return regressions
+
+
+def write_json(path, content):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(content, f, indent=4, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="核心数据路径性能基准测试")
+    parser.add_argument("--session-seconds", type=int, default=3600, help="合成会话时长（秒）")
+    parser.add_argument("--history-size", type=int, default=200, help="合成历史记录数量")
+    parser.add_argument("--listeners", type=int, default=4, help="心率监听器数量")
+    parser.add_argument("--repeats", type=int, default=5, help="每项测试重复次数")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="基线 JSON 路径")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的相对变慢比例")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    args = parser.parse_args(argv)
+
+    parameters = {
+        "session_seconds": args.session_seconds,
+        "history_size": args.history_size,
+        "listeners": args.listeners,
+        "repeats": args.repeats,
+    }
+    results = run_benchmarks(args.session_seconds, args.history_size, args.listeners, args.repeats)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "parameters": parameters,
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("parameters") != parameters:
+            print("警告: 基线使用的参数与本次不同，比较结果仅供参考。")
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+
+    for name, result in results.items():
+        ratio_text = f"  x{result['baseline_ratio']:.2f}" if "baseline_ratio" in result else ""
+        print(f"{name:<40} {result['median_s'] * 1e6:>12.2f} us{ratio_text}")
+
+    write_json(args.output, report)
+    if args.save_baseline:
+        write_json(args.baseline, report)
+        print(f"基线已保存到: {args.baseline}")
+
+    if regressions:
+        print("\n性能回归:")
+        for name, current, baseline_median, ratio in regressions:
+            print(f"  {name}: {current * 1e6:.2f} us (基线 {baseline_median * 1e6:.2f} us, x{ratio:.2f})")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,10 +5,15 @@ Exercise Data Management Module
 This module provides functionalities to save, load, and manage exercise session data, 
 including saving data to CSV files, loading data from CSV files, and generating 
 previews of historical exercise records for display in user interfaces.
+Each CSV row is one heart-rate sample. `Second` is the 1-based sample number and
+`Elapsed(seconds)` the time of the sample in seconds since the session start, as recorded by
+the collector. `read_session_samples` returns the samples on that time axis; sessions saved
+before the `Elapsed(seconds)` column existed fall back to `Second`, which counts seconds at
+the sensor's 1 Hz rate.
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-10
-Last Modified: 2025-03-17
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -19,22 +24,30 @@ import time
 import datetime
 
 DATA_FOLDER = "data"
+ELAPSED_COLUMN = "Elapsed(seconds)"
 
 def save_exercise_data(filename, session_data, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback=""):
     if not os.path.exists(DATA_FOLDER):
         os.makedirs(DATA_FOLDER)
     filepath = os.path.join(DATA_FOLDER, filename)
+    temp_filepath = filepath + ".tmp"
     try:
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile: 
+        # 先写入临时文件并落盘，再原子替换，避免写入中途断电损坏记录
+        with open(temp_filepath, 'w', newline='', encoding='utf-8') as csvfile: 
             csv_writer = csv.writer(csvfile)
-            csv_writer.writerow(["Second", "HeartRate", "Level", "LapDistance", "Age", "Duration(seconds)", "Laps", "Distance(meters)", "Feedback"]) 
+            csv_writer.writerow(["Second", "HeartRate", "Level", "LapDistance", "Age", "Duration(seconds)", "Laps", "Distance(meters)", "Feedback", ELAPSED_COLUMN]) 
             elapsed_seconds = 0
             for timestamp, heart_rate in session_data:
                 elapsed_seconds += 1
-                csv_writer.writerow([elapsed_seconds, heart_rate, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback]) 
+                csv_writer.writerow([elapsed_seconds, heart_rate, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback, round(timestamp, 3)]) 
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        os.replace(temp_filepath, filepath)
         # print(f"运动数据成功保存到: {filepath}")
+        return True
     except Exception as e:
         print(f"保存运动数据到 CSV 文件时出错: {e}")
+        return False
 
 
 def load_exercise_data(filename):
@@ -56,6 +69,31 @@ def load_exercise_data(filename):
         return None
 
 
+def read_session_samples(csvfile):
+    """返回 (时间戳列表, 心率列表)，时间戳为相对会话开始的秒数"""
+    csv_reader = csv.reader(csvfile)
+    header = next(csv_reader, None)
+    if not header or "HeartRate" not in header:
+        raise ValueError("缺少 HeartRate 列")
+    heart_rate_index = header.index("HeartRate")
+    elapsed_index = header.index(ELAPSED_COLUMN) if ELAPSED_COLUMN in header else -1
+    second_index = header.index("Second") if "Second" in header else -1
+    timestamps = []
+    heart_rates = []
+    for row in csv_reader:
+        if not row:
+            continue
+        # 早期记录没有 Elapsed(seconds) 列，使用按 1 Hz 计数的 Second 列
+        if elapsed_index != -1 and len(row) > elapsed_index and row[elapsed_index] != "":
+            timestamps.append(float(row[elapsed_index]))
+        elif second_index != -1:
+            timestamps.append(float(row[second_index]))
+        else:
+            timestamps.append(float(len(timestamps) + 1))
+        heart_rates.append(int(float(row[heart_rate_index])))
+    return timestamps, heart_rates
+
+
 def get_history_record_previews():
     if not os.path.exists(DATA_FOLDER):
         return []
@@ -66,55 +104,68 @@ def get_history_record_previews():
         filepath = os.path.join(DATA_FOLDER, filename)
         try:
             with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-                csv_reader = csv.reader(csvfile)
-                header = next(csv_reader)
-                first_data_row = next(csv_reader, None)
-                if first_data_row:
-                    level_index = header.index("Level") if "Level" in header else -1
-                    lap_distance_index = header.index("LapDistance") if "LapDistance" in header else -1
-                    age_index = header.index("Age") if "Age" in header else -1
-                    duration_index = header.index("Duration(seconds)") if "Duration(seconds)" in header else -1
-                    distance_index = header.index("Distance(meters)") if "Distance(meters)" in header else -1
-                    feedback_index = header.index("Feedback") if "Feedback" in header else -1
-
-                    level = first_data_row[level_index] if level_index != -1 and len(first_data_row) > level_index else "N/A"
-                    lap_distance = first_data_row[lap_distance_index] if lap_distance_index != -1 and len(first_data_row) > lap_distance_index else "N/A"
-                    age = first_data_row[age_index] if age_index != -1 and len(first_data_row) > age_index else "N/A"
-                    duration_seconds = first_data_row[duration_index] if duration_index != -1 and len(first_data_row) > duration_index else "N/A"
-                    exercise_distance = first_data_row[distance_index] if distance_index != -1 and len(first_data_row) > distance_index else "N/A"
-                    feedback = first_data_row[feedback_index] if feedback_index != -1 and len(first_data_row) > feedback_index else ""
-
-                    datetime_str_from_filename = filename[len("heart_rate_log_"): -len(".csv")]
-                    try:
-                        datetime_obj = datetime.datetime.strptime(datetime_str_from_filename, "%Y%m%d-%H%M%S")
-                        formatted_datetime = datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        formatted_datetime = "日期时间解析失败"
-
-                    preview_data.append({
-                        "filename": filename,
-                        "datetime": formatted_datetime,
-                        "level": level,
-                        "lap_distance": lap_distance,
-                        "age": age,
-                        "duration_seconds": duration_seconds,
-                        "exercise_distance": exercise_distance,
-                        "feedback": feedback, 
-                    })
+                preview = read_history_record_preview(filename, csvfile)
+                if preview:
+                    preview_data.append(preview)
         except Exception as e:
             print(f"读取文件 {filename} 预览信息时出错: {e}")
 
-    def get_datetime_from_filename(item):
-        filename_datetime_str = item['filename'][len("heart_rate_log_"): -len(".csv")]
-        try:
-            return datetime.datetime.strptime(filename_datetime_str, "%Y%m%d-%H%M%S")
-        except ValueError:
-            return datetime.datetime.min
-
     preview_data_sorted = sorted(preview_data, key=get_datetime_from_filename, reverse=True)
     return preview_data_sorted
 
 
+def read_history_record_preview(filename, csvfile):
+    csv_reader = csv.reader(csvfile)
+    header = next(csv_reader)
+    first_data_row = next(csv_reader, None)
+    if not first_data_row:
+        return None
+    level_index = header.index("Level") if "Level" in header else -1
+    lap_distance_index = header.index("LapDistance") if "LapDistance" in header else -1
+    age_index = header.index("Age") if "Age" in header else -1
+    duration_index = header.index("Duration(seconds)") if "Duration(seconds)" in header else -1
+    distance_index = header.index("Distance(meters)") if "Distance(meters)" in header else -1
+    feedback_index = header.index("Feedback") if "Feedback" in header else -1
+
+    level = first_data_row[level_index] if level_index != -1 and len(first_data_row) > level_index else "N/A"
+    lap_distance = first_data_row[lap_distance_index] if lap_distance_index != -1 and len(first_data_row) > lap_distance_index else "N/A"
+    age = first_data_row[age_index] if age_index != -1 and len(first_data_row) > age_index else "N/A"
+    duration_seconds = first_data_row[duration_index] if duration_index != -1 and len(first_data_row) > duration_index else "N/A"
+    exercise_distance = first_data_row[distance_index] if distance_index != -1 and len(first_data_row) > distance_index else "N/A"
+    feedback = first_data_row[feedback_index] if feedback_index != -1 and len(first_data_row) > feedback_index else ""
+
+    datetime_str_from_filename = filename[len("heart_rate_log_"): -len(".csv")]
+    try:
+        datetime_obj = datetime.datetime.strptime(datetime_str_from_filename, "%Y%m%d-%H%M%S")
+        formatted_datetime = datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        formatted_datetime = "日期时间解析失败"
+
+    return {
+        "filename": filename,
+        "datetime": formatted_datetime,
+        "level": level,
+        "lap_distance": lap_distance,
+        "age": age,
+        "duration_seconds": duration_seconds,
+        "exercise_distance": exercise_distance,
+        "feedback": feedback, 
+    }
+
+
+def get_datetime_from_filename(item):
+    filename_datetime_str = item['filename'][len("heart_rate_log_"): -len(".csv")]
+    try:
+        return datetime.datetime.strptime(filename_datetime_str, "%Y%m%d-%H%M%S")
+    except ValueError:
+        return datetime.datetime.min
+
+
+def delete_exercise_data(filename):
+    filepath = os.path.join(DATA_FOLDER, filename)
+    os.remove(filepath)
+
+
 def update_exercise_data_feedback(filename, feedback_text):
 
     filepath = os.path.join(DATA_FOLDER, filename)
@@ -144,10 +195,14 @@ def update_exercise_data_feedback(filename, feedback_text):
         print(f"读取文件 {filename} 时出错: {e}")
         return
 
+    temp_filepath = filepath + ".tmp"
     try:
-        with open(filepath, 'w', newline='', encoding='utf-8') as outfile:
+        with open(temp_filepath, 'w', newline='', encoding='utf-8') as outfile:
             csv_writer = csv.writer(outfile)
             csv_writer.writerows(updated_rows) 
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(temp_filepath, filepath)
         # print(f"文件 {filename} 的反馈信息已更新为: {feedback_text}")
     except Exception as e:
         print(f"写入文件 {filename} 时出错: {e}")
@@ -0,0 +1,205 @@
+"""
+heart_rate_analytics.py
+Heart Rate Analytics Module
+===========================
+This module computes per-session heart-rate analytics with NumPy. All statistics are
+derived from the session's sample arrays in a single vectorized pass, so the cost does not
+depend on Python-level loops over the samples:
+- Time spent in each heart-rate zone, using either percentage-of-max zones or Karvonen
+  (heart-rate reserve) zones when a resting heart rate is known.
+- A rolling average over a configurable time window and its peak.
+- Cardiac drift: change of the mean heart rate between the first and second half of the
+  session, and the linear trend in bpm per minute.
+- Heart-rate recovery (HRR) 1 and 2 minutes after the end of exercise, when samples after
+  the end of exercise are available.
+- Lap-aligned statistics when lap end times are known.
+Zero readings (sensor stopped or disconnected) are excluded from all statistics.
+`get_session_analytics` returns the scalar summary of a session and caches it in the
+history index of the session store, so the history window only computes it once.
+Sessions are saved when the exercise stops, before the recovery samples arrive, so the
+HRR values measured afterwards (`recovery_measurement`) are read from the store and
+filled in when the samples themselves cannot provide them. Lap-level statistics come from
+the lap segments the controller recorded with the session (`lap_records`) rather than
+from the samples.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import numpy as np
+
+from core.lap_records import summarize_laps
+
+ANALYTICS_VERSION = 1
+ZONE_FRACTIONS = (0.5, 0.6, 0.7, 0.8, 0.9)
+ZONE_NAMES = ("低于区间1", "区间1 热身", "区间2 燃脂", "区间3 有氧", "区间4 无氧", "区间5 极限")
+DEFAULT_ROLLING_WINDOW_SECONDS = 30
+MAX_SAMPLE_GAP_SECONDS = 5.0
+
+
+def get_max_heart_rate(age):
+    return 220 - age
+
+
+def get_zone_bounds(age, resting_heart_rate=None):
+    """返回各区间下限 (bpm)；提供静息心率时使用 Karvonen 储备心率法"""
+    max_heart_rate = get_max_heart_rate(age)
+    fractions = np.asarray(ZONE_FRACTIONS)
+    if resting_heart_rate:
+        return resting_heart_rate + fractions * (max_heart_rate - resting_heart_rate)
+    return fractions * max_heart_rate
+
+
+def compute_session_analytics(timestamps, heart_rates, age, resting_heart_rate=None, lap_end_times=None,
+                              exercise_end_time=None, rolling_window_seconds=DEFAULT_ROLLING_WINDOW_SECONDS):
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    heart_rates = np.asarray(heart_rates, dtype=np.float64)
+    valid = heart_rates > 0
+    analytics = {
+        "version": ANALYTICS_VERSION,
+        "sample_count": int(valid.sum()),
+        "zone_method": "karvonen" if resting_heart_rate else "percentage",
+    }
+    if not valid.any():
+        return analytics
+
+    if exercise_end_time is None:
+        exercise_end_time = timestamps[-1]
+    in_exercise = timestamps <= exercise_end_time
+    exercise_valid = valid & in_exercise
+    exercise_times = timestamps[exercise_valid]
+    exercise_rates = heart_rates[exercise_valid]
+    if exercise_rates.size == 0:
+        return analytics
+
+    # 每个采样代表到下一个采样为止的时间，断线造成的长间隔按上限截断
+    sample_step = float(np.median(np.diff(timestamps))) if timestamps.size > 1 else 1.0
+    durations = np.diff(timestamps, append=timestamps[-1] + sample_step)
+    durations = np.clip(durations, 0.0, MAX_SAMPLE_GAP_SECONDS)[exercise_valid]
+
+    zone_bounds = get_zone_bounds(age, resting_heart_rate)
+    zone_indices = np.digitize(exercise_rates, zone_bounds)
+    time_in_zone = np.bincount(zone_indices, weights=durations, minlength=len(zone_bounds) + 1)
+
+    window = max(1, int(round(rolling_window_seconds / sample_step))) if sample_step > 0 else 1
+    rolling_average = _rolling_mean(exercise_rates, window)
+
+    half_time = (exercise_times[0] + exercise_times[-1]) / 2
+    first_half = exercise_rates[exercise_times <= half_time]
+    second_half = exercise_rates[exercise_times > half_time]
+    drift_percent = None
+    if first_half.size and second_half.size:
+        drift_percent = float((second_half.mean() - first_half.mean()) / first_half.mean() * 100)
+    drift_slope = None
+    if exercise_rates.size > 1 and exercise_times[-1] > exercise_times[0]:
+        drift_slope = float(np.polyfit(exercise_times / 60.0, exercise_rates, 1)[0])
+
+    analytics.update({
+        "duration_seconds": float(durations.sum()),
+        "average": float(exercise_rates.mean()),
+        "max": int(exercise_rates.max()),
+        "min": int(exercise_rates.min()),
+        "zone_bounds": [float(bound) for bound in zone_bounds],
+        "time_in_zone_seconds": [float(seconds) for seconds in time_in_zone],
+        "rolling_window_seconds": rolling_window_seconds,
+        "rolling_average": rolling_average,
+        "rolling_average_times": exercise_times,
+        "peak_rolling_average": float(rolling_average.max()),
+        "drift_percent": drift_percent,
+        "drift_slope_bpm_per_min": drift_slope,
+        "hrr_60": _heart_rate_recovery(timestamps[valid], heart_rates[valid], exercise_end_time, 60),
+        "hrr_120": _heart_rate_recovery(timestamps[valid], heart_rates[valid], exercise_end_time, 120),
+        "laps": _lap_statistics(exercise_times, exercise_rates, lap_end_times),
+    })
+    return analytics
+
+
+def summarize_for_index(analytics):
+    """去掉数组字段，得到可写入历史索引的 JSON 摘要"""
+    return {key: value for key, value in analytics.items() if not isinstance(value, np.ndarray)}
+
+
+def get_session_analytics(session_store, filename, age, resting_heart_rate=None):
+    cached = session_store.load_cached_analytics(filename)
+    if cached and cached.get("version") == ANALYTICS_VERSION and cached.get("resting_heart_rate") == resting_heart_rate:
+        return _with_session_records(session_store, filename, cached)
+    session_samples = session_store.load_samples(filename)
+    if session_samples is None:
+        return None
+    try:
+        timestamps, heart_rates = session_samples.as_arrays()
+        summary = summarize_for_index(compute_session_analytics(timestamps, heart_rates, age, resting_heart_rate))
+    finally:
+        session_samples.close()
+    summary["resting_heart_rate"] = resting_heart_rate
+    session_store.save_cached_analytics(filename, summary)
+    return _with_session_records(session_store, filename, summary)
+
+
+def _with_session_records(session_store, filename, summary):
+    # 恢复数据与圈程记录由控制器单独写入 (恢复数据在会话保存之后)，不放进分析缓存，每次读取时合并
+    summary = dict(summary)
+    laps = session_store.load_laps(filename)
+    if laps:
+        summary["laps"] = laps
+        summary["lap_summary"] = summarize_laps(laps)
+    if summary.get("hrr_60") is not None and summary.get("hrr_120") is not None:
+        return summary
+    recovery = session_store.load_recovery(filename)
+    if not recovery:
+        return summary
+    for key in ("hrr_60", "hrr_120"):
+        if summary.get(key) is None:
+            summary[key] = recovery.get(key)
+    summary["post_exercise_average"] = recovery.get("post_exercise_average")
+    return summary
+
+
+def _rolling_mean(values, window):
+    window = min(window, values.size)
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    rolling = np.empty_like(values)
+    # 前 window-1 个点使用已有数据的平均值
+    rolling[:window] = cumulative[1:window + 1] / np.arange(1, window + 1)
+    rolling[window:] = (cumulative[window + 1:] - cumulative[1:-window]) / window
+    return rolling
+
+
+def _heart_rate_recovery(timestamps, heart_rates, exercise_end_time, seconds_after):
+    target_time = exercise_end_time + seconds_after
+    if timestamps.size == 0 or timestamps[-1] < target_time:
+        return None
+    heart_rate_at_end = np.interp(exercise_end_time, timestamps, heart_rates)
+    heart_rate_after = np.interp(target_time, timestamps, heart_rates)
+    return float(heart_rate_at_end - heart_rate_after)
+
+
+def _lap_statistics(timestamps, heart_rates, lap_end_times):
+    if lap_end_times is None or len(lap_end_times) == 0:
+        return []
+    lap_end_times = np.asarray(lap_end_times, dtype=np.float64)
+    boundaries = np.searchsorted(timestamps, lap_end_times, side="right")
+    starts = np.concatenate(([0], boundaries[:-1]))
+    counts = boundaries - starts
+    non_empty = counts > 0
+    cumulative = np.concatenate(([0.0], np.cumsum(heart_rates)))
+    sums = cumulative[boundaries] - cumulative[starts]
+    lap_rates = heart_rates[:boundaries[-1]]
+    if lap_rates.size:
+        maxima = np.maximum.reduceat(lap_rates, np.minimum(starts, lap_rates.size - 1))
+    else:
+        maxima = np.zeros(len(lap_end_times))
+    lap_start_times = np.concatenate(([timestamps[0]], lap_end_times[:-1]))
+    laps = []
+    for lap_index in range(len(lap_end_times)):
+        laps.append({
+            "lap": lap_index + 1,
+            "start_time": float(lap_start_times[lap_index]),
+            "end_time": float(lap_end_times[lap_index]),
+            "average": float(sums[lap_index] / counts[lap_index]) if non_empty[lap_index] else None,
+            "max": int(maxima[lap_index]) if non_empty[lap_index] else None,
+        })
+    return laps
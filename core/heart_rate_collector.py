@@ -6,11 +6,17 @@ This module is responsible for collecting and managing heart rate data.
 It provides classes to simulate a heart rate collector and a listener interface
 to receive heart rate updates. The module supports starting and stopping data
 collection, calculating average heart rates (overall and per lap), and notifying
-registered listeners of new heart rate readings.
+registered listeners of new heart rate readings. The averages are kept as running sums, so
+each reading costs O(1) regardless of the session length. While a session is being
+collected, samples are also appended to the attached session journal (see
+`session_journal`). After the exercise stops, `start_recovery_measurement` attaches a
+`RecoveryMeasurement` that receives the following readings on the same timeline.
+Heart rate sources outside this process (e.g. the `sensor_gateway`) feed readings
+through `ingest` and `ingest_batch`.
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-06
-Last Modified: 2025-03-17
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -19,18 +25,27 @@ This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for
 import threading
 import time
 
+from core import metrics
+from core.recovery_measurement import RecoveryMeasurement
+
 class HeartRateCollector:
     def __init__(self):
         self.heart_rates = []
+        self.heart_rate_sum = 0
+        self.max_heart_rate = 0
         self.listeners = []
         self.running = False
         self.thread = None
 
         self.current_lap_heart_rates = []
+        self.current_lap_heart_rate_sum = 0
+        self.current_lap_max_heart_rate = 0
         self.last_lap_average_rate = 0
         self.latest_heart_rate = 0
         self.session_start_time = 0 
         self.current_session_data = []  
+        self.journal = None
+        self.recovery_measurement = None
 
     def start_collection(self):
         if not self.running:
@@ -46,11 +61,48 @@ class HeartRateCollector:
         current_timestamp  = time.time() 
         relative_timestamp = current_timestamp - self.session_start_time  
         self.heart_rates.append(heart_rate)
+        self.heart_rate_sum += heart_rate
+        if heart_rate > self.max_heart_rate:
+            self.max_heart_rate = heart_rate
         self.current_lap_heart_rates.append(heart_rate)
+        self.current_lap_heart_rate_sum += heart_rate
+        if heart_rate > self.current_lap_max_heart_rate:
+            self.current_lap_max_heart_rate = heart_rate
         self.latest_heart_rate = heart_rate
         self.current_session_data.append((relative_timestamp, heart_rate)) 
-        for listener in self.listeners:
-            listener.on_heart_rate_received(heart_rate, self.get_average_heart_rate(), self.get_lap_average_heart_rate(), self.last_lap_average_rate)
+        if self.running and self.journal is not None:
+            self.journal.append_sample(relative_timestamp, heart_rate)
+        recovery_measurement = self.recovery_measurement
+        if recovery_measurement is not None:
+            recovery_measurement.add_sample(relative_timestamp, heart_rate)
+        metrics.increment("heart_rate_samples_total")
+        with metrics.timer("listener_dispatch_seconds"):
+            for listener in self.listeners:
+                listener.on_heart_rate_received(heart_rate, self.get_average_heart_rate(), self.get_lap_average_heart_rate(), self.last_lap_average_rate)
+
+    def ingest(self, heart_rate):
+        self._notify_listeners(heart_rate)
+
+    def ingest_batch(self, heart_rates):
+        for heart_rate in heart_rates:
+            self._notify_listeners(heart_rate)
+
+    def set_journal(self, journal):
+        self.journal = journal
+
+    def start_recovery_measurement(self, on_update=None, on_complete=None, **options):
+        """从当前时刻 (运动结束) 开始测量心率恢复，返回 RecoveryMeasurement"""
+        exercise_end_time = self.get_session_time()
+        last_sample = next((sample for sample in reversed(self.current_session_data) if sample[1] > 0), None)
+        self.recovery_measurement = RecoveryMeasurement(exercise_end_time, last_sample, self.session_start_time,
+                                                        on_update=on_update, on_complete=on_complete, **options)
+        return self.recovery_measurement
+
+    def stop_recovery_measurement(self):
+        """停止接收恢复期读数，返回此前的 RecoveryMeasurement (可能尚未完成)"""
+        recovery_measurement = self.recovery_measurement
+        self.recovery_measurement = None
+        return recovery_measurement
 
     def add_listener(self, listener):
         self.listeners.append(listener)
@@ -65,18 +117,34 @@ class HeartRateCollector:
     def get_average_heart_rate(self):
         if not self.heart_rates:
             return 0
-        return sum(self.heart_rates) / len(self.heart_rates)
+        return self.heart_rate_sum / len(self.heart_rates)
+
+    def get_max_heart_rate(self):
+        return self.max_heart_rate
+
+    def get_lap_max_heart_rate(self):
+        return self.current_lap_max_heart_rate
+
+    def get_sample_count(self):
+        """本次会话已记录的采样数，即下一个采样在会话数据中的序号"""
+        return len(self.current_session_data)
+
+    def get_session_time(self):
+        """当前时刻相对会话开始的秒数，与会话数据中的时间戳一致"""
+        return time.time() - self.session_start_time
 
     def get_lap_average_heart_rate(self):
         if not self.current_lap_heart_rates:
             return 0
-        return sum(self.current_lap_heart_rates) / len(self.current_lap_heart_rates)
+        return self.current_lap_heart_rate_sum / len(self.current_lap_heart_rates)
 
     def start_new_lap(self):
         current_lap_avg = self.get_lap_average_heart_rate()
         if self.current_lap_heart_rates:
             self.last_lap_average_rate = current_lap_avg
         self.current_lap_heart_rates = []
+        self.current_lap_heart_rate_sum = 0
+        self.current_lap_max_heart_rate = 0
 
     def get_current_heart_rate(self):
         return self.latest_heart_rate
@@ -0,0 +1,194 @@
+"""
+history_catalog.py
+History Catalog Module
+======================
+This module keeps the previews of the CSV session history in memory and refreshes them
+incrementally, so reopening or refreshing the history window does not re-read every
+session file.
+- The data folder and the archive folder are only listed again when their modification
+  time changed (creating, deleting or replacing a file updates the directory mtime).
+- When a folder did change, its entries are compared with the cached stat map
+  (mtime and size per session file); only added or modified files are opened and parsed.
+- Sessions changed through the session store (feedback updates, saves, deletes) are
+  invalidated explicitly, which also covers in-place rewrites within the same mtime tick.
+Every change bumps the catalog version and is appended to a bounded change log, so a view
+can ask for the changes since the version it last displayed (`changes_since`) and apply
+only those, making a refresh proportional to the number of changes.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import bisect
+import os
+import threading
+
+from core import exercise_data_manager
+from core.exercise_data_manager import get_datetime_from_filename, read_history_record_preview
+from core.session_archive import get_archive_folder, get_archived_previews
+
+MAX_CHANGE_LOG_SIZE = 10000
+
+
+def _get_mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class HistoryCatalog:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data_folder = None
+        self.hot_previews = {}
+        self.file_stats = {}
+        self.archived_previews = {}
+        self.folder_mtime_ns = None
+        self.archive_mtime_ns = None
+        self.invalidated = set()
+        self.version = 0
+        self.change_versions = []
+        self.change_filenames = []
+        self.change_log_start = 0
+        self.sorted_previews = None
+
+    def refresh(self):
+        """检查数据目录与归档目录的变化，返回本次变化的会话数"""
+        with self.lock:
+            if self.data_folder != exercise_data_manager.DATA_FOLDER:
+                self._reset(exercise_data_manager.DATA_FOLDER)
+            touched = set()
+            folder_mtime_ns = _get_mtime_ns(self.data_folder)
+            if folder_mtime_ns != self.folder_mtime_ns:
+                touched |= self._scan_data_folder()
+                self.folder_mtime_ns = folder_mtime_ns
+            elif self.invalidated:
+                touched |= self._rescan_files(self.invalidated)
+            self.invalidated.clear()
+            archive_mtime_ns = _get_mtime_ns(get_archive_folder())
+            if archive_mtime_ns != self.archive_mtime_ns:
+                touched |= self._scan_archive()
+                self.archive_mtime_ns = archive_mtime_ns
+            return self._record_changes(touched)
+
+    def invalidate(self, filename):
+        """会话经存储后端修改后调用，下次刷新时重新读取该文件"""
+        with self.lock:
+            self.invalidated.add(filename)
+
+    def get_previews(self):
+        """返回全部预览，最新的在前"""
+        with self.lock:
+            if self.sorted_previews is None:
+                previews = {**self.archived_previews, **self.hot_previews}
+                self.sorted_previews = sorted(previews.values(), key=get_datetime_from_filename, reverse=True)
+            return list(self.sorted_previews)
+
+    def get_file_stats(self):
+        """返回 {数据目录中的会话文件名: (mtime_ns, 字节数)}"""
+        with self.lock:
+            return dict(self.file_stats)
+
+    def get_preview(self, filename):
+        with self.lock:
+            return self.hot_previews.get(filename) or self.archived_previews.get(filename)
+
+    def changes_since(self, version):
+        """返回 (当前版本, 新增或修改的预览, 删除的文件名)
+
+        version 为 None 或早于变更日志的起点时，删除列表为 None，表示调用方需用预览列表整体替换。
+        """
+        with self.lock:
+            if version is None or version < self.change_log_start or version > self.version:
+                return self.version, self.get_previews(), None
+            start = bisect.bisect_right(self.change_versions, version)
+            changed = []
+            removed = []
+            for filename in dict.fromkeys(self.change_filenames[start:]):
+                preview = self.get_preview(filename)
+                if preview is None:
+                    removed.append(filename)
+                else:
+                    changed.append(preview)
+            return self.version, changed, removed
+
+    def _reset(self, data_folder):
+        self.data_folder = data_folder
+        touched = set(self.hot_previews) | set(self.archived_previews)
+        self.hot_previews = {}
+        self.file_stats = {}
+        self.archived_previews = {}
+        self.folder_mtime_ns = None
+        self.archive_mtime_ns = None
+        self._record_changes(touched)
+
+    def _scan_data_folder(self):
+        current_stats = {}
+        try:
+            with os.scandir(self.data_folder) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith("heart_rate_log_") and name.endswith(".csv"):
+                        stat = entry.stat()
+                        current_stats[name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        touched = set(self.file_stats) - set(current_stats)
+        for filename in touched:
+            self.hot_previews.pop(filename, None)
+        for filename, file_stat in current_stats.items():
+            if self.file_stats.get(filename) != file_stat or filename in self.invalidated:
+                touched.add(filename)
+                self._read_preview(filename)
+        self.file_stats = current_stats
+        return touched
+
+    def _rescan_files(self, filenames):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(self.data_folder, filename))
+            except OSError:
+                self.file_stats.pop(filename, None)
+                self.hot_previews.pop(filename, None)
+                continue
+            self.file_stats[filename] = (stat.st_mtime_ns, stat.st_size)
+            self._read_preview(filename)
+        return set(filenames)
+
+    def _read_preview(self, filename):
+        try:
+            with open(os.path.join(self.data_folder, filename), 'r', newline='', encoding='utf-8') as csvfile:
+                preview = read_history_record_preview(filename, csvfile)
+        except Exception as e:
+            print(f"读取文件 {filename} 预览信息时出错: {e}")
+            preview = None
+        if preview:
+            self.hot_previews[filename] = preview
+        else:
+            self.hot_previews.pop(filename, None)
+
+    def _scan_archive(self):
+        archived_previews = {preview["filename"]: preview for preview in get_archived_previews()}
+        touched = {filename for filename in set(archived_previews) | set(self.archived_previews)
+                   if archived_previews.get(filename) != self.archived_previews.get(filename)}
+        self.archived_previews = archived_previews
+        return touched
+
+    def _record_changes(self, filenames):
+        if not filenames:
+            return 0
+        self.version += 1
+        for filename in filenames:
+            self.change_versions.append(self.version)
+            self.change_filenames.append(filename)
+        if len(self.change_versions) > MAX_CHANGE_LOG_SIZE:
+            del self.change_versions[:-MAX_CHANGE_LOG_SIZE]
+            del self.change_filenames[:-MAX_CHANGE_LOG_SIZE]
+            # 最早保留的版本可能只剩部分记录，早于它的版本只能整体刷新
+            self.change_log_start = self.change_versions[0]
+        self.sorted_previews = None
+        return len(filenames)
@@ -0,0 +1,89 @@
+"""
+history_index.py
+History Index Module
+====================
+This module keeps a small JSON index next to the CSV session files
+(`data/history_index.json`). It caches per-session values that are expensive to derive
+from the raw samples, such as the heart-rate analytics summary, so the history window
+does not have to recompute them every time a record is opened.
+Entries are keyed by session filename; each entry is a dict of named sections
+(e.g. `"analytics"`). The index is loaded lazily, guarded by a lock, and rewritten
+atomically (temporary file + `os.replace`) whenever it changes.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import json
+import os
+import threading
+
+from core import exercise_data_manager
+
+HISTORY_INDEX_FILENAME = "history_index.json"
+HISTORY_INDEX_VERSION = 1
+
+
+class HistoryIndex:
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.entries = None
+
+    def _get_path(self):
+        return self.path or os.path.join(exercise_data_manager.DATA_FOLDER, HISTORY_INDEX_FILENAME)
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        path = self._get_path()
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get("version") == HISTORY_INDEX_VERSION:
+                self.entries = content.get("entries", {})
+        except (OSError, ValueError) as e:
+            print(f"读取历史索引时出错，将重新建立: {e}")
+
+    def get(self, filename, section):
+        with self.lock:
+            self._load()
+            return self.entries.get(filename, {}).get(section)
+
+    def set(self, filename, section, value):
+        with self.lock:
+            self._load()
+            self.entries.setdefault(filename, {})[section] = value
+            self._save()
+
+    def remove(self, filename):
+        with self.lock:
+            self._load()
+            if self.entries.pop(filename, None) is not None:
+                self._save()
+
+    def remove_many(self, filenames):
+        with self.lock:
+            self._load()
+            removed = [filename for filename in filenames if self.entries.pop(filename, None) is not None]
+            if removed:
+                self._save()
+
+    def _save(self):
+        path = self._get_path()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": HISTORY_INDEX_VERSION, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入历史索引时出错: {e}")
@@ -0,0 +1,236 @@
+"""
+history_search.py
+History Search Module
+=====================
+This module implements search, filtering and sorting of the session history.
+- `HistoryQuery` describes a search: level and feedback equality filters, age, date and
+  duration ranges, an optional set of session filenames (e.g. one member's sessions) and
+  the column to sort on.
+- `HistorySearchIndex` keeps secondary indexes over the preview dicts of the CSV history:
+  one sorted list of (value, filename) per searchable column and a hash index for the
+  equality columns. A query starts from the most selective predicate (a hash bucket or
+  a binary-searched range), checks the remaining predicates on those candidates only and
+  returns them ordered by walking the sort column's index, so filters stay fast across
+  tens of thousands of sessions. The index is kept up to date with the change log of
+  `history_catalog` instead of being rebuilt.
+The SQLite backend answers the same queries with SQL on indexed columns (see
+`session_store`); `HistoryQuery.apply` is the plain linear fallback.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import bisect
+import threading
+
+NUMERIC_COLUMNS = ("age", "lap_distance", "duration_seconds", "exercise_distance")
+EQUALITY_COLUMNS = ("level", "feedback")
+SEARCH_COLUMNS = ("datetime",) + NUMERIC_COLUMNS + EQUALITY_COLUMNS
+DEFAULT_SORT_COLUMN = "datetime"
+_FILENAME_MAX = "\U0010ffff"
+
+
+def get_column_value(preview, column):
+    """返回预览中用于筛选与排序的值，缺失或无法解析时返回 None"""
+    value = preview.get(column)
+    if column in NUMERIC_COLUMNS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if column == "feedback":
+        return value or ""
+    if value in (None, "", "N/A", "日期时间解析失败"):
+        return None
+    if column == "level":
+        # 内置等级按数值排序，自定义速度程序按名称排在其后
+        try:
+            return 0, float(value), ""
+        except ValueError:
+            return 1, 0.0, str(value)
+    return str(value)
+
+
+class HistoryQuery:
+    def __init__(self, level=None, feedback=None, min_age=None, max_age=None, start_date=None, end_date=None,
+                 min_duration_seconds=None, max_duration_seconds=None, filenames=None,
+                 sort_by=DEFAULT_SORT_COLUMN, descending=True):
+        """日期格式为 YYYY-mm-dd (含首尾两天)；feedback 为 "" 时筛选尚未反馈的记录"""
+        if sort_by not in SEARCH_COLUMNS:
+            raise ValueError(f"不支持按 {sort_by} 排序。")
+        self.level = level
+        self.feedback = feedback
+        self.equality_filters = {}
+        if level is not None:
+            self.equality_filters["level"] = get_column_value({"level": level}, "level")
+        if feedback is not None:
+            self.equality_filters["feedback"] = feedback
+        self.range_filters = {}
+        self._add_range("age", min_age, max_age)
+        self._add_range("duration_seconds", min_duration_seconds, max_duration_seconds)
+        self._add_range("datetime", f"{start_date} 00:00:00" if start_date else None, f"{end_date} 23:59:59" if end_date else None)
+        self.filenames = set(filenames) if filenames is not None else None
+        self.sort_by = sort_by
+        self.descending = descending
+
+    def _add_range(self, column, low, high):
+        if low is None and high is None:
+            return
+        if column in NUMERIC_COLUMNS:
+            low = float(low) if low is not None else None
+            high = float(high) if high is not None else None
+        self.range_filters[column] = (low, high)
+
+    def is_default(self):
+        """没有任何筛选条件且按日期从新到旧排序"""
+        return (not self.equality_filters and not self.range_filters and self.filenames is None
+                and self.sort_by == DEFAULT_SORT_COLUMN and self.descending)
+
+    def matches(self, values, filename):
+        if self.filenames is not None and filename not in self.filenames:
+            return False
+        for column, expected in self.equality_filters.items():
+            if values[column] != expected:
+                return False
+        for column, (low, high) in self.range_filters.items():
+            value = values[column]
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return True
+
+    def apply(self, previews):
+        """线性筛选并排序预览列表，供没有索引的存储后端使用"""
+        matched = []
+        missing = []
+        for preview in previews:
+            values = {column: get_column_value(preview, column) for column in SEARCH_COLUMNS}
+            if self.matches(values, preview["filename"]):
+                (missing if values[self.sort_by] is None else matched).append((values[self.sort_by], preview))
+        matched.sort(key=lambda item: (item[0], item[1]["filename"]), reverse=self.descending)
+        missing.sort(key=lambda item: item[1]["filename"])
+        return [preview for _, preview in matched] + [preview for _, preview in missing]
+
+
+class HistorySearchIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.previews = {}
+        self.column_values = {column: {} for column in SEARCH_COLUMNS}
+        self.sorted_entries = {column: [] for column in SEARCH_COLUMNS}
+        self.buckets = {column: {} for column in EQUALITY_COLUMNS}
+
+    def apply_changes(self, version, changed, removed):
+        """应用 `HistoryCatalog.changes_since` 的结果；removed 为 None 时整体重建"""
+        with self.lock:
+            if removed is None:
+                self.rebuild(changed)
+            else:
+                for filename in removed:
+                    self.remove(filename)
+                for preview in changed:
+                    self.upsert(preview)
+            self.version = version
+
+    def rebuild(self, previews):
+        with self.lock:
+            self.previews = {preview["filename"]: preview for preview in previews}
+            for column in SEARCH_COLUMNS:
+                column_values = self.column_values[column] = {filename: get_column_value(preview, column)
+                                                              for filename, preview in self.previews.items()}
+                self.sorted_entries[column] = sorted((value, filename) for filename, value in column_values.items()
+                                                     if value is not None)
+            for column in EQUALITY_COLUMNS:
+                buckets = self.buckets[column] = {}
+                for filename, value in self.column_values[column].items():
+                    buckets.setdefault(value, set()).add(filename)
+
+    def upsert(self, preview):
+        with self.lock:
+            filename = preview["filename"]
+            self.remove(filename)
+            self.previews[filename] = preview
+            for column in SEARCH_COLUMNS:
+                value = self.column_values[column][filename] = get_column_value(preview, column)
+                if value is not None:
+                    bisect.insort(self.sorted_entries[column], (value, filename))
+                if column in self.buckets:
+                    self.buckets[column].setdefault(value, set()).add(filename)
+
+    def remove(self, filename):
+        with self.lock:
+            if self.previews.pop(filename, None) is None:
+                return
+            for column in SEARCH_COLUMNS:
+                value = self.column_values[column].pop(filename)
+                if value is not None:
+                    sorted_entries = self.sorted_entries[column]
+                    del sorted_entries[bisect.bisect_left(sorted_entries, (value, filename))]
+                if column in self.buckets:
+                    bucket = self.buckets[column][value]
+                    bucket.discard(filename)
+                    if not bucket:
+                        del self.buckets[column][value]
+
+    def _range_slice(self, column, low, high):
+        sorted_entries = self.sorted_entries[column]
+        start = 0 if low is None else bisect.bisect_left(sorted_entries, (low,))
+        end = len(sorted_entries) if high is None else bisect.bisect_right(sorted_entries, (high, _FILENAME_MAX))
+        return start, max(start, end)
+
+    def search(self, query):
+        """返回符合条件的预览列表，按 query.sort_by 排序，缺失值排在最后"""
+        with self.lock:
+            # 每个条件对应一个候选集 (哈希桶或排序列上的区间)，从最小的开始逐个求交
+            sources = []
+            if query.filenames is not None:
+                sources.append((len(query.filenames), query.filenames, None))
+            for column, expected in query.equality_filters.items():
+                bucket = self.buckets[column].get(expected, set())
+                sources.append((len(bucket), bucket, None))
+            for column, (low, high) in query.range_filters.items():
+                start, end = self._range_slice(column, low, high)
+                sources.append((end - start, None, (column, low, high, start, end)))
+            sources.sort(key=lambda source: source[0])
+
+            matched = None
+            for size, filenames, range_filter in sources:
+                if filenames is not None:
+                    matched = set(filenames) if matched is None else matched & filenames
+                    continue
+                column, low, high, start, end = range_filter
+                if matched is None or size < len(matched):
+                    range_filenames = {filename for _, filename in self.sorted_entries[column][start:end]}
+                    matched = range_filenames if matched is None else matched & range_filenames
+                else:
+                    # 候选集已经很小，直接检查取值比构造区间集合更快
+                    column_values = self.column_values[column]
+                    matched = {filename for filename in matched if filename in column_values
+                               and column_values[filename] is not None
+                               and (low is None or column_values[filename] >= low)
+                               and (high is None or column_values[filename] <= high)}
+                if not matched:
+                    return []
+            if matched is not None:
+                matched &= self.previews.keys()
+
+            sort_by = query.sort_by
+            entries = self.sorted_entries[sort_by]
+            column_values = self.column_values[sort_by]
+            if matched is None:
+                present = [filename for _, filename in (reversed(entries) if query.descending else entries)]
+                missing = sorted(filename for filename, value in column_values.items() if value is None)
+            elif len(matched) * 8 < len(self.previews):
+                present = sorted(((column_values[filename], filename) for filename in matched
+                                  if column_values[filename] is not None), reverse=query.descending)
+                present = [filename for _, filename in present]
+                missing = sorted(filename for filename in matched if column_values[filename] is None)
+            else:
+                # 结果集较大时沿排序列的索引顺序取出，避免再次排序
+                present = [filename for _, filename in (reversed(entries) if query.descending else entries) if filename in matched]
+                missing = sorted(filename for filename in matched if column_values[filename] is None)
+            previews = self.previews
+            return [previews[filename] for filename in present] + [previews[filename] for filename in missing]
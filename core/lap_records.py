@@ -0,0 +1,88 @@
+"""
+lap_records.py
+Lap Segment Records Module
+==========================
+This module defines the per-lap segment records written alongside each session.
+The controller records one segment whenever a lap is completed, with the values it already
+has at the lap boundary, so later per-lap analysis never has to re-derive laps from the
+second-by-second heart-rate samples. When the exercise is stopped in the middle of a lap,
+the partial last lap is recorded as well, so the table covers the whole session:
+- `lap`: lap number (1-based); `start_time` / `end_time`: seconds since the session start,
+  on the same timeline as the heart-rate samples.
+- `start_sample` / `end_sample`: index of the first sample of the lap and of the first
+  sample after it in the saved heart-rate samples. Charts place laps with these indexes,
+  which do not depend on the time axis a storage backend returns.
+- `distance`: meters covered during the lap (the lap is detected by polling, so it may be
+  slightly longer than the configured lap distance); `speed`: treadmill speed at the end of
+  the lap; `next_speed`: speed chosen for the next lap.
+- `average` / `max`: average and maximum heart rate during the lap.
+- `reduction_type`: reason of the speed decision taken at the end of the lap
+  (e.g. "程序速度", "小降速", "大降速"), or None when no decision was taken.
+- `completed`: False for the partial last lap of a stopped exercise.
+The session store persists the segments (`save_laps` / `load_laps`); `summarize_laps`
+derives the lap-level summary used by the history window and the analytics from the
+completed laps.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+LAP_COLUMNS = ("lap", "start_time", "end_time", "start_sample", "end_sample", "distance", "speed", "next_speed",
+               "average", "max", "reduction_type", "completed")
+PROGRAM_SPEED_REASON = "程序速度"
+
+
+def make_lap_record(lap, start_time, end_time, start_sample, end_sample, distance, speed, next_speed, average,
+                    max_heart_rate, reduction_type, completed=True):
+    return {
+        "lap": lap,
+        "start_time": round(start_time, 3),
+        "end_time": round(end_time, 3),
+        "start_sample": start_sample,
+        "end_sample": end_sample,
+        "distance": round(distance, 2),
+        "speed": speed,
+        "next_speed": next_speed,
+        "average": average,
+        "max": max_heart_rate,
+        "reduction_type": reduction_type,
+        "completed": completed,
+    }
+
+
+def is_completed_lap(lap):
+    return bool(lap.get("completed", True))
+
+
+def is_speed_reduction(lap):
+    """本圈结束时因心率降速 (程序本身的降速不计入)"""
+    next_speed = lap.get("next_speed")
+    return (lap.get("reduction_type") not in (None, PROGRAM_SPEED_REASON) and next_speed is not None
+            and lap.get("speed") is not None and next_speed < lap["speed"])
+
+
+def summarize_laps(laps):
+    """由已完成圈程的记录得到圈程级汇总，没有完成的圈程时返回 None"""
+    laps = [lap for lap in laps or () if is_completed_lap(lap)]
+    if not laps:
+        return None
+    durations = [lap["end_time"] - lap["start_time"] for lap in laps]
+    averages = [lap["average"] for lap in laps if lap.get("average")]
+    reduction_counts = {}
+    for lap in laps:
+        if is_speed_reduction(lap):
+            reduction_type = lap.get("reduction_type") or ""
+            reduction_counts[reduction_type] = reduction_counts.get(reduction_type, 0) + 1
+    fastest_index = min(range(len(laps)), key=lambda index: durations[index])
+    return {
+        "lap_count": len(laps),
+        "average_lap_seconds": sum(durations) / len(durations),
+        "fastest_lap": laps[fastest_index]["lap"],
+        "fastest_lap_seconds": durations[fastest_index],
+        "max_lap_average": max(averages) if averages else None,
+        "first_reduction_lap": next((lap["lap"] for lap in laps if is_speed_reduction(lap)), None),
+        "reduction_counts": reduction_counts,
+    }
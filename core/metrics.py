@@ -0,0 +1,243 @@
+"""
+metrics.py
+Runtime Metrics Module
+======================
+This module collects lightweight runtime metrics for the hot paths of the application:
+heart-rate listener dispatch, lap detection, Tk callback queueing, history scans, chart
+rendering and AI requests.
+Three kinds of metrics are supported:
+- Counters (`increment`): monotonically increasing totals.
+- Gauges (`set_gauge`, `add_to_gauge`): current values such as pending Tk callbacks.
+- Histograms (`observe`, `timer`): latency distributions with fixed buckets, count,
+  sum and max.
+Metrics are disabled by default. When disabled, every recording call returns after a
+single flag check and `timer` hands out a shared no-op context manager. They can be
+turned on with `enable()` (the app does this from the `metrics_enabled` setting) or by
+setting the environment variable `TAICHI_METRICS=1`.
+Snapshots can be exported as JSON (`write_json_snapshot`) or in the Prometheus text
+exposition format (`write_prometheus_file`); `MetricsExporter` writes both periodically.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROMETHEUS_PREFIX = "taichi_run_"
+DEFAULT_EXPORT_INTERVAL = 60
+
+enabled = os.environ.get("TAICHI_METRICS", "") not in ("", "0")
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+
+
+class _Histogram:
+    __slots__ = ("bucket_counts", "count", "total", "maximum")
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(HISTOGRAM_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        observe(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(flag=True):
+    global enabled
+    enabled = bool(flag)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+def increment(name, value=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    if not enabled:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def add_to_gauge(name, delta):
+    if not enabled:
+        return
+    with _lock:
+        _gauges[name] = _gauges.get(name, 0) + delta
+
+
+def observe(name, value):
+    if not enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.observe(value)
+
+
+def timer(name):
+    """用法: with metrics.timer("xxx_seconds"): ...，关闭时返回空操作对象"""
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def tk_after(widget, callback, *args):
+    """代替 widget.after(0, ...)，统计 Tk 待执行回调数量与排队延迟"""
+    if not enabled:
+        return widget.after(0, callback, *args)
+    scheduled_at = time.perf_counter()
+    add_to_gauge("tk_pending_callbacks", 1)
+
+    def run_callback():
+        add_to_gauge("tk_pending_callbacks", -1)
+        observe("tk_callback_queue_seconds", time.perf_counter() - scheduled_at)
+        callback(*args)
+
+    return widget.after(0, run_callback)
+
+
+def snapshot():
+    with _lock:
+        histograms = {}
+        for name, histogram in _histograms.items():
+            histograms[name] = {
+                "count": histogram.count,
+                "sum": histogram.total,
+                "max": histogram.maximum,
+                "mean": histogram.total / histogram.count if histogram.count else 0.0,
+                "buckets": {str(bound): count for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), histogram.bucket_counts)},
+            }
+        return {
+            "timestamp": time.time(),
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": histograms,
+        }
+
+
+def to_prometheus_text(metrics_snapshot=None):
+    metrics_snapshot = metrics_snapshot or snapshot()
+    lines = []
+    for name, value in sorted(metrics_snapshot["counters"].items()):
+        metric_name = PROMETHEUS_PREFIX + name
+        lines.append(f"# TYPE {metric_name} counter")
+        lines.append(f"{metric_name} {value}")
+    for name, value in sorted(metrics_snapshot["gauges"].items()):
+        metric_name = PROMETHEUS_PREFIX + name
+        lines.append(f"# TYPE {metric_name} gauge")
+        lines.append(f"{metric_name} {value}")
+    for name, histogram in sorted(metrics_snapshot["histograms"].items()):
+        metric_name = PROMETHEUS_PREFIX + name
+        lines.append(f"# TYPE {metric_name} histogram")
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            lines.append(f'{metric_name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{metric_name}_sum {histogram['sum']}")
+        lines.append(f"{metric_name}_count {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_json_snapshot(filepath):
+    _write_atomically(filepath, json.dumps(snapshot(), indent=4))
+
+
+def write_prometheus_file(filepath):
+    _write_atomically(filepath, to_prometheus_text())
+
+
+def _write_atomically(filepath, content):
+    folder = os.path.dirname(filepath)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    temp_path = filepath + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, filepath)
+
+
+class MetricsExporter:
+    """后台线程，定期把指标快照写入 JSON 和/或 Prometheus 文本文件"""
+
+    def __init__(self, json_path=None, prometheus_path=None, interval=DEFAULT_EXPORT_INTERVAL):
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.export()
+
+    def export(self):
+        try:
+            if self.json_path:
+                write_json_snapshot(self.json_path)
+            if self.prometheus_path:
+                write_prometheus_file(self.prometheus_path)
+        except OSError as e:
+            print(f"导出运行指标时出错: {e}")
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.export()
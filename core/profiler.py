@@ -0,0 +1,126 @@
+"""
+profiler.py
+Sampling Profiler Module
+========================
+This module implements an opt-in sampling profiler for diagnosing stalls on a running
+kiosk without attaching a debugger.
+While enabled, a background thread periodically captures the current stack of every
+application thread (Tk main loop, simulator threads, lap monitor, AI worker, ...) with
+`sys._current_frames()` and aggregates identical stacks. The aggregated stacks are written
+in the folded stack format (`thread;outer;...;inner count`) understood by flamegraph.pl,
+speedscope and similar tools, to `data/profile_YYYYmmdd-HHMMSS.folded`. The file is
+rewritten periodically, so it can be collected while the session is still running.
+Profiling is off by default. It can be turned on from the settings window or by setting
+the environment variable `TAICHI_PROFILE=1`. The sampling interval can be overridden with
+`TAICHI_PROFILE_INTERVAL` (seconds).
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import datetime
+import os
+import sys
+import threading
+import time
+
+DEFAULT_SAMPLE_INTERVAL = 0.01
+DEFAULT_FLUSH_INTERVAL = 30.0
+MAX_STACK_DEPTH = 64
+
+
+def profiling_requested_by_environment():
+    return os.environ.get("TAICHI_PROFILE", "") not in ("", "0")
+
+
+class SamplingProfiler:
+    def __init__(self, output_folder="data", sample_interval=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if sample_interval is None:
+            sample_interval = float(os.environ.get("TAICHI_PROFILE_INTERVAL", DEFAULT_SAMPLE_INTERVAL))
+        self.output_folder = output_folder
+        self.sample_interval = sample_interval
+        self.flush_interval = flush_interval
+        self.stack_counts = {}
+        self.sample_count = 0
+        self.output_path = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self._frame_labels = {}
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        timestamp_str = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        # 每次开启写入新的文件，只包含本次开启后的采样
+        with self.lock:
+            self.stack_counts = {}
+            self.sample_count = 0
+        self.output_path = os.path.join(self.output_folder, f"profile_{timestamp_str}.folded")
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self.thread.start()
+        print(f"性能采样已开启，输出文件: {self.output_path}")
+
+    def stop(self):
+        if not self.is_running():
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        self.write()
+        print(f"性能采样已停止，共采样 {self.sample_count} 次。")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self.stop_event.wait(self.sample_interval):
+            self.sample()
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.write()
+                last_flush = time.monotonic()
+
+    def sample(self):
+        own_ident = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        with self.lock:
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f"Thread-{ident}"))
+                stack.reverse()
+                key = ";".join(stack)
+                self.stack_counts[key] = self.stack_counts.get(key, 0) + 1
+            self.sample_count += 1
+
+    def _label(self, code):
+        label = self._frame_labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+            self._frame_labels[code] = label
+        return label
+
+    def write(self):
+        if not self.output_path:
+            return
+        with self.lock:
+            lines = [f"{stack} {count}\n" for stack, count in self.stack_counts.items()]
+        try:
+            if not os.path.exists(self.output_folder):
+                os.makedirs(self.output_folder)
+            temp_path = self.output_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(temp_path, self.output_path)
+        except OSError as e:
+            print(f"写入性能采样文件时出错: {e}")
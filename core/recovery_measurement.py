@@ -0,0 +1,132 @@
+"""
+recovery_measurement.py
+Post-Exercise Recovery Measurement Module
+=========================================
+This module measures heart-rate recovery after the end of an exercise session.
+A `RecoveryMeasurement` is attached to the `HeartRateCollector` when the exercise stops
+and is fed every reading the collector receives afterwards, on the collector's own
+timeline (seconds since the session start), so it does not depend on Tk timers and works
+the same with a headless collector, the sensor gateway or a simulator.
+- The average heart rate during the first `average_seconds` after the end of exercise is
+  kept as a running sum and count (O(1) per reading).
+- The heart rate at the end of exercise and at each checkpoint (60 s and 120 s by
+  default) is linearly interpolated between the two readings around the exact target
+  time; HRR is the drop from the end of exercise to the checkpoint. The target times and
+  the readings used are recorded with each checkpoint.
+- Zero readings (sensor stopped or disconnected) are ignored.
+Once all checkpoints are measured the measurement calls `on_complete`; `to_dict` returns
+the JSON-serializable result that the session store persists (`save_recovery`).
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import datetime
+import threading
+
+RECOVERY_VERSION = 1
+RECOVERY_CHECKPOINTS = (60, 120)
+POST_EXERCISE_AVERAGE_SECONDS = 60
+
+
+def _interpolate(previous_sample, sample, target_time):
+    previous_time, previous_rate = previous_sample
+    sample_time, sample_rate = sample
+    if sample_time <= previous_time:
+        return float(sample_rate)
+    fraction = (target_time - previous_time) / (sample_time - previous_time)
+    return previous_rate + (sample_rate - previous_rate) * fraction
+
+
+class RecoveryMeasurement:
+    def __init__(self, exercise_end_time, last_sample=None, session_start_time=None, checkpoints=RECOVERY_CHECKPOINTS,
+                 average_seconds=POST_EXERCISE_AVERAGE_SECONDS, on_update=None, on_complete=None):
+        """exercise_end_time 与采样时间戳同为相对会话开始的秒数；last_sample 为运动结束前最后一个 (时间戳, 心率)"""
+        self.lock = threading.Lock()
+        self.exercise_end_time = exercise_end_time
+        self.session_start_time = session_start_time
+        self.checkpoints = tuple(sorted(checkpoints))
+        self.average_seconds = average_seconds
+        self.on_update = on_update
+        self.on_complete = on_complete
+        self.previous_sample = last_sample if last_sample and last_sample[1] > 0 else None
+        self.heart_rate_at_end = None
+        self.average_sum = 0.0
+        self.average_count = 0
+        self.results = []
+        self.completed = False
+
+    def add_sample(self, timestamp, heart_rate):
+        if heart_rate <= 0 or timestamp < self.exercise_end_time:
+            return
+        with self.lock:
+            if self.completed:
+                return
+            sample = (timestamp, heart_rate)
+            if self.heart_rate_at_end is None:
+                self.heart_rate_at_end = (_interpolate(self.previous_sample, sample, self.exercise_end_time)
+                                          if self.previous_sample is not None else float(heart_rate))
+            if timestamp <= self.exercise_end_time + self.average_seconds:
+                self.average_sum += heart_rate
+                self.average_count += 1
+            while len(self.results) < len(self.checkpoints):
+                seconds_after = self.checkpoints[len(self.results)]
+                target_time = self.exercise_end_time + seconds_after
+                if timestamp < target_time:
+                    break
+                previous_sample = self.previous_sample if self.previous_sample is not None else sample
+                heart_rate_at_target = _interpolate(previous_sample, sample, target_time)
+                self.results.append({
+                    "seconds": seconds_after,
+                    "target_time": target_time,
+                    "measured_at": self._format_wall_time(target_time),
+                    "sample_times": [previous_sample[0], timestamp],
+                    "heart_rate": heart_rate_at_target,
+                    "hrr": self.heart_rate_at_end - heart_rate_at_target,
+                })
+            self.previous_sample = sample
+            self.completed = len(self.results) == len(self.checkpoints)
+            completed = self.completed
+        if self.on_update:
+            self.on_update(self)
+        if completed and self.on_complete:
+            self.on_complete(self)
+
+    def get_average(self):
+        """运动结束后 average_seconds 内的平均心率，尚无读数时返回 None"""
+        return self.average_sum / self.average_count if self.average_count else None
+
+    def get_hrr(self, seconds_after):
+        for result in self.results:
+            if result["seconds"] == seconds_after:
+                return result["hrr"]
+        return None
+
+    def has_data(self):
+        return self.heart_rate_at_end is not None
+
+    def to_dict(self):
+        with self.lock:
+            recovery = {
+                "version": RECOVERY_VERSION,
+                "exercise_end_time": self.exercise_end_time,
+                "exercise_end_at": self._format_wall_time(self.exercise_end_time),
+                "heart_rate_at_end": self.heart_rate_at_end,
+                "post_exercise_average": self.get_average(),
+                "post_exercise_average_seconds": self.average_seconds,
+                "post_exercise_sample_count": self.average_count,
+                "checkpoints": [dict(result) for result in self.results],
+                "completed": self.completed,
+            }
+        for seconds_after in self.checkpoints:
+            recovery[f"hrr_{seconds_after}"] = self.get_hrr(seconds_after)
+        return recovery
+
+    def _format_wall_time(self, relative_time):
+        if not self.session_start_time:
+            return None
+        wall_time = datetime.datetime.fromtimestamp(self.session_start_time + relative_time)
+        return wall_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
@@ -0,0 +1,139 @@
+"""
+sample_file.py
+Binary Heart Rate Sample Files
+==============================
+This module implements a fixed-width binary sample format for exercise sessions. Each
+session's heart-rate samples are stored next to its CSV file (`heart_rate_log_*.hrs`)
+so that the history window and analysis code can memory-map them instead of parsing
+text row by row.
+File layout (little-endian):
+- 16-byte header: magic `HRSF`, format version (uint16), reserved (uint16),
+  sample count (uint32), reserved (uint32).
+- `count` float32 values: elapsed time of each sample in seconds.
+- `count` uint16 values: heart rate of each sample in bpm.
+The two columns are contiguous and aligned, so `open_sample_file` exposes them as
+memoryviews over the mapping without copying. `SessionSamples.as_arrays` wraps the same
+buffers as NumPy arrays (zero-copy) when NumPy is available.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SAMPLE_FILE_MAGIC = b"HRSF"
+SAMPLE_FILE_VERSION = 1
+SAMPLE_FILE_EXTENSION = ".hrs"
+HEADER_STRUCT = struct.Struct("<4sHHII")
+MAX_HEART_RATE_VALUE = 0xFFFF
+
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class SessionSamples:
+    """一个会话的心率采样，timestamps / heart_rates 为支持缓冲区协议的 memoryview"""
+
+    def __init__(self, timestamps, heart_rates, mapping=None):
+        self.timestamps = timestamps
+        self.heart_rates = heart_rates
+        self._mapping = mapping
+
+    def __len__(self):
+        return len(self.heart_rates)
+
+    def as_arrays(self):
+        """以 NumPy 数组形式返回 (timestamps, heart_rates)，与映射共享内存"""
+        if np is None:
+            raise RuntimeError("需要安装 NumPy 才能以数组形式读取采样数据。")
+        return np.frombuffer(self.timestamps, dtype=np.float32), np.frombuffer(self.heart_rates, dtype=np.uint16)
+
+    def close(self):
+        if self._mapping is None:
+            return
+        self.timestamps.release()
+        self.heart_rates.release()
+        try:
+            self._mapping.close()
+        except BufferError:
+            # 仍有数组引用该映射（例如图表尚未回收），交由垃圾回收释放
+            pass
+        self._mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def sample_filename(filename):
+    base, _ = os.path.splitext(filename)
+    return base + SAMPLE_FILE_EXTENSION
+
+
+def write_sample_file(filepath, timestamps, heart_rates):
+    timestamp_array = array("f", timestamps)
+    heart_rate_array = array("H", (min(max(int(heart_rate), 0), MAX_HEART_RATE_VALUE) for heart_rate in heart_rates))
+    if len(timestamp_array) != len(heart_rate_array):
+        raise ValueError("时间戳与心率数量不一致。")
+    if not _NATIVE_LITTLE_ENDIAN:
+        timestamp_array.byteswap()
+        heart_rate_array.byteswap()
+
+    temp_path = filepath + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER_STRUCT.pack(SAMPLE_FILE_MAGIC, SAMPLE_FILE_VERSION, 0, len(heart_rate_array), 0))
+        timestamp_array.tofile(f)
+        heart_rate_array.tofile(f)
+    os.replace(temp_path, filepath)
+
+
+def write_session_samples(filepath, session_data):
+    write_sample_file(filepath, [timestamp for timestamp, _ in session_data], [heart_rate for _, heart_rate in session_data])
+
+
+def open_sample_file(filepath):
+    with open(filepath, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, _, count, _ = HEADER_STRUCT.unpack_from(mapping, 0)
+        if magic != SAMPLE_FILE_MAGIC or version != SAMPLE_FILE_VERSION:
+            raise ValueError(f"不支持的采样文件格式: {filepath}")
+        timestamps_offset = HEADER_STRUCT.size
+        heart_rates_offset = timestamps_offset + 4 * count
+        if len(mapping) < heart_rates_offset + 2 * count:
+            raise ValueError(f"采样文件已截断: {filepath}")
+    except (struct.error, ValueError):
+        mapping.close()
+        raise
+
+    if not _NATIVE_LITTLE_ENDIAN:
+        timestamps = array("f", mapping[timestamps_offset:heart_rates_offset])
+        heart_rates = array("H", mapping[heart_rates_offset:heart_rates_offset + 2 * count])
+        timestamps.byteswap()
+        heart_rates.byteswap()
+        mapping.close()
+        return samples_from_sequences(timestamps, heart_rates)
+
+    view = memoryview(mapping)
+    timestamps = view[timestamps_offset:heart_rates_offset].cast("f")
+    heart_rates = view[heart_rates_offset:heart_rates_offset + 2 * count].cast("H")
+    view.release()
+    return SessionSamples(timestamps, heart_rates, mapping)
+
+
+def samples_from_sequences(timestamps, heart_rates):
+    """由内存中的序列构造采样对象（无对应映射文件时使用）"""
+    return SessionSamples(memoryview(array("f", timestamps)), memoryview(array("H", heart_rates)))
@@ -0,0 +1,173 @@
+"""
+sensor_gateway.py
+Sensor Gateway Module
+=====================
+This module implements a local sensor gateway: a TCP server through which external
+device bridges push heart-rate samples into the per-lane `HeartRateCollector`s.
+Framing protocol (little endian), one frame per batch of samples:
+- Header (6 bytes): magic `b"HR"`, protocol version (uint8), lane (uint8),
+  sample count (uint16, at most `MAX_SAMPLES_PER_FRAME`).
+- Samples (6 bytes each): device timestamp in milliseconds (uint32), heart rate (uint16).
+A frame with a bad magic or version closes the connection; frames for unknown lanes,
+and batches still waiting for queue space when the gateway stops, are counted as dropped.
+Samples are counted as received once they are on a lane queue.
+Each connection is served by its own thread, which decodes frames and puts the batches
+on a bounded queue per lane. One dispatcher thread per lane drains its queue, merging
+queued batches, and feeds the samples to the lane's collector. When a lane's queue is
+full, the connection thread blocks and stops reading its socket, so TCP flow control
+pushes the backpressure back to the sending bridge instead of growing memory.
+The gateway listens on localhost by default. `simulator/sensor_load_generator.py` is a
+client that saturates it for load tests.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import queue
+import socketserver
+import struct
+import threading
+
+from core import metrics
+
+FRAME_MAGIC = b"HR"
+PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct("<2sBBH")
+SAMPLE = struct.Struct("<IH")
+MAX_SAMPLES_PER_FRAME = 1024
+DEFAULT_GATEWAY_HOST = "127.0.0.1"
+DEFAULT_GATEWAY_PORT = 9750
+DEFAULT_QUEUE_SIZE = 256
+MAX_DISPATCH_BATCHES = 64
+
+
+def encode_frame(lane, samples):
+    """将 [(设备时间戳毫秒, 心率), ...] 编码为一帧"""
+    if len(samples) > MAX_SAMPLES_PER_FRAME:
+        raise ValueError(f"每帧最多 {MAX_SAMPLES_PER_FRAME} 个采样。")
+    parts = [FRAME_HEADER.pack(FRAME_MAGIC, PROTOCOL_VERSION, lane, len(samples))]
+    parts.extend(SAMPLE.pack(timestamp_ms & 0xFFFFFFFF, heart_rate) for timestamp_ms, heart_rate in samples)
+    return b"".join(parts)
+
+
+def decode_samples(payload, count):
+    """返回帧内的心率列表 (设备时间戳只用于客户端排序，网关按到达顺序处理)"""
+    return [heart_rate for _, heart_rate in SAMPLE.iter_unpack(payload[:count * SAMPLE.size])]
+
+
+class _GatewayRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        gateway = self.server.gateway
+        metrics.add_to_gauge("sensor_gateway_connections", 1)
+        try:
+            while not gateway.stop_event.is_set():
+                header = self.rfile.read(FRAME_HEADER.size)
+                if len(header) < FRAME_HEADER.size:
+                    return
+                magic, version, lane, count = FRAME_HEADER.unpack(header)
+                if magic != FRAME_MAGIC or version != PROTOCOL_VERSION or count > MAX_SAMPLES_PER_FRAME:
+                    metrics.increment("sensor_gateway_bad_frames_total")
+                    print(f"传感器网关收到无效数据帧，已断开连接: {self.client_address}")
+                    return
+                payload = self.rfile.read(count * SAMPLE.size)
+                if len(payload) < count * SAMPLE.size:
+                    return
+                gateway.enqueue(lane, decode_samples(payload, count))
+        except OSError:
+            pass
+        finally:
+            metrics.add_to_gauge("sensor_gateway_connections", -1)
+
+
+class _GatewayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SensorGateway:
+    def __init__(self, collectors, host=DEFAULT_GATEWAY_HOST, port=DEFAULT_GATEWAY_PORT, queue_size=DEFAULT_QUEUE_SIZE):
+        """collectors: {通道号: HeartRateCollector}"""
+        self.collectors = collectors
+        self.host = host
+        self.port = port
+        self.queues = {lane: queue.Queue(maxsize=queue_size) for lane in collectors}
+        self.stop_event = threading.Event()
+        self.server = None
+        self.threads = []
+        self.samples_received = 0
+        self.samples_dropped = 0
+        self.stats_lock = threading.Lock()
+
+    def start(self):
+        self.stop_event.clear()
+        self.server = _GatewayServer((self.host, self.port), _GatewayRequestHandler)
+        self.server.gateway = self
+        self.port = self.server.server_address[1]
+        self.threads = [threading.Thread(target=self.server.serve_forever, name="SensorGateway", daemon=True)]
+        for lane in self.queues:
+            self.threads.append(threading.Thread(target=self._dispatch, args=(lane,), name=f"SensorGatewayLane{lane}", daemon=True))
+        for thread in self.threads:
+            thread.start()
+        print(f"传感器网关已启动: {self.host}:{self.port}")
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.stop_event.set()
+        self.server.shutdown()
+        self.server.server_close()
+        for lane_queue in self.queues.values():
+            try:
+                lane_queue.put_nowait(None)
+            except queue.Full:
+                pass
+        for thread in self.threads:
+            thread.join(timeout=1)
+        self.server = None
+        self.threads = []
+
+    def enqueue(self, lane, heart_rates):
+        lane_queue = self.queues.get(lane)
+        if lane_queue is None:
+            with self.stats_lock:
+                self.samples_dropped += len(heart_rates)
+            metrics.increment("sensor_gateway_dropped_samples_total", len(heart_rates))
+            return
+        # 队列满时阻塞，连接线程不再读取套接字，由 TCP 流控向发送端施加背压
+        while not self.stop_event.is_set():
+            try:
+                lane_queue.put(heart_rates, timeout=0.5)
+            except queue.Full:
+                metrics.increment("sensor_gateway_backpressure_total")
+                continue
+            with self.stats_lock:
+                self.samples_received += len(heart_rates)
+            metrics.increment("sensor_gateway_samples_total", len(heart_rates))
+            return
+        # 网关停止时仍未入队的采样计为丢弃
+        with self.stats_lock:
+            self.samples_dropped += len(heart_rates)
+        metrics.increment("sensor_gateway_dropped_samples_total", len(heart_rates))
+
+    def _dispatch(self, lane):
+        lane_queue = self.queues[lane]
+        collector = self.collectors[lane]
+        while not self.stop_event.is_set():
+            batch = lane_queue.get()
+            if batch is None:
+                return
+            heart_rates = list(batch)
+            # 合并已排队的批次，减少唤醒与加锁次数
+            for _ in range(MAX_DISPATCH_BATCHES):
+                try:
+                    batch = lane_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if batch is None:
+                    collector.ingest_batch(heart_rates)
+                    return
+                heart_rates.extend(batch)
+            collector.ingest_batch(heart_rates)
@@ -0,0 +1,359 @@
+"""
+session_archive.py
+Compressed Session Archive Module
+=================================
+This module moves old exercise sessions out of the hot `data/` folder into compressed
+monthly archives so that the history scan in `get_history_record_previews` only has to
+look at recent files, while older sessions stay available to the history window.
+Each month is stored as one ZIP archive (`data/archive/heart_rate_archive_YYYYMM.zip`):
+- Every session CSV is a separately deflate-compressed member, so a single session can
+  be read back without decompressing the rest of the month (random access through the
+  ZIP central directory).
+- An embedded `index.json` member holds the history preview of every session in the
+  archive, so listing archived sessions reads one small member per month.
+- The session's record file (`heart_rate_log_*.records.json`, see `session_records`) is
+  archived as a member next to its CSV and removed, updated and counted with it.
+Archives are always rebuilt into a temporary file and swapped in with `os.replace`,
+and the hot CSV files are only removed after the new archive is on disk.
+Archiving is off by default. It runs at application start only when the
+`archive_after_days` setting is set to a positive number of days, and can be run from code
+(`archive_old_sessions`) or from the command line:
+    python -m core.session_archive --days 90
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import shutil
+import threading
+import zipfile
+
+from core import exercise_data_manager
+from core.exercise_data_manager import get_datetime_from_filename, read_history_record_preview, read_session_samples
+from core.session_records import parse_records, records_filename, session_filename_from_records, update_records_content
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_FOLDER_NAME = "archive"
+INDEX_MEMBER = "index.json"
+
+_archive_lock = threading.RLock()
+_index_cache = {}
+
+
+def get_archive_folder():
+    return os.path.join(exercise_data_manager.DATA_FOLDER, ARCHIVE_FOLDER_NAME)
+
+
+def get_archive_path(filename):
+    month = filename[len("heart_rate_log_"):][:6]
+    return os.path.join(get_archive_folder(), f"heart_rate_archive_{month}.zip")
+
+
+def archive_old_sessions(max_age_days=DEFAULT_ARCHIVE_AFTER_DAYS, now=None):
+    """把早于 max_age_days 天的会话打包进按月归档，返回归档的会话数"""
+    data_folder = exercise_data_manager.DATA_FOLDER
+    if not os.path.exists(data_folder):
+        return 0
+    cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=max_age_days)
+
+    sessions_by_archive = {}
+    for filename in os.listdir(data_folder):
+        if not (filename.startswith("heart_rate_log_") and filename.endswith(".csv")):
+            continue
+        started_at = get_datetime_from_filename({"filename": filename})
+        if started_at == datetime.datetime.min or started_at >= cutoff:
+            continue
+        filepaths = sessions_by_archive.setdefault(get_archive_path(filename), [])
+        filepaths.append(os.path.join(data_folder, filename))
+        records_path = os.path.join(data_folder, records_filename(filename))
+        if os.path.exists(records_path):
+            filepaths.append(records_path)
+
+    archived_count = 0
+    for archive_path, filepaths in sorted(sessions_by_archive.items()):
+        try:
+            with _archive_lock:
+                _rewrite_archive(archive_path, add_paths=filepaths)
+        except (OSError, zipfile.BadZipFile, ValueError) as e:
+            print(f"归档到 {archive_path} 时出错: {e}")
+            continue
+        for filepath in filepaths:
+            _remove_if_exists(filepath)
+            if filepath.endswith(".csv"):
+                # 二进制采样文件可从归档重新生成，不随会话保留
+                _remove_if_exists(os.path.splitext(filepath)[0] + ".hrs")
+                archived_count += 1
+    return archived_count
+
+
+def get_archived_previews():
+    archive_folder = get_archive_folder()
+    if not os.path.exists(archive_folder):
+        return []
+    previews = []
+    for archive_name in os.listdir(archive_folder):
+        if archive_name.startswith("heart_rate_archive_") and archive_name.endswith(".zip"):
+            try:
+                previews.extend(_read_index(os.path.join(archive_folder, archive_name)).values())
+            except (OSError, zipfile.BadZipFile, ValueError) as e:
+                print(f"读取归档 {archive_name} 索引时出错: {e}")
+    return [dict(preview) for preview in previews]
+
+
+def get_archived_preview(filename):
+    """只读取该记录所在月份归档的索引，返回预览信息或 None"""
+    archive_path = get_archive_path(filename)
+    if not os.path.exists(archive_path):
+        return None
+    try:
+        preview = _read_index(archive_path).get(filename)
+    except (OSError, zipfile.BadZipFile, ValueError):
+        return None
+    return dict(preview) if preview else None
+
+
+def is_archived(filename):
+    archive_path = get_archive_path(filename)
+    if not os.path.exists(archive_path):
+        return False
+    try:
+        return filename in _read_index(archive_path)
+    except (OSError, zipfile.BadZipFile, ValueError):
+        return False
+
+
+def load_archived_exercise_data(filename):
+    archive_path = get_archive_path(filename)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            with archive.open(filename) as member:
+                csv_reader = csv.reader(io.TextIOWrapper(member, encoding='utf-8', newline=''))
+                next(csv_reader)
+                return [row for row in csv_reader if row]
+    except (FileNotFoundError, KeyError):
+        print(f"归档中未找到会话: {filename}")
+        return None
+    except Exception as e:
+        print(f"从归档加载运动数据时出错: {e}")
+        return None
+
+
+def load_archived_samples(filename):
+    """返回归档会话的 (时间戳列表, 心率列表)，时间轴与 read_session_samples 相同"""
+    try:
+        with zipfile.ZipFile(get_archive_path(filename)) as archive:
+            with archive.open(filename) as member:
+                return read_session_samples(io.TextIOWrapper(member, encoding='utf-8', newline=''))
+    except (FileNotFoundError, KeyError):
+        print(f"归档中未找到会话: {filename}")
+        return None
+    except Exception as e:
+        print(f"从归档加载心率采样时出错: {e}")
+        return None
+
+
+def load_archived_records(filename):
+    """返回归档会话的记录字典；没有记录时返回空字典，读取失败时返回 None"""
+    try:
+        with zipfile.ZipFile(get_archive_path(filename)) as archive:
+            return parse_records(archive.read(records_filename(filename)).decode('utf-8'))
+    except KeyError:
+        return {}
+    except (OSError, zipfile.BadZipFile, ValueError) as e:
+        print(f"从归档读取会话记录时出错: {e}")
+        return None
+
+
+def update_archived_records(filename, section, value):
+    archive_path = get_archive_path(filename)
+    name = records_filename(filename)
+    with _archive_lock:
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                try:
+                    content = archive.read(name).decode('utf-8')
+                except KeyError:
+                    content = None
+            _rewrite_archive(archive_path, replaced_contents={name: update_records_content(content, section, value)})
+        except (OSError, zipfile.BadZipFile, ValueError) as e:
+            print(f"更新归档会话 {filename} 的记录时出错: {e}")
+            return False
+    return True
+
+
+def update_archived_feedback(filename, feedback_text):
+    archive_path = get_archive_path(filename)
+    with _archive_lock:
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                content = archive.read(filename).decode('utf-8')
+            _rewrite_archive(archive_path, replaced_contents={filename: _with_feedback(content, feedback_text)})
+        except (FileNotFoundError, KeyError):
+            print(f"归档中未找到会话: {filename}")
+            return False
+        except (OSError, zipfile.BadZipFile, ValueError) as e:
+            print(f"更新归档会话 {filename} 的反馈时出错: {e}")
+            return False
+    return True
+
+
+def delete_archived_session(filename):
+    archive_path = get_archive_path(filename)
+    with _archive_lock:
+        if not is_archived(filename):
+            raise FileNotFoundError(filename)
+        _rewrite_archive(archive_path, remove_names={filename, records_filename(filename)})
+
+
+def delete_archived_sessions(filenames):
+    """批量删除归档中的会话，每个月份的归档只重写一次，返回已删除的文件名"""
+    names_by_archive = {}
+    for filename in filenames:
+        names_by_archive.setdefault(get_archive_path(filename), set()).add(filename)
+    deleted = []
+    with _archive_lock:
+        for archive_path, names in names_by_archive.items():
+            if not os.path.exists(archive_path):
+                continue
+            try:
+                names &= set(_read_index(archive_path))
+                if names:
+                    _rewrite_archive(archive_path, remove_names=names | {records_filename(name) for name in names})
+                    deleted.extend(names)
+            except (OSError, zipfile.BadZipFile, ValueError) as e:
+                print(f"从归档 {archive_path} 删除会话时出错: {e}")
+    return deleted
+
+
+def get_archived_session_sizes():
+    """返回 {文件名: 压缩后的字节数}，用于按磁盘占用清理记录"""
+    archive_folder = get_archive_folder()
+    if not os.path.exists(archive_folder):
+        return {}
+    sizes = {}
+    for archive_name in os.listdir(archive_folder):
+        if archive_name.startswith("heart_rate_archive_") and archive_name.endswith(".zip"):
+            try:
+                with zipfile.ZipFile(os.path.join(archive_folder, archive_name)) as archive:
+                    for info in archive.infolist():
+                        if info.filename == INDEX_MEMBER:
+                            continue
+                        filename = session_filename_from_records(info.filename) or info.filename
+                        sizes[filename] = sizes.get(filename, 0) + info.compress_size
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"读取归档 {archive_name} 时出错: {e}")
+    return sizes
+
+
+def _rewrite_archive(archive_path, add_paths=(), remove_names=(), replaced_contents=None):
+    replaced_contents = replaced_contents or {}
+    add_names = {os.path.basename(path) for path in add_paths}
+    index = _read_index(archive_path) if os.path.exists(archive_path) else {}
+
+    archive_folder = os.path.dirname(archive_path)
+    if not os.path.exists(archive_folder):
+        os.makedirs(archive_folder)
+    temp_path = archive_path + ".tmp"
+    written_names = set()
+    with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as new_archive:
+        if os.path.exists(archive_path):
+            with zipfile.ZipFile(archive_path) as old_archive:
+                for info in old_archive.infolist():
+                    name = info.filename
+                    if name == INDEX_MEMBER or name in remove_names or name in add_names:
+                        continue
+                    if name in replaced_contents:
+                        new_archive.writestr(name, replaced_contents[name].encode('utf-8'))
+                        written_names.add(name)
+                        continue
+                    with old_archive.open(info) as src, new_archive.open(name, "w") as dst:
+                        shutil.copyfileobj(src, dst)
+
+        for name in remove_names:
+            index.pop(name, None)
+        for name, content in replaced_contents.items():
+            if name not in written_names:
+                new_archive.writestr(name, content.encode('utf-8'))
+            if session_filename_from_records(name) is not None:
+                continue
+            preview = read_history_record_preview(name, io.StringIO(content, newline=''))
+            if preview:
+                index[name] = preview
+        for path in add_paths:
+            name = os.path.basename(path)
+            new_archive.write(path, name)
+            if session_filename_from_records(name) is not None:
+                continue
+            with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+                preview = read_history_record_preview(name, csvfile)
+            if preview:
+                index[name] = preview
+
+        ordered_index = sorted(index.values(), key=get_datetime_from_filename)
+        new_archive.writestr(INDEX_MEMBER, json.dumps(ordered_index, ensure_ascii=False))
+
+    with open(temp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    if index:
+        os.replace(temp_path, archive_path)
+    else:
+        os.remove(temp_path)
+        _remove_if_exists(archive_path)
+    _index_cache.pop(archive_path, None)
+
+
+def _read_index(archive_path):
+    mtime_ns = os.stat(archive_path).st_mtime_ns
+    cached = _index_cache.get(archive_path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    with zipfile.ZipFile(archive_path) as archive:
+        previews = json.loads(archive.read(INDEX_MEMBER).decode('utf-8'))
+    index = {preview["filename"]: preview for preview in previews}
+    _index_cache[archive_path] = (mtime_ns, index)
+    return index
+
+
+def _with_feedback(content, feedback_text):
+    rows = [row for row in csv.reader(io.StringIO(content, newline='')) if row]
+    if not rows:
+        raise ValueError("会话文件为空")
+    header = rows[0]
+    if "Feedback" not in header:
+        header.append("Feedback")
+    feedback_index = header.index("Feedback")
+    for row in rows[1:]:
+        while len(row) < len(header):
+            row.append("")
+        row[feedback_index] = feedback_text
+    output = io.StringIO(newline='')
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将较早的运动记录打包为按月压缩归档")
+    parser.add_argument("--days", type=int, default=DEFAULT_ARCHIVE_AFTER_DAYS, help="归档早于该天数的记录")
+    args = parser.parse_args()
+    archived_count = archive_old_sessions(args.days)
+    print(f"归档完成: 共归档 {archived_count} 个会话。")
+
+
+if __name__ == '__main__':
+    main()
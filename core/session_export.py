@@ -0,0 +1,380 @@
+"""
+session_export.py
+Session Export Module
+=====================
+This module exports exercise sessions from the session store into one analysis dataset,
+either JSON Lines or Parquet (Parquet requires the optional `pyarrow` package).
+- Each session becomes one record: the session parameters (level, lap distance, age,
+  duration, distance, feedback), the derived summary columns from `heart_rate_analytics`
+  (average / max / min heart rate, peak rolling average, cardiac drift, HRR, time in each
+  zone) and, unless disabled, the heart-rate samples as two list columns. The per-row
+  session columns of the CSV files are therefore not repeated for every sample.
+- Sessions are selected with a `history_search.HistoryQuery` (level, date range, one
+  member's sessions, ...) and streamed in chronological order. Only one session's samples
+  are held at a time for JSON Lines; Parquet rows are buffered up to `chunk_samples`
+  samples and written as one row group, so memory stays bounded for any history size.
+- The dataset is a folder of part files plus `_export_state.json`, which records the
+  exported sessions. Every run writes a new part with the sessions not exported yet, so
+  repeated runs are incremental; `full=True` rewrites the dataset from scratch (e.g. to
+  pick up feedback edited after the previous export). A part is written to a temporary
+  file and renamed only when complete, and the state is saved after that.
+    python -m core.session_export exports/sessions --format parquet --start-date 2026-01-01
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import datetime
+import json
+import os
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from core import metrics
+from core.exercise_data_manager import get_datetime_from_filename
+from core.heart_rate_analytics import get_session_analytics
+from core.history_search import HistoryQuery
+from core.session_store import DEFAULT_SQLITE_PATH, create_session_store
+from core.user_profiles import UserProfileStore
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+EXPORT_STATE_FILENAME = "_export_state.json"
+EXPORT_STATE_VERSION = 1
+DEFAULT_CHUNK_SAMPLES = 200000
+TIMESTAMP_DECIMALS = 3
+# (列名, Parquet 类型)，类型名对应 pyarrow 的构造函数
+SUMMARY_COLUMNS = (
+    ("filename", "string"),
+    ("started_at", "string"),
+    ("level", "string"),
+    ("lap_distance", "float64"),
+    ("age", "int64"),
+    ("duration_seconds", "float64"),
+    ("exercise_distance", "float64"),
+    ("feedback", "string"),
+    ("sample_count", "int64"),
+    ("average_heart_rate", "float64"),
+    ("max_heart_rate", "int64"),
+    ("min_heart_rate", "int64"),
+    ("peak_rolling_average", "float64"),
+    ("drift_percent", "float64"),
+    ("drift_slope_bpm_per_min", "float64"),
+    ("hrr_60", "float64"),
+    ("hrr_120", "float64"),
+    ("zone_method", "string"),
+)
+ANALYTICS_COLUMNS = {
+    "sample_count": "sample_count",
+    "average_heart_rate": "average",
+    "max_heart_rate": "max",
+    "min_heart_rate": "min",
+    "peak_rolling_average": "peak_rolling_average",
+    "drift_percent": "drift_percent",
+    "drift_slope_bpm_per_min": "drift_slope_bpm_per_min",
+    "hrr_60": "hrr_60",
+    "hrr_120": "hrr_120",
+    "zone_method": "zone_method",
+}
+
+
+class JsonLinesPartWriter:
+    """逐条写入 JSON Lines，内存中只保留当前会话"""
+
+    def __init__(self, path, include_samples, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+        self.include_samples = include_samples
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record, timestamps, heart_rates):
+        if self.include_samples:
+            record = dict(record)
+            record["timestamps"] = np.round(timestamps.astype(np.float64), TIMESTAMP_DECIMALS).tolist()
+            record["heart_rates"] = heart_rates.tolist()
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetPartWriter:
+    """按列缓存会话，累计 chunk_samples 个采样后写出一个行组"""
+
+    def __init__(self, path, include_samples, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+        if pa is None:
+            raise RuntimeError("需要安装 pyarrow 才能导出 Parquet 格式。")
+        self.include_samples = include_samples
+        self.chunk_samples = chunk_samples
+        self.schema = get_parquet_schema(include_samples)
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self.columns = {name: [] for name, _ in SUMMARY_COLUMNS + (("time_in_zone_seconds", None),)}
+        self.timestamps = []
+        self.heart_rates = []
+        self.buffered_samples = 0
+
+    def write(self, record, timestamps, heart_rates):
+        for name, values in self.columns.items():
+            values.append(record.get(name))
+        if self.include_samples:
+            self.timestamps.append(timestamps.copy())
+            self.heart_rates.append(heart_rates.copy())
+        self.buffered_samples += len(heart_rates) + 1
+        if self.buffered_samples >= self.chunk_samples:
+            self.flush()
+
+    def flush(self):
+        if not self.columns["filename"]:
+            return
+        arrays = [pa.array(self.columns[field.name], type=field.type) for field in self.schema
+                  if field.name in self.columns]
+        if self.include_samples:
+            arrays.append(_list_array(self.timestamps, np.float32))
+            arrays.append(_list_array(self.heart_rates, np.uint16))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self._reset_buffer()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.writer.close()
+
+
+PART_WRITERS = {"jsonl": JsonLinesPartWriter, "parquet": ParquetPartWriter}
+
+
+def get_parquet_schema(include_samples=True):
+    fields = [pa.field(name, getattr(pa, type_name)()) for name, type_name in SUMMARY_COLUMNS]
+    fields.append(pa.field("time_in_zone_seconds", pa.list_(pa.float64())))
+    if include_samples:
+        fields.append(pa.field("timestamps", pa.list_(pa.float32())))
+        fields.append(pa.field("heart_rates", pa.list_(pa.uint16())))
+    return pa.schema(fields)
+
+
+def _list_array(chunks, dtype):
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int32)
+    np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+    values = np.concatenate(chunks).astype(dtype, copy=False) if chunks else np.empty(0, dtype=dtype)
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values))
+
+
+def build_session_record(preview, analytics):
+    """由预览与分析摘要构造导出记录的汇总列"""
+    record = {
+        "filename": preview["filename"],
+        "started_at": get_datetime_from_filename(preview).strftime("%Y-%m-%d %H:%M:%S"),
+        "level": _to_text(preview.get("level")),
+        "lap_distance": _to_float(preview.get("lap_distance")),
+        "age": _to_int(preview.get("age")),
+        "duration_seconds": _to_float(preview.get("duration_seconds")),
+        "exercise_distance": _to_float(preview.get("exercise_distance")),
+        "feedback": preview.get("feedback") or "",
+    }
+    analytics = analytics or {}
+    for column, key in ANALYTICS_COLUMNS.items():
+        record[column] = analytics.get(key)
+    record["time_in_zone_seconds"] = analytics.get("time_in_zone_seconds")
+    return record
+
+
+class ExportState:
+    """数据集目录中的导出状态：格式、分片文件与已导出的会话"""
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, EXPORT_STATE_FILENAME)
+        self.format = None
+        self.parts = []
+        self.exported = set()
+        self.last_export = None
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"读取导出状态文件时出错: {e}")
+        if content.get("version") != EXPORT_STATE_VERSION:
+            raise ValueError(f"不支持的导出状态文件版本: {content.get('version')}")
+        self.format = content.get("format")
+        self.parts = content.get("parts", [])
+        self.exported = set(content.get("exported", []))
+        self.last_export = content.get("last_export")
+
+    def save(self):
+        content = {
+            "version": EXPORT_STATE_VERSION,
+            "format": self.format,
+            "parts": self.parts,
+            "exported": sorted(self.exported),
+            "last_export": self.last_export,
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+def export_sessions(store, output_folder, export_format="jsonl", query=None, full=False, include_samples=True,
+                    chunk_samples=DEFAULT_CHUNK_SAMPLES):
+    """将符合 query 的会话导出到 output_folder 数据集，返回 (导出数, 跳过数, 失败数, 分片路径或 None)
+
+    格式不受支持、缺少 pyarrow 或数据集已使用其他格式时抛出 ValueError / RuntimeError。
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {export_format}")
+    if export_format == "parquet" and pa is None:
+        raise RuntimeError("需要安装 pyarrow 才能导出 Parquet 格式。")
+    os.makedirs(output_folder, exist_ok=True)
+    state = ExportState(output_folder)
+    if state.format not in (None, export_format) and not full:
+        raise ValueError(f"数据集已使用 {state.format} 格式，请使用相同格式或完整重新导出。")
+
+    query = query or HistoryQuery()
+    previews = sorted(store.search(query), key=get_datetime_from_filename)
+    if full:
+        pending = previews
+    else:
+        pending = [preview for preview in previews if preview["filename"] not in state.exported]
+    skipped = len(previews) - len(pending)
+    if not pending:
+        return 0, skipped, 0, None
+
+    now = datetime.datetime.now()
+    part_name = f"part-{now.strftime('%Y%m%d-%H%M%S-%f')}.{export_format}"
+    part_path = os.path.join(output_folder, part_name)
+    temp_path = part_path + ".tmp"
+    exported = []
+    failed = 0
+    with metrics.timer("session_export_seconds"):
+        writer = PART_WRITERS[export_format](temp_path, include_samples, chunk_samples)
+        try:
+            for preview in pending:
+                if _export_session(store, writer, preview, include_samples):
+                    exported.append(preview["filename"])
+                else:
+                    failed += 1
+        except BaseException:
+            writer.close()
+            os.remove(temp_path)
+            raise
+        writer.close()
+    if not exported:
+        os.remove(temp_path)
+        return 0, skipped, failed, None
+    os.replace(temp_path, part_path)
+
+    if full:
+        # 新分片完整写出后再删除旧分片，中途失败时旧数据集仍然可用
+        for old_part in state.parts:
+            old_path = os.path.join(output_folder, old_part)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        state.parts = []
+        state.exported = set()
+    state.format = export_format
+    state.parts.append(part_name)
+    state.exported.update(exported)
+    state.last_export = now.strftime("%Y-%m-%d %H:%M:%S")
+    state.save()
+    metrics.increment("exported_sessions_total", len(exported))
+    return len(exported), skipped, failed, part_path
+
+
+def _export_session(store, writer, preview, include_samples):
+    filename = preview["filename"]
+    age = _to_int(preview.get("age"))
+    analytics = None
+    if age is not None:
+        try:
+            analytics = get_session_analytics(store, filename, age)
+        except Exception as e:
+            print(f"计算会话 {filename} 的心率分析时出错: {e}")
+    record = build_session_record(preview, analytics)
+    if not include_samples:
+        writer.write(record, None, ())
+        return True
+    session_samples = store.load_samples(filename)
+    if session_samples is None:
+        print(f"无法读取会话 {filename} 的心率采样，已跳过。")
+        return False
+    try:
+        writer.write(record, *session_samples.as_arrays())
+    finally:
+        session_samples.close()
+    return True
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value):
+    if value is None or value in ("", "N/A"):
+        return None
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将运动记录导出为 JSON Lines 或 Parquet 数据集 (默认增量导出)")
+    parser.add_argument("output", help="数据集目录")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl", help="导出格式，Parquet 需要 pyarrow")
+    parser.add_argument("--backend", choices=("csv", "sqlite"), default="csv", help="会话存储后端")
+    parser.add_argument("--db", default=DEFAULT_SQLITE_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--level", default=None, help="只导出该等级的记录")
+    parser.add_argument("--start-date", default=None, help="开始日期 (YYYY-MM-DD，含当天)")
+    parser.add_argument("--end-date", default=None, help="结束日期 (YYYY-MM-DD，含当天)")
+    parser.add_argument("--user", default=None, help="只导出该用户的记录 (用户名)")
+    parser.add_argument("--full", action="store_true", help="忽略导出状态，完整重新导出数据集")
+    parser.add_argument("--no-samples", action="store_true", help="只导出汇总列，不导出逐秒心率")
+    parser.add_argument("--chunk-samples", type=int, default=DEFAULT_CHUNK_SAMPLES, help="Parquet 每个行组的采样数上限")
+    args = parser.parse_args()
+
+    filenames = None
+    if args.user:
+        user_profiles = UserProfileStore()
+        profile = user_profiles.find_by_name(args.user)
+        if profile is None:
+            print(f"未找到用户: {args.user}")
+            return
+        filenames = user_profiles.get_session_filenames(profile["user_id"])
+    query = HistoryQuery(level=args.level, start_date=args.start_date, end_date=args.end_date, filenames=filenames)
+    store = create_session_store(args.backend, args.db)
+    try:
+        exported, skipped, failed, part_path = export_sessions(
+            store, args.output, args.format, query, args.full, not args.no_samples, args.chunk_samples)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"导出失败: {e}")
+        return
+    finally:
+        store.close()
+    print(f"导出完成: 新导出 {exported} 个，已导出跳过 {skipped} 个，失败 {failed} 个。")
+    if part_path:
+        print(f"已写入: {part_path}")
+
+
+if __name__ == '__main__':
+    main()
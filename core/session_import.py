@@ -0,0 +1,309 @@
+"""
+session_import.py
+Parallel Session Import Module
+==============================
+This module imports `heart_rate_log_*.csv` files collected from many kiosks into the
+configured session store (CSV data folder or SQLite database).
+- Files are parsed in a process pool. Each worker streams its file row by row, maps the
+  header variants found in older or third-party exports (e.g. `Heart Rate`, `HR`,
+  `lap_distance`, `Duration`) to the canonical columns and validates the samples
+  (numeric heart rates within `MIN_HEART_RATE`..`MAX_HEART_RATE`, a valid file name).
+  A heart rate of 0 is the value the collector records while the sensor is disconnected:
+  such dropout samples are kept and counted, not treated as invalid.
+- Each sample keeps its time on the session's time axis (`Elapsed(seconds)`, or the 1 Hz
+  `Second` column in older files, see `session_store.load_samples`), and the session's
+  record file (`session_records`: recovery and lap records) is imported with it.
+- The main process deduplicates the parsed sessions: the same session pulled from two
+  kiosks (same samples, timestamps and parameters) is imported once, a file name seen twice with different content
+  is reported as a conflict, and sessions already in the store are skipped unless
+  `--overwrite` is given.
+- Valid sessions are written with `save_batch` in batches of `--batch-size` sessions.
+At the end the importer reports the counts, the throughput (files, samples and MB per
+second) and the bad files with the reason they were rejected:
+    python -m core.session_import kiosk_a/ kiosk_b/ --backend sqlite --db data/sessions.db
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import multiprocessing
+import os
+import time
+from array import array
+
+from core.session_records import load_session_records, records_filename
+from core.session_store import DEFAULT_SQLITE_PATH, create_session_store
+
+MIN_HEART_RATE = 20
+MAX_HEART_RATE = 250
+DROPOUT_HEART_RATE = 0
+DEFAULT_IMPORT_BATCH_SIZE = 50
+SESSION_FILE_PREFIX = "heart_rate_log_"
+SESSION_FILE_EXTENSION = ".csv"
+
+# 标准列名及其在不同导出版本中的别名 (比较时忽略大小写、空格和标点)
+COLUMN_ALIASES = {
+    "HeartRate": ("HeartRate", "Heart Rate", "HR", "heart_rate", "HeartRate(bpm)", "bpm"),
+    "Elapsed(seconds)": ("Elapsed(seconds)", "Elapsed", "elapsed_seconds", "Elapsed(s)"),
+    "Second": ("Second", "Seconds"),
+    "Level": ("Level", "等级"),
+    "LapDistance": ("LapDistance", "Lap Distance", "lap_distance", "LapDistance(m)", "圈程距离"),
+    "Age": ("Age", "年龄"),
+    "Duration(seconds)": ("Duration(seconds)", "Duration", "duration_seconds", "Duration(s)"),
+    "Laps": ("Laps", "LapsCompleted", "laps_completed"),
+    "Distance(meters)": ("Distance(meters)", "Distance", "exercise_distance", "Distance(m)"),
+    "Feedback": ("Feedback", "反馈"),
+}
+SESSION_FIELDS = ("Level", "LapDistance", "Age", "Duration(seconds)", "Laps", "Distance(meters)", "Feedback")
+
+
+def _normalize_column_name(name):
+    return "".join(character for character in name.lower() if character.isalnum())
+
+
+_ALIAS_LOOKUP = {_normalize_column_name(alias): column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+def map_header(header):
+    """返回 {标准列名: 列序号}，同一标准列出现多次时取第一列"""
+    columns = {}
+    for index, name in enumerate(header):
+        column = _ALIAS_LOOKUP.get(_normalize_column_name(name))
+        if column is not None and column not in columns:
+            columns[column] = index
+    return columns
+
+
+def is_session_filename(filename):
+    if not (filename.startswith(SESSION_FILE_PREFIX) and filename.endswith(SESSION_FILE_EXTENSION)):
+        return False
+    try:
+        datetime.datetime.strptime(filename[len(SESSION_FILE_PREFIX):-len(SESSION_FILE_EXTENSION)], "%Y%m%d-%H%M%S")
+    except ValueError:
+        return False
+    return True
+
+
+def find_session_files(paths):
+    """展开命令行给出的文件与目录 (递归)，返回会话文件路径列表"""
+    session_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, filenames in os.walk(path):
+                session_files.extend(os.path.join(folder, filename) for filename in sorted(filenames)
+                                     if filename.startswith(SESSION_FILE_PREFIX) and filename.endswith(SESSION_FILE_EXTENSION))
+        else:
+            session_files.append(path)
+    return session_files
+
+
+def parse_session_file(path):
+    """在工作进程中解析并校验一个会话文件
+
+    返回 (path, status, result)：status 为 "ok" 时 result 为
+    (session, digest, sample_count, dropout_count, byte_count, records)，session 可直接传给 `save_batch`，
+    records 为同目录下的会话记录 (没有时为空字典，无法解析时为 None)；为 "empty" 或 "bad" 时 result 为原因说明。
+    """
+    filename = os.path.basename(path)
+    if not is_session_filename(filename):
+        return path, "bad", "文件名不是 heart_rate_log_YYYYmmdd-HHMMSS.csv"
+    try:
+        byte_count = os.path.getsize(path)
+        with open(path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+            csv_reader = csv.reader(csvfile)
+            header = next(csv_reader, None)
+            if not header:
+                return path, "empty", "文件为空"
+            columns = map_header(header)
+            if "HeartRate" not in columns:
+                return path, "bad", "缺少心率列"
+            heart_rate_index = columns["HeartRate"]
+            # 时间轴与 read_session_samples 相同：优先 Elapsed(seconds)，其次 Second，都没有时按 1 Hz 序号
+            elapsed_index = columns.get("Elapsed(seconds)")
+            second_index = columns.get("Second")
+            heart_rates = array("H")
+            timestamps = array("d")
+            dropout_count = 0
+            first_row = None
+            for line_number, row in enumerate(csv_reader, 2):
+                if not row or not any(cell.strip() for cell in row):
+                    continue
+                try:
+                    heart_rate = int(float(row[heart_rate_index]))
+                except (IndexError, ValueError):
+                    return path, "bad", f"第 {line_number} 行心率无效"
+                if heart_rate == DROPOUT_HEART_RATE:
+                    # 传感器断开时记录为 0，保留为脱落采样
+                    dropout_count += 1
+                elif not MIN_HEART_RATE <= heart_rate <= MAX_HEART_RATE:
+                    return path, "bad", f"第 {line_number} 行心率超出范围: {heart_rate}"
+                try:
+                    if elapsed_index is not None and elapsed_index < len(row) and row[elapsed_index].strip():
+                        timestamps.append(float(row[elapsed_index]))
+                    elif second_index is not None:
+                        timestamps.append(float(row[second_index]))
+                    else:
+                        timestamps.append(float(len(timestamps) + 1))
+                except (IndexError, ValueError):
+                    return path, "bad", f"第 {line_number} 行时间无效"
+                if first_row is None:
+                    first_row = row
+                heart_rates.append(heart_rate)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        return path, "bad", str(e)
+    if first_row is None:
+        return path, "empty", "没有心率数据"
+
+    fields = []
+    for column in SESSION_FIELDS:
+        index = columns.get(column)
+        value = first_row[index].strip() if index is not None and index < len(first_row) else ""
+        fields.append(value if value or column == "Feedback" else None)
+    digest = hashlib.sha1(heart_rates.tobytes())
+    digest.update(timestamps.tobytes())
+    digest.update(repr(fields[:-1]).encode("utf-8"))
+    session = (filename, heart_rates.tolist(), *fields, timestamps.tolist())
+    records = load_session_records(os.path.join(os.path.dirname(path), records_filename(filename)))
+    return path, "ok", (session, digest.hexdigest(), len(heart_rates), dropout_count, byte_count, records)
+
+
+class ImportReport:
+    def __init__(self):
+        self.files = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.existing = 0
+        self.empty = 0
+        self.failed_writes = 0
+        self.samples = 0
+        self.dropout_samples = 0
+        self.dropout_files = 0
+        self.records = 0
+        self.bytes = 0
+        self.bad_files = []
+        self.bad_records = []
+        self.conflicts = []
+        self.elapsed_seconds = 0.0
+
+    def print_summary(self, max_listed=20):
+        elapsed = max(self.elapsed_seconds, 1e-9)
+        print(f"扫描 {self.files} 个文件，用时 {self.elapsed_seconds:.2f} 秒: "
+              f"{self.files / elapsed:.0f} 文件/秒，{self.samples / elapsed:.0f} 采样/秒，{self.bytes / elapsed / 1e6:.1f} MB/秒")
+        print(f"导入 {self.imported} 个，重复 {self.duplicates} 个，已存在 {self.existing} 个，空文件 {self.empty} 个，"
+              f"冲突 {len(self.conflicts)} 个，无效 {len(self.bad_files)} 个，写入失败 {self.failed_writes} 个。")
+        if self.dropout_samples:
+            print(f"{self.dropout_files} 个文件含有 {self.dropout_samples} 个心率为 0 的脱落采样，已按原样导入。")
+        if self.records:
+            print(f"导入 {self.records} 个会话记录文件 (恢复心率与圈程记录)。")
+        for path in self.bad_records[:max_listed]:
+            print(f"  {path}: 会话记录文件无法解析，会话已导入但未导入其记录")
+        for path, reason in (self.bad_files + self.conflicts)[:max_listed]:
+            print(f"  {path}: {reason}")
+        remaining = len(self.bad_files) + len(self.conflicts) - max_listed
+        if remaining > 0:
+            print(f"  ... 另有 {remaining} 个文件未列出")
+
+    def write_bad_files(self, report_path):
+        with open(report_path, 'w', newline='', encoding='utf-8') as csvfile:
+            csv_writer = csv.writer(csvfile)
+            csv_writer.writerow(["Path", "Reason"])
+            csv_writer.writerows(self.bad_files + self.conflicts)
+
+
+def import_sessions(store, paths, workers=None, batch_size=DEFAULT_IMPORT_BATCH_SIZE, overwrite=False):
+    """并行解析 paths 中的会话文件并分批写入 store，返回 ImportReport"""
+    report = ImportReport()
+    start_time = time.perf_counter()
+    session_files = find_session_files(paths)
+    report.files = len(session_files)
+    seen_digests = {}
+    batch = []
+    batch_records = {}
+
+    def write_batch():
+        saved = store.save_batch(batch)
+        report.imported += saved
+        report.failed_writes += len(batch) - saved
+        # 记录须在会话写入之后保存：重新保存会话会清除其旧记录
+        for filename, records in batch_records.items():
+            if saved == len(batch) or store.has_session(filename):
+                if records.get("recovery"):
+                    store.save_recovery(filename, records["recovery"])
+                if records.get("laps"):
+                    store.save_laps(filename, records["laps"])
+                report.records += 1
+        batch.clear()
+        batch_records.clear()
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(64, len(session_files) // (workers * 4)))
+    with multiprocessing.Pool(workers) as pool:
+        # 按输入顺序取回结果，使去重时保留的版本与进程调度无关
+        for path, status, result in pool.imap(parse_session_file, session_files, chunksize):
+            if status == "bad":
+                report.bad_files.append((path, result))
+                continue
+            if status == "empty":
+                report.empty += 1
+                continue
+            session, digest, sample_count, dropout_count, byte_count, records = result
+            report.samples += sample_count
+            if dropout_count:
+                report.dropout_samples += dropout_count
+                report.dropout_files += 1
+            report.bytes += byte_count
+            filename = session[0]
+            if filename in seen_digests:
+                if seen_digests[filename] == digest:
+                    report.duplicates += 1
+                else:
+                    report.conflicts.append((path, "与先前导入的同名会话内容不同，已跳过"))
+                continue
+            seen_digests[filename] = digest
+            if not overwrite and store.has_session(filename):
+                report.existing += 1
+                continue
+            batch.append(session)
+            if records is None:
+                report.bad_records.append(path)
+            elif records.get("recovery") or records.get("laps"):
+                batch_records[filename] = records
+            if len(batch) >= batch_size:
+                write_batch()
+    if batch:
+        write_batch()
+    report.elapsed_seconds = time.perf_counter() - start_time
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行导入、校验并去重多台设备的 CSV 运动记录")
+    parser.add_argument("paths", nargs="+", help="会话 CSV 文件或包含会话文件的目录 (递归查找)")
+    parser.add_argument("--backend", choices=("csv", "sqlite"), default="sqlite", help="目标存储后端")
+    parser.add_argument("--db", default=DEFAULT_SQLITE_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数，默认为 CPU 核数")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE, help="每批写入的会话数")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖存储中已存在的会话")
+    parser.add_argument("--bad-files-report", default=None, help="将无效与冲突文件列表写入该 CSV 文件")
+    args = parser.parse_args()
+
+    store = create_session_store(args.backend, args.db)
+    try:
+        report = import_sessions(store, args.paths, args.workers, args.batch_size, args.overwrite)
+    finally:
+        store.close()
+    report.print_summary()
+    if args.bad_files_report:
+        report.write_bad_files(args.bad_files_report)
+        print(f"无效文件列表已写入: {args.bad_files_report}")
+
+
+if __name__ == '__main__':
+    main()
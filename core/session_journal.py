@@ -0,0 +1,171 @@
+"""
+session_journal.py
+Session Write-Ahead Journal Module
+==================================
+This module keeps a write-ahead journal for the exercise session in progress, so that
+heart-rate data collected by `HeartRateCollector` survives a crash or power loss before
+`stop_exercise` gets to save the session.
+Journal files live in `data/journal/` and are named after the session file
+(`heart_rate_log_YYYYmmdd-HHMMSS.journal`). They are plain text, one record per line:
+- `H <json>`: session header (level, lap distance, age, user id, start time).
+- `S <elapsed seconds> <heart rate>`: one heart-rate sample.
+- `P <laps completed> <distance in meters>`: progress recorded at each completed lap.
+Appends only go to the file buffer; a background thread flushes and fsyncs the journal
+at a configurable interval (group commit), so the acquisition path never waits on the
+disk. A torn last line is ignored on recovery.
+On the next launch `recover_session_journals` rebuilds each leftover journal into a
+regular session through the configured session store and removes the journal; when
+the header names a user, the recovered session is added to that user's profile index.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import json
+import os
+import threading
+import time
+
+from core import exercise_data_manager
+
+DEFAULT_FSYNC_INTERVAL = 1.0
+JOURNAL_FOLDER_NAME = "journal"
+JOURNAL_EXTENSION = ".journal"
+
+
+def get_journal_folder():
+    return os.path.join(exercise_data_manager.DATA_FOLDER, JOURNAL_FOLDER_NAME)
+
+
+def get_journal_path(filename):
+    return os.path.join(get_journal_folder(), os.path.splitext(filename)[0] + JOURNAL_EXTENSION)
+
+
+class SessionJournal:
+    def __init__(self, filename, level, lap_distance, age, fsync_interval=DEFAULT_FSYNC_INTERVAL, user_id=None):
+        self.filename = filename
+        self.path = get_journal_path(filename)
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.closed = False
+        self.stop_event = threading.Event()
+
+        journal_folder = os.path.dirname(self.path)
+        if not os.path.exists(journal_folder):
+            os.makedirs(journal_folder)
+        self.file = open(self.path, 'w', encoding='utf-8')
+        header = {"filename": filename, "level": level, "lap_distance": lap_distance, "age": age, "user_id": user_id,
+                  "started_at": time.time()}
+        self.file.write("H " + json.dumps(header, ensure_ascii=False) + "\n")
+        self._sync()
+
+        self.flush_thread = threading.Thread(target=self._flush_periodically, name="SessionJournalFlush", daemon=True)
+        self.flush_thread.start()
+
+    def append_sample(self, relative_timestamp, heart_rate):
+        with self.lock:
+            if not self.closed:
+                self.file.write(f"S {relative_timestamp:.3f} {heart_rate}\n")
+                self.dirty = True
+
+    def record_progress(self, laps_completed, distance_meters):
+        with self.lock:
+            if not self.closed:
+                self.file.write(f"P {laps_completed} {distance_meters:.2f}\n")
+                self.dirty = True
+
+    def close(self, discard=False):
+        """关闭日志；会话已成功保存时 discard=True 删除日志文件"""
+        self.stop_event.set()
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._sync()
+            self.file.close()
+        if discard:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _flush_periodically(self):
+        while not self.stop_event.wait(self.fsync_interval):
+            with self.lock:
+                if self.closed:
+                    return
+                if self.dirty:
+                    try:
+                        self._sync()
+                    except OSError as e:
+                        print(f"写入会话日志时出错: {e}")
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.dirty = False
+
+
+def list_session_journals():
+    journal_folder = get_journal_folder()
+    if not os.path.exists(journal_folder):
+        return []
+    return sorted(os.path.join(journal_folder, name) for name in os.listdir(journal_folder) if name.endswith(JOURNAL_EXTENSION))
+
+
+def read_session_journal(journal_path):
+    """解析日志文件，返回 (header, session_data, laps_completed, distance_meters)"""
+    header = None
+    session_data = []
+    laps_completed = 0
+    distance_meters = 0.0
+    with open(journal_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # 断电时未写完的最后一行
+            record_type, _, payload = line.rstrip("\n").partition(" ")
+            try:
+                if record_type == "H":
+                    header = json.loads(payload)
+                elif record_type == "S":
+                    relative_timestamp, heart_rate = payload.split()
+                    session_data.append((float(relative_timestamp), int(heart_rate)))
+                elif record_type == "P":
+                    laps, distance = payload.split()
+                    laps_completed, distance_meters = int(laps), float(distance)
+            except ValueError:
+                break
+    return header, session_data, laps_completed, distance_meters
+
+
+def recover_session_journals(session_store, journal_paths=None, user_profiles=None):
+    """将遗留的会话日志重建为会话记录，返回恢复的会话数"""
+    recovered_count = 0
+    for journal_path in (list_session_journals() if journal_paths is None else journal_paths):
+        try:
+            header, session_data, laps_completed, distance_meters = read_session_journal(journal_path)
+        except OSError as e:
+            print(f"读取会话日志 {journal_path} 时出错: {e}")
+            continue
+        if header is None:
+            print(f"会话日志 {journal_path} 缺少头信息，已跳过。")
+            continue
+        if session_data:
+            duration_seconds = int(session_data[-1][0])
+            saved = session_store.save(header["filename"], session_data, header.get("level"), header.get("lap_distance"),
+                                       header.get("age"), duration_seconds, laps_completed, distance_meters)
+            if not saved:
+                continue
+            print(f"已从会话日志恢复运动数据: {header['filename']}")
+            if user_profiles is not None and header.get("user_id"):
+                user_profiles.add_session(header["user_id"], header["filename"])
+            recovered_count += 1
+        try:
+            os.remove(journal_path)
+        except OSError as e:
+            print(f"删除会话日志 {journal_path} 时出错: {e}")
+    return recovered_count
@@ -0,0 +1,94 @@
+"""
+session_records.py
+Per-Session Record Files
+========================
+This module stores the records measured during or after a session that are not part of
+the heart-rate CSV itself: the post-exercise heart-rate recovery (`recovery_measurement`)
+and the per-lap segment table (`lap_records`). They are kept in one small JSON file next to the session's CSV
+file (`heart_rate_log_YYYYmmdd-HHMMSS.records.json`), owned by the session like the CSV:
+- The file is never treated as a cache: it is only removed together with the session,
+  is moved into the monthly archive together with the CSV (`session_archive`) and counts
+  towards the session's size in the retention policy.
+- Every update rewrites the whole file atomically (temporary file + fsync + `os.replace`),
+  so a crash leaves either the previous or the new version on disk.
+- A file that cannot be parsed is reported and never overwritten, so records written by a
+  newer version are not lost.
+The file holds one JSON object with one section per record:
+`{"version": 1, "recovery": {...}, "laps": [...]}`.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import json
+import os
+import threading
+
+RECORDS_FILE_EXTENSION = ".records.json"
+RECORDS_VERSION = 1
+
+_records_lock = threading.Lock()
+
+
+def records_filename(filename):
+    base, _ = os.path.splitext(filename)
+    return base + RECORDS_FILE_EXTENSION
+
+
+def session_filename_from_records(records_name):
+    """由记录文件名得到会话 CSV 文件名，不是记录文件时返回 None"""
+    if not records_name.endswith(RECORDS_FILE_EXTENSION):
+        return None
+    return records_name[:-len(RECORDS_FILE_EXTENSION)] + ".csv"
+
+
+def parse_records(content):
+    records = json.loads(content)
+    if not isinstance(records, dict):
+        raise ValueError("会话记录文件格式无效")
+    return records
+
+
+def load_session_records(filepath):
+    """返回会话记录字典；文件不存在时返回空字典，无法解析时返回 None"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return parse_records(f.read())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"读取会话记录文件 {filepath} 时出错: {e}")
+        return None
+
+
+def update_records_content(content, section, value):
+    """返回更新 section 后的记录文件内容，content 为 None 表示新建"""
+    records = parse_records(content) if content is not None else {}
+    records["version"] = RECORDS_VERSION
+    records[section] = value
+    return json.dumps(records, ensure_ascii=False, indent=1)
+
+
+def update_session_records(filepath, section, value):
+    """原子地更新会话记录文件中的一项，返回是否成功"""
+    with _records_lock:
+        try:
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = None
+            new_content = update_records_content(content, section, value)
+            temp_path = filepath + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(new_content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, filepath)
+        except (OSError, ValueError) as e:
+            print(f"保存会话记录文件 {filepath} 时出错: {e}")
+            return False
+    return True
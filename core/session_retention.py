@@ -0,0 +1,120 @@
+"""
+session_retention.py
+Session Retention Module
+========================
+This module enforces a retention policy on the exercise history so the kiosk's disk does
+not fill up with old sessions.
+- `RetentionPolicy` selects the sessions to delete, oldest first: sessions older than
+  `max_age_days`, then the oldest sessions beyond `max_sessions`, then the oldest ones
+  until the history fits in `max_disk_mb` (sizes from `SessionStore.get_session_sizes`).
+  A limit of 0 or None is disabled.
+- `RetentionWorker` applies the policy on a background thread at a fixed interval. It
+  deletes in small batches through `SessionStore.delete_batch`, so the history catalog,
+  the search index and the user profiles are updated incrementally, and it waits while
+  an exercise session is running so the deletes never compete with data acquisition.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import datetime
+import threading
+
+from core import metrics
+from core.exercise_data_manager import get_datetime_from_filename
+
+DEFAULT_RETENTION_INTERVAL_MINUTES = 60
+RETENTION_DELETE_BATCH_SIZE = 20
+ACTIVE_SESSION_POLL_SECONDS = 5.0
+
+
+class RetentionPolicy:
+    def __init__(self, max_age_days=None, max_sessions=None, max_disk_mb=None):
+        self.max_age_days = max_age_days or None
+        self.max_sessions = max_sessions or None
+        self.max_disk_mb = max_disk_mb or None
+
+    def is_enabled(self):
+        return any((self.max_age_days, self.max_sessions, self.max_disk_mb))
+
+    def select_expired(self, previews, sizes=None, now=None):
+        """返回需要删除的文件名，最旧的在前"""
+        previews = sorted(previews, key=get_datetime_from_filename)
+        now = now or datetime.datetime.now()
+        expired_count = 0
+        if self.max_age_days:
+            cutoff = now - datetime.timedelta(days=self.max_age_days)
+            while expired_count < len(previews) and get_datetime_from_filename(previews[expired_count]) < cutoff:
+                expired_count += 1
+        if self.max_sessions and len(previews) - expired_count > self.max_sessions:
+            expired_count = len(previews) - self.max_sessions
+        if self.max_disk_mb and sizes is not None:
+            remaining_bytes = sum(sizes.get(preview["filename"], 0) for preview in previews[expired_count:])
+            max_bytes = self.max_disk_mb * 1024 * 1024
+            while remaining_bytes > max_bytes and expired_count < len(previews):
+                remaining_bytes -= sizes.get(previews[expired_count]["filename"], 0)
+                expired_count += 1
+        return [preview["filename"] for preview in previews[:expired_count]]
+
+
+class RetentionWorker:
+    def __init__(self, session_store, policy, is_session_active=None, interval_minutes=DEFAULT_RETENTION_INTERVAL_MINUTES,
+                 user_profiles=None, batch_size=RETENTION_DELETE_BATCH_SIZE):
+        self.session_store = session_store
+        self.policy = policy
+        self.is_session_active = is_session_active or (lambda: False)
+        self.interval_minutes = interval_minutes
+        self.user_profiles = user_profiles
+        self.batch_size = batch_size
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None or not self.policy.is_enabled():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="SessionRetention", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"清理历史记录时出错: {e}")
+            self.stop_event.wait(self.interval_minutes * 60)
+
+    def run_once(self):
+        """执行一次清理，返回删除的会话数"""
+        if not self._wait_until_idle():
+            return 0
+        sizes = self.session_store.get_session_sizes() if self.policy.max_disk_mb else None
+        expired = self.policy.select_expired(self.session_store.preview(), sizes)
+        deleted_count = 0
+        for start in range(0, len(expired), self.batch_size):
+            # 每批删除前确认没有正在进行的运动，运动开始后暂停清理
+            if not self._wait_until_idle():
+                break
+            deleted = self.session_store.delete_batch(expired[start:start + self.batch_size])
+            if self.user_profiles is not None:
+                self.user_profiles.remove_sessions(deleted)
+            deleted_count += len(deleted)
+        if deleted_count:
+            metrics.increment("retention_deleted_sessions_total", deleted_count)
+            print(f"按保留策略删除了 {deleted_count} 条历史记录。")
+        return deleted_count
+
+    def _wait_until_idle(self):
+        while self.is_session_active():
+            if self.stop_event.wait(ACTIVE_SESSION_POLL_SECONDS):
+                return False
+        return not self.stop_event.is_set()
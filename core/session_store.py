@@ -0,0 +1,812 @@
+"""
+session_store.py
+Exercise Session Storage Backends
+=================================
+This module provides a storage backend abstraction for exercise sessions so that the
+application can keep its history either as one CSV file per session (the original
+layout handled by `exercise_data_manager`) or in a single indexed SQLite database.
+Both backends expose the same API used by the controller and the history window:
+- `save(...)`: Persist a finished session (heart-rate samples plus session parameters);
+  returns True once the session is safely on disk.
+- `save_batch(sessions)`: Persist several imported sessions at once (one transaction for
+  SQLite); each session is a tuple of `save`'s arguments with the heart rates as a list,
+  optionally followed by the sample timestamps (seconds since the session start).
+- `has_session(filename)`: Whether the session is already stored.
+- `load(filename)`: Return the session rows in the same column layout as the CSV files.
+- `load_samples(filename)`: Return the session's heart-rate samples as a `SessionSamples`
+  (memory-mapped binary columns, see `sample_file`). Every backend returns the same time
+  axis: seconds since the session start as recorded by the collector (the CSV
+  `Elapsed(seconds)` column, the `elapsed` column in SQLite). Sessions recorded without it
+  (older CSV files, imported files without a time column) use the 1 Hz sample number
+  (`Second`) instead.
+- `preview()`: Return the history preview dicts, newest first.
+- `preview_changes(version)`: Return `(version, changed previews, removed filenames)` since
+  the given version, so the history window can update its list incrementally. The CSV
+  backend answers from `history_catalog`; removed is None when the whole list is returned.
+- `search(query)`: Return the previews matching a `history_search.HistoryQuery`, sorted on
+  the requested column (secondary indexes for CSV, indexed SQL for SQLite).
+- `preview_sessions(filenames)`: Return the previews of the given sessions only (e.g. one
+  member's sessions from `user_profiles`), newest first, without scanning the history.
+- `update_feedback(filename, feedback)`: Store the user's feedback for a session.
+- `delete(filename)`: Remove a session.
+- `delete_batch(filenames)`: Remove several sessions at once (one transaction for SQLite,
+  one rewrite per monthly archive for archived CSV sessions); returns the removed names.
+- `get_session_sizes()`: Approximate bytes on disk per session, for the retention policy
+  in `session_retention`.
+- `load_cached_analytics(filename)` / `save_cached_analytics(filename, summary)`: Cache of
+  the per-session analytics summary (see `heart_rate_analytics`), kept in the history index
+  for CSV sessions and in the `session_analytics` table for SQLite.
+- `load_recovery(filename)` / `save_recovery(filename, recovery)`: The post-exercise
+  heart-rate recovery measured after the session was saved (see `recovery_measurement`),
+  kept in the session's record file for CSV sessions (see `session_records`) and in the
+  `session_recovery` table for SQLite.
+- `load_laps(filename)` / `save_laps(filename, laps)`: The per-lap segment table of a
+  session (see `lap_records`), recorded by the controller at each lap boundary; kept in the
+  session's record file for CSV sessions and in the indexed `laps` table for SQLite.
+- `archive_old_sessions(max_age_days)`: Move old sessions to the archive tier (CSV backend
+  only, see `session_archive`); archived sessions remain visible through the same API.
+The SQLite backend keeps a `sessions` table (one row per session, indexed by start
+time) and a `samples` table (one row per second of heart-rate data). The database
+runs in WAL mode and samples are inserted in batches inside a single transaction.
+Existing CSV history can be imported with `migrate_csv_sessions`, either from code or
+from the command line:
+    python -m core.session_store --db data/sessions.db
+Large imports from several kiosks are handled by the parallel importer in `session_import`.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from core import exercise_data_manager
+from core import metrics
+from core.history_catalog import HistoryCatalog
+from core.history_index import HistoryIndex
+from core.history_search import HistorySearchIndex
+from core.lap_records import LAP_COLUMNS
+from core.session_archive import (
+    archive_old_sessions,
+    delete_archived_session,
+    delete_archived_sessions,
+    get_archived_session_sizes,
+    get_archived_preview,
+    is_archived,
+    load_archived_exercise_data,
+    load_archived_records,
+    load_archived_samples,
+    update_archived_feedback,
+    update_archived_records,
+)
+from core.session_records import load_session_records, records_filename, update_session_records
+from core.sample_file import (
+    open_sample_file,
+    sample_filename,
+    samples_from_sequences,
+    write_sample_file,
+    write_session_samples,
+)
+from core.exercise_data_manager import (
+    DATA_FOLDER,
+    save_exercise_data,
+    load_exercise_data,
+    read_history_record_preview,
+    read_session_samples,
+    get_datetime_from_filename,
+    update_exercise_data_feedback,
+    delete_exercise_data,
+)
+
+DEFAULT_SQLITE_PATH = os.path.join(DATA_FOLDER, "sessions.db")
+SAMPLE_INSERT_BATCH_SIZE = 500
+SQLITE_BYTES_PER_SAMPLE = 24
+SQLITE_BYTES_PER_SESSION = 256
+PREVIEW_COLUMNS = "filename, started_at, level, lap_distance, age, duration_seconds, exercise_distance, feedback"
+SEARCH_SQL_COLUMNS = {
+    "datetime": "started_at",
+    "level": "level",
+    "age": "age",
+    "lap_distance": "lap_distance",
+    "duration_seconds": "duration_seconds",
+    "exercise_distance": "exercise_distance",
+    "feedback": "feedback",
+}
+
+
+class SessionStore:
+    """会话存储后端接口"""
+
+    def save(self, filename, session_data, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback=""):
+        raise NotImplementedError
+
+    def load(self, filename):
+        raise NotImplementedError
+
+    def load_samples(self, filename):
+        raise NotImplementedError
+
+    def save_batch(self, sessions):
+        """sessions: [(filename, heart_rates, level, lap_distance, age, duration, laps, distance, feedback[, timestamps]), ...]，返回保存成功的数量
+
+        timestamps 为相对会话开始的秒数，省略或为 None 时按 1 Hz 采样序号
+        """
+        saved = 0
+        for filename, heart_rates, *fields in sessions:
+            timestamps = fields.pop(7) if len(fields) > 7 else None
+            if timestamps is None:
+                timestamps = range(1, len(heart_rates) + 1)
+            if self.save(filename, list(zip(timestamps, heart_rates)), *fields):
+                saved += 1
+        return saved
+
+    def has_session(self, filename):
+        raise NotImplementedError
+
+    def preview(self):
+        raise NotImplementedError
+
+    def preview_changes(self, version=None):
+        return None, self.preview(), None
+
+    def search(self, query):
+        return query.apply(self.preview())
+
+    def preview_sessions(self, filenames):
+        wanted = set(filenames)
+        return [preview for preview in self.preview() if preview["filename"] in wanted]
+
+    def update_feedback(self, filename, feedback_text):
+        raise NotImplementedError
+
+    def delete(self, filename):
+        raise NotImplementedError
+
+    def delete_batch(self, filenames):
+        deleted = []
+        for filename in filenames:
+            try:
+                self.delete(filename)
+                deleted.append(filename)
+            except Exception as e:
+                print(f"删除会话 {filename} 时出错: {e}")
+        return deleted
+
+    def get_session_sizes(self):
+        return {}
+
+    def load_cached_analytics(self, filename):
+        return None
+
+    def save_cached_analytics(self, filename, summary):
+        pass
+
+    def load_recovery(self, filename):
+        return None
+
+    def save_recovery(self, filename, recovery):
+        pass
+
+    def load_laps(self, filename):
+        return None
+
+    def save_laps(self, filename, laps):
+        pass
+
+    def archive_old_sessions(self, max_age_days):
+        return 0
+
+    def close(self):
+        pass
+
+
+class CsvSessionStore(SessionStore):
+    """每个会话一个 CSV 文件的存储后端（原有格式）"""
+
+    def __init__(self, history_index=None):
+        self.history_index = history_index if history_index is not None else HistoryIndex()
+        self.catalog = HistoryCatalog()
+        self.search_index = HistorySearchIndex()
+
+    def save(self, filename, session_data, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback=""):
+        if not save_exercise_data(filename, session_data, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback):
+            return False
+        self.history_index.remove(filename)
+        self.catalog.invalidate(filename)
+        # 重新保存的会话不沿用旧的恢复与圈程记录
+        self._remove_if_exists(self._records_path(filename))
+        try:
+            write_session_samples(self._sample_path(filename), session_data)
+        except (OSError, ValueError) as e:
+            print(f"保存二进制心率采样文件时出错: {e}")
+        return True
+
+    def load(self, filename):
+        if self._is_hot(filename):
+            return load_exercise_data(filename)
+        return load_archived_exercise_data(filename)
+
+    def load_samples(self, filename):
+        if not self._is_hot(filename):
+            samples = load_archived_samples(filename)
+            return samples_from_sequences(*samples) if samples is not None else None
+        sample_path = self._sample_path(filename)
+        if not os.path.exists(sample_path):
+            # 旧记录只有 CSV，首次读取时按 CSV 中的时间轴生成二进制采样文件
+            try:
+                with open(os.path.join(exercise_data_manager.DATA_FOLDER, filename), 'r', newline='', encoding='utf-8') as csvfile:
+                    timestamps, heart_rates = read_session_samples(csvfile)
+                write_sample_file(sample_path, timestamps, heart_rates)
+            except FileNotFoundError:
+                print(f"文件未找到: {filename}")
+                return None
+            except (OSError, ValueError, IndexError, csv.Error) as e:
+                print(f"生成二进制心率采样文件时出错: {e}")
+                return None
+        try:
+            return open_sample_file(sample_path)
+        except (OSError, ValueError) as e:
+            print(f"读取二进制心率采样文件时出错: {e}")
+            return None
+
+    def preview(self):
+        with metrics.timer("history_scan_seconds"):
+            return self._preview()
+
+    def _preview(self):
+        self.catalog.refresh()
+        return self.catalog.get_previews()
+
+    def preview_changes(self, version=None):
+        with metrics.timer("history_scan_seconds"):
+            self.catalog.refresh()
+            return self.catalog.changes_since(version)
+
+    def search(self, query):
+        with metrics.timer("history_search_seconds"):
+            self.catalog.refresh()
+            # 搜索索引按目录变更日志增量更新
+            self.search_index.apply_changes(*self.catalog.changes_since(self.search_index.version))
+            return self.search_index.search(query)
+
+    def preview_sessions(self, filenames):
+        previews = []
+        for filename in filenames:
+            if self._is_hot(filename):
+                try:
+                    with open(os.path.join(exercise_data_manager.DATA_FOLDER, filename), 'r', newline='', encoding='utf-8') as csvfile:
+                        preview = read_history_record_preview(filename, csvfile)
+                except Exception as e:
+                    print(f"读取文件 {filename} 预览信息时出错: {e}")
+                    preview = None
+            else:
+                preview = get_archived_preview(filename)
+            if preview:
+                previews.append(preview)
+        return sorted(previews, key=get_datetime_from_filename, reverse=True)
+
+    def has_session(self, filename):
+        return self._is_hot(filename) or is_archived(filename)
+
+    def update_feedback(self, filename, feedback_text):
+        if self._is_hot(filename) or not is_archived(filename):
+            update_exercise_data_feedback(filename, feedback_text)
+        else:
+            update_archived_feedback(filename, feedback_text)
+        self.catalog.invalidate(filename)
+
+    def delete(self, filename):
+        if not self._is_hot(filename):
+            delete_archived_session(filename)
+        else:
+            self._delete_hot(filename)
+        self.history_index.remove(filename)
+        self.catalog.invalidate(filename)
+
+    def delete_batch(self, filenames):
+        deleted = []
+        archived = []
+        for filename in filenames:
+            if not self._is_hot(filename):
+                archived.append(filename)
+                continue
+            try:
+                self._delete_hot(filename)
+                deleted.append(filename)
+            except OSError as e:
+                print(f"删除会话 {filename} 时出错: {e}")
+        if archived:
+            deleted.extend(delete_archived_sessions(archived))
+        for filename in deleted:
+            self.catalog.invalidate(filename)
+        self.history_index.remove_many(deleted)
+        return deleted
+
+    def get_session_sizes(self):
+        self.catalog.refresh()
+        sizes = get_archived_session_sizes()
+        for filename, (mtime_ns, size) in self.catalog.get_file_stats().items():
+            for path in (self._sample_path(filename), self._records_path(filename)):
+                if os.path.exists(path):
+                    size += os.path.getsize(path)
+            sizes[filename] = size
+        return sizes
+
+    def load_cached_analytics(self, filename):
+        return self.history_index.get(filename, "analytics")
+
+    def save_cached_analytics(self, filename, summary):
+        self.history_index.set(filename, "analytics", summary)
+
+    def load_recovery(self, filename):
+        return self._load_records(filename).get("recovery")
+
+    def save_recovery(self, filename, recovery):
+        self._save_records(filename, "recovery", recovery)
+
+    def load_laps(self, filename):
+        return self._load_records(filename).get("laps")
+
+    def save_laps(self, filename, laps):
+        self._save_records(filename, "laps", [dict(lap) for lap in laps])
+
+    def _load_records(self, filename):
+        if self._is_hot(filename) or not is_archived(filename):
+            records = load_session_records(self._records_path(filename))
+        else:
+            records = load_archived_records(filename)
+        return records or {}
+
+    def _save_records(self, filename, section, value):
+        if self._is_hot(filename) or not is_archived(filename):
+            update_session_records(self._records_path(filename), section, value)
+        else:
+            update_archived_records(filename, section, value)
+
+    def archive_old_sessions(self, max_age_days):
+        return archive_old_sessions(max_age_days)
+
+    def _delete_hot(self, filename):
+        delete_exercise_data(filename)
+        self._remove_if_exists(self._sample_path(filename))
+        self._remove_if_exists(self._records_path(filename))
+
+    def _remove_if_exists(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _is_hot(self, filename):
+        return os.path.exists(os.path.join(exercise_data_manager.DATA_FOLDER, filename))
+
+    def _sample_path(self, filename):
+        return os.path.join(exercise_data_manager.DATA_FOLDER, sample_filename(filename))
+
+    def _records_path(self, filename):
+        return os.path.join(exercise_data_manager.DATA_FOLDER, records_filename(filename))
+
+
+class SqliteSessionStore(SessionStore):
+    """基于 SQLite 的存储后端，会话表 + 心率采样表"""
+
+    def __init__(self, db_path=DEFAULT_SQLITE_PATH):
+        db_folder = os.path.dirname(db_path)
+        if db_folder and not os.path.exists(db_folder):
+            os.makedirs(db_folder)
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        # 控制器在圈程线程中保存数据，历史窗口在 Tk 线程中读取，连接需跨线程共享
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock, self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    filename TEXT PRIMARY KEY,
+                    started_at TEXT,
+                    level INTEGER,
+                    lap_distance REAL,
+                    age INTEGER,
+                    duration_seconds INTEGER,
+                    laps INTEGER,
+                    exercise_distance REAL,
+                    feedback TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_started_at ON sessions(started_at);
+                CREATE INDEX IF NOT EXISTS idx_sessions_level ON sessions(level, started_at);
+                CREATE INDEX IF NOT EXISTS idx_sessions_age ON sessions(age);
+                CREATE INDEX IF NOT EXISTS idx_sessions_duration ON sessions(duration_seconds);
+                CREATE INDEX IF NOT EXISTS idx_sessions_feedback ON sessions(feedback, started_at);
+                CREATE TABLE IF NOT EXISTS session_analytics (
+                    filename TEXT PRIMARY KEY REFERENCES sessions(filename) ON DELETE CASCADE,
+                    summary TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS laps (
+                    filename TEXT NOT NULL REFERENCES sessions(filename) ON DELETE CASCADE,
+                    lap INTEGER NOT NULL,
+                    start_time REAL,
+                    end_time REAL,
+                    start_sample INTEGER,
+                    end_sample INTEGER,
+                    distance REAL,
+                    speed REAL,
+                    next_speed REAL,
+                    average REAL,
+                    max INTEGER,
+                    reduction_type TEXT,
+                    completed INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (filename, lap)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_laps_reduction_type ON laps(reduction_type);
+                CREATE TABLE IF NOT EXISTS session_recovery (
+                    filename TEXT PRIMARY KEY REFERENCES sessions(filename) ON DELETE CASCADE,
+                    recovery TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS samples (
+                    filename TEXT NOT NULL REFERENCES sessions(filename) ON DELETE CASCADE,
+                    second INTEGER NOT NULL,
+                    heart_rate INTEGER NOT NULL,
+                    elapsed REAL,
+                    PRIMARY KEY (filename, second)
+                ) WITHOUT ROWID;
+            """)
+            sample_columns = [row[1] for row in self.connection.execute("PRAGMA table_info(samples)")]
+            if "elapsed" not in sample_columns:
+                # 较早创建的数据库没有 elapsed 列，这些会话按 second 作为时间轴
+                self.connection.execute("ALTER TABLE samples ADD COLUMN elapsed REAL")
+
+    def save(self, filename, session_data, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback=""):
+        heart_rates = [heart_rate for timestamp, heart_rate in session_data]
+        timestamps = [timestamp for timestamp, heart_rate in session_data]
+        try:
+            self._write_session(filename, heart_rates, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback,
+                                timestamps)
+            return True
+        except sqlite3.Error as e:
+            print(f"保存运动数据到 SQLite 数据库时出错: {e}")
+            return False
+
+    def save_batch(self, sessions):
+        """在同一个事务中写入一批会话，返回保存的数量"""
+        try:
+            with self.lock, self.connection:
+                for session in sessions:
+                    self._insert_session(*session)
+        except sqlite3.Error as e:
+            print(f"批量写入会话到 SQLite 数据库时出错: {e}")
+            return 0
+        return len(sessions)
+
+    def _write_session(self, filename, heart_rates, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback,
+                       timestamps=None):
+        with self.lock, self.connection:
+            self._insert_session(filename, heart_rates, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback,
+                                 timestamps)
+
+    def _insert_session(self, filename, heart_rates, level, lap_distance, age, exercise_duration_seconds, laps_completed, exercise_distance, feedback,
+                        timestamps=None):
+        """timestamps 为相对会话开始的秒数，没有记录时为 None"""
+        session_row = (
+            filename,
+            _started_at_from_filename(filename),
+            _to_level(level),
+            _to_float(lap_distance),
+            _to_int(age),
+            _to_int(exercise_duration_seconds),
+            _to_int(laps_completed),
+            _to_float(exercise_distance),
+            feedback or "",
+        )
+        self.connection.execute("DELETE FROM samples WHERE filename = ?", (filename,))
+        self.connection.execute("DELETE FROM session_analytics WHERE filename = ?", (filename,))
+        self.connection.execute("DELETE FROM session_recovery WHERE filename = ?", (filename,))
+        self.connection.execute("DELETE FROM laps WHERE filename = ?", (filename,))
+        self.connection.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", session_row)
+        for batch_start in range(0, len(heart_rates), SAMPLE_INSERT_BATCH_SIZE):
+            batch = heart_rates[batch_start:batch_start + SAMPLE_INSERT_BATCH_SIZE]
+            self.connection.executemany(
+                "INSERT INTO samples (filename, second, heart_rate, elapsed) VALUES (?, ?, ?, ?)",
+                [(filename, batch_start + offset + 1, int(heart_rate),
+                  round(timestamps[batch_start + offset], 3) if timestamps is not None else None)
+                 for offset, heart_rate in enumerate(batch)],
+            )
+
+    def load(self, filename):
+        with self.lock:
+            session_row = self.connection.execute(
+                "SELECT level, lap_distance, age, duration_seconds, laps, exercise_distance, feedback FROM sessions WHERE filename = ?",
+                (filename,),
+            ).fetchone()
+            if session_row is None:
+                print(f"数据库中未找到会话: {filename}")
+                return None
+            samples = self.connection.execute(
+                "SELECT second, heart_rate FROM samples WHERE filename = ? ORDER BY second", (filename,)
+            ).fetchall()
+        session_fields = [_to_text(value) for value in session_row]
+        return [[str(second), str(heart_rate)] + session_fields for second, heart_rate in samples]
+
+    def load_samples(self, filename):
+        with self.lock:
+            samples = self.connection.execute(
+                "SELECT COALESCE(elapsed, second), heart_rate FROM samples WHERE filename = ? ORDER BY second", (filename,)
+            ).fetchall()
+        if not samples:
+            print(f"数据库中未找到会话采样: {filename}")
+            return None
+        return samples_from_sequences([second for second, _ in samples], [heart_rate for _, heart_rate in samples])
+
+    def preview(self):
+        with metrics.timer("history_scan_seconds"), self.lock:
+            rows = self.connection.execute(
+                f"SELECT {PREVIEW_COLUMNS} FROM sessions ORDER BY started_at DESC"
+            ).fetchall()
+        return [_preview_from_row(row) for row in rows]
+
+    def preview_sessions(self, filenames):
+        filenames = list(filenames)
+        rows = []
+        with self.lock:
+            # 按主键分批查询，避免超出 SQLite 的参数个数限制
+            for start in range(0, len(filenames), SAMPLE_INSERT_BATCH_SIZE):
+                batch = filenames[start:start + SAMPLE_INSERT_BATCH_SIZE]
+                rows.extend(self.connection.execute(
+                    f"SELECT {PREVIEW_COLUMNS} FROM sessions WHERE filename IN ({', '.join('?' * len(batch))})", batch
+                ).fetchall())
+        rows.sort(key=lambda row: row[1] or "", reverse=True)
+        return [_preview_from_row(row) for row in rows]
+
+    def search(self, query):
+        conditions = []
+        parameters = []
+        if query.level is not None:
+            conditions.append("level = ?")
+            parameters.append(_to_level(query.level))
+        if query.feedback is not None:
+            conditions.append("feedback = ?")
+            parameters.append(query.feedback)
+        for column, (low, high) in query.range_filters.items():
+            sql_column = SEARCH_SQL_COLUMNS[column]
+            if low is not None:
+                conditions.append(f"{sql_column} >= ?")
+                parameters.append(low)
+            if high is not None:
+                conditions.append(f"{sql_column} <= ?")
+                parameters.append(high)
+        sql_column = SEARCH_SQL_COLUMNS[query.sort_by]
+        direction = "DESC" if query.descending else "ASC"
+        sql = f"SELECT {PREVIEW_COLUMNS} FROM sessions"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {sql_column} IS NULL, {sql_column} {direction}, filename {direction}"
+        with metrics.timer("history_search_seconds"), self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        if query.filenames is not None:
+            rows = [row for row in rows if row[0] in query.filenames]
+        return [_preview_from_row(row) for row in rows]
+
+    def update_feedback(self, filename, feedback_text):
+        with self.lock, self.connection:
+            cursor = self.connection.execute("UPDATE sessions SET feedback = ? WHERE filename = ?", (feedback_text, filename))
+        if cursor.rowcount == 0:
+            print(f"数据库中未找到会话: {filename}")
+
+    def delete(self, filename):
+        with self.lock, self.connection:
+            cursor = self.connection.execute("DELETE FROM sessions WHERE filename = ?", (filename,))
+        if cursor.rowcount == 0:
+            raise FileNotFoundError(filename)
+
+    def delete_batch(self, filenames):
+        filenames = list(filenames)
+        deleted = []
+        with self.lock, self.connection:
+            for start in range(0, len(filenames), SAMPLE_INSERT_BATCH_SIZE):
+                batch = filenames[start:start + SAMPLE_INSERT_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                deleted.extend(row[0] for row in self.connection.execute(
+                    f"SELECT filename FROM sessions WHERE filename IN ({placeholders})", batch))
+                self.connection.execute(f"DELETE FROM sessions WHERE filename IN ({placeholders})", batch)
+        return deleted
+
+    def get_session_sizes(self):
+        # 按采样行数估算，WITHOUT ROWID 表中每行约占 SQLITE_BYTES_PER_SAMPLE 字节
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT sessions.filename, COUNT(samples.second) FROM sessions "
+                "LEFT JOIN samples ON samples.filename = sessions.filename GROUP BY sessions.filename"
+            ).fetchall()
+        return {filename: SQLITE_BYTES_PER_SESSION + sample_count * SQLITE_BYTES_PER_SAMPLE for filename, sample_count in rows}
+
+    def load_cached_analytics(self, filename):
+        with self.lock:
+            row = self.connection.execute("SELECT summary FROM session_analytics WHERE filename = ?", (filename,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_cached_analytics(self, filename, summary):
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO session_analytics VALUES (?, ?)",
+                                        (filename, json.dumps(summary, ensure_ascii=False)))
+        except sqlite3.Error as e:
+            print(f"缓存会话分析结果时出错: {e}")
+
+    def load_recovery(self, filename):
+        with self.lock:
+            row = self.connection.execute("SELECT recovery FROM session_recovery WHERE filename = ?", (filename,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_recovery(self, filename, recovery):
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO session_recovery VALUES (?, ?)",
+                                        (filename, json.dumps(recovery, ensure_ascii=False)))
+        except sqlite3.Error as e:
+            print(f"保存心率恢复数据时出错: {e}")
+
+    def load_laps(self, filename):
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(LAP_COLUMNS)} FROM laps WHERE filename = ? ORDER BY lap", (filename,)
+            ).fetchall()
+        laps = [dict(zip(LAP_COLUMNS, row)) for row in rows]
+        for lap in laps:
+            lap["completed"] = bool(lap["completed"])
+        return laps or None
+
+    def save_laps(self, filename, laps):
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM laps WHERE filename = ?", (filename,))
+                self.connection.executemany(
+                    f"INSERT INTO laps (filename, {', '.join(LAP_COLUMNS)}) VALUES (?{', ?' * len(LAP_COLUMNS)})",
+                    [(filename, *(lap.get(column) for column in LAP_COLUMNS)) for lap in laps],
+                )
+        except sqlite3.Error as e:
+            print(f"保存圈程记录时出错: {e}")
+
+    def has_session(self, filename):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM sessions WHERE filename = ?", (filename,)).fetchone() is not None
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def create_session_store(backend="csv", db_path=DEFAULT_SQLITE_PATH):
+    if backend == "sqlite":
+        return SqliteSessionStore(db_path)
+    if backend != "csv":
+        print(f"未知的存储后端: {backend}，将使用 CSV 存储。")
+    return CsvSessionStore()
+
+
+def migrate_csv_sessions(store, data_folder=None, skip_existing=True):
+    """将 data 目录中的 CSV 会话导入 SQLite 存储，返回 (导入数, 跳过数, 失败数)"""
+    data_folder = data_folder or exercise_data_manager.DATA_FOLDER
+    imported = skipped = failed = 0
+    if not os.path.exists(data_folder):
+        return imported, skipped, failed
+
+    filenames = sorted(f for f in os.listdir(data_folder) if f.startswith("heart_rate_log_") and f.endswith(".csv"))
+    for filename in filenames:
+        if skip_existing and store.has_session(filename):
+            skipped += 1
+            continue
+        try:
+            session = _read_csv_session(os.path.join(data_folder, filename))
+        except (OSError, ValueError, csv.Error) as e:
+            print(f"导入文件 {filename} 时出错: {e}")
+            failed += 1
+            continue
+        if session is None:
+            skipped += 1
+            continue
+        timestamps, heart_rates, fields = session
+        try:
+            store._write_session(filename, heart_rates, fields.get("Level"), fields.get("LapDistance"), fields.get("Age"),
+                                 fields.get("Duration(seconds)"), fields.get("Laps"), fields.get("Distance(meters)"), fields.get("Feedback", ""),
+                                 timestamps)
+        except sqlite3.Error as e:
+            print(f"写入会话 {filename} 到数据库时出错: {e}")
+            failed += 1
+            continue
+        records = load_session_records(os.path.join(data_folder, records_filename(filename))) or {}
+        if records.get("recovery"):
+            store.save_recovery(filename, records["recovery"])
+        if records.get("laps"):
+            store.save_laps(filename, records["laps"])
+        imported += 1
+    return imported, skipped, failed
+
+
+def _read_csv_session(filepath):
+    with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
+        timestamps, heart_rates = read_session_samples(csvfile)
+        if not heart_rates:
+            return None
+        csvfile.seek(0)
+        csv_reader = csv.reader(csvfile)
+        header = next(csv_reader)
+        first_row = next(row for row in csv_reader if row)
+    fields = {column: first_row[index] for index, column in enumerate(header) if index < len(first_row)}
+    return timestamps, heart_rates, fields
+
+
+def _started_at_from_filename(filename):
+    datetime_str = filename[len("heart_rate_log_"): -len(".csv")]
+    try:
+        return datetime.datetime.strptime(datetime_str, "%Y%m%d-%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _preview_from_row(row):
+    filename, started_at, level, lap_distance, age, duration_seconds, exercise_distance, feedback = row
+    return {
+        "filename": filename,
+        "datetime": started_at or "日期时间解析失败",
+        "level": _to_text(level),
+        "lap_distance": _to_text(lap_distance),
+        "age": _to_text(age),
+        "duration_seconds": _to_text(duration_seconds),
+        "exercise_distance": _to_text(exercise_distance),
+        "feedback": feedback or "",
+    }
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_level(value):
+    """内置等级保存为整数，自定义速度程序保留其名称"""
+    level = _to_int(value)
+    if level is None and value is not None and str(value).strip() not in ("", "N/A"):
+        return str(value).strip()
+    return level
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value):
+    return "N/A" if value is None else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将 CSV 历史记录导入 SQLite 会话数据库")
+    parser.add_argument("--db", default=DEFAULT_SQLITE_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--data-folder", default=DATA_FOLDER, help="CSV 历史记录所在目录")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖数据库中已存在的会话")
+    args = parser.parse_args()
+
+    store = SqliteSessionStore(args.db)
+    try:
+        imported, skipped, failed = migrate_csv_sessions(store, args.data_folder, skip_existing=not args.overwrite)
+    finally:
+        store.close()
+    print(f"导入完成: 成功 {imported} 个，跳过 {skipped} 个，失败 {failed} 个。")
+
+
+if __name__ == '__main__':
+    main()
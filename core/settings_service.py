@@ -0,0 +1,177 @@
+"""
+settings_service.py
+Settings Service Module
+=======================
+This module keeps the application settings in a single in-memory copy shared by the main
+window, the settings window and other components, instead of each of them reading and
+writing `data/app_settings.json` on their own.
+- `load` reads the settings file once at startup (and the file named by
+  `settings_file_path`, if it points elsewhere) and merges it over the defaults.
+- Typed accessors (`get_int`, `get_float`, `get_bool`, `get_str`) fall back to the
+  default value when a stored value has the wrong type.
+- `update` changes several settings at once, notifies the subscribers of the changed keys
+  and schedules a save. Saves are debounced and run on a background timer thread; the file
+  is written atomically (temporary file, fsync, `os.replace`). `flush` saves immediately,
+  e.g. when the application exits.
+Subscribers are called on the thread that made the change, with a dict of the changed
+settings, so components such as the AI client or the lap-distance entry reconfigure
+without re-reading the file.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import json
+import os
+import threading
+
+DEFAULT_SETTINGS_FILE = "data/app_settings.json"
+DEFAULT_SAVE_DELAY = 0.5
+
+
+class SettingsService:
+    def __init__(self, defaults, path=DEFAULT_SETTINGS_FILE, save_delay=DEFAULT_SAVE_DELAY):
+        self.defaults = dict(defaults)
+        self.values = dict(defaults)
+        self.path = path
+        self.save_delay = save_delay
+        self.lock = threading.RLock()
+        self.subscribers = []
+        self.save_timer = None
+        self.save_lock = threading.Lock()
+
+    def load(self):
+        """读取设置文件；文件存在但无法解析时返回 False，并保留默认设置"""
+        loaded_settings = self._read(self.path)
+        if loaded_settings is None:
+            return False
+        settings_file_path = loaded_settings.get("settings_file_path") or self.path
+        if os.path.normpath(settings_file_path) != os.path.normpath(self.path):
+            # 设置文件指向了其他位置，以该文件的内容为准
+            redirected_settings = self._read(settings_file_path)
+            if redirected_settings is None:
+                return False
+            loaded_settings = redirected_settings
+        with self.lock:
+            self.values = {**self.defaults, **loaded_settings}
+            self.path = settings_file_path
+        return True
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取设置文件 {path} 时出错: {e}")
+            return None
+        return content if isinstance(content, dict) else None
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.values.get(key, self.defaults.get(key, default))
+
+    def get_int(self, key):
+        return self._get_typed(key, int)
+
+    def get_float(self, key):
+        return self._get_typed(key, float)
+
+    def get_bool(self, key):
+        return self._get_typed(key, bool)
+
+    def get_str(self, key):
+        return self._get_typed(key, str)
+
+    def _get_typed(self, key, value_type):
+        value = self.get(key)
+        is_bool = isinstance(value, bool)
+        if isinstance(value, value_type) and (value_type is bool or not is_bool):
+            return value
+        if value_type in (int, float) and not is_bool:
+            # 兼容手工编辑设置文件时写成字符串的数字
+            try:
+                return value_type(value)
+            except (TypeError, ValueError):
+                pass
+        default = self.defaults.get(key)
+        print(f"设置项 {key} 的值 {value!r} 无效，使用默认值 {default!r}。")
+        return default
+
+    def as_dict(self):
+        with self.lock:
+            return dict(self.values)
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, changes):
+        """修改设置并通知订阅者，返回实际发生变化的设置"""
+        with self.lock:
+            changed = {key: value for key, value in changes.items() if self.values.get(key) != value}
+            if not changed:
+                return {}
+            self.values.update(changed)
+            if changed.get("settings_file_path"):
+                self.path = changed["settings_file_path"]
+            subscribers = list(self.subscribers)
+        self._schedule_save()
+        for callback, keys in subscribers:
+            if keys is None or any(key in changed for key in keys):
+                try:
+                    callback(changed)
+                except Exception as e:
+                    print(f"设置变更通知处理出错: {e}")
+        return changed
+
+    def subscribe(self, callback, keys=None):
+        """订阅设置变化；keys 为 None 时订阅全部设置"""
+        with self.lock:
+            self.subscribers.append((callback, tuple(keys) if keys is not None else None))
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = [(subscriber, keys) for subscriber, keys in self.subscribers if subscriber != callback]
+
+    def _schedule_save(self):
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+            self.save_timer = threading.Timer(self.save_delay, self.save)
+            self.save_timer.name = "SettingsSave"
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        with self.lock:
+            pending = self.save_timer is not None
+            if pending:
+                self.save_timer.cancel()
+        if pending:
+            self.save()
+
+    def save(self):
+        with self.lock:
+            self.save_timer = None
+            path = self.path
+            content = json.dumps(self.values, indent=4, ensure_ascii=False)
+        folder = os.path.dirname(path)
+        temp_path = path + ".tmp"
+        # 后台定时保存与 flush 可能同时发生，串行化写入同一个临时文件
+        with self.save_lock:
+            try:
+                if folder and not os.path.exists(folder):
+                    os.makedirs(folder)
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, path)
+                return True
+            except OSError as e:
+                print(f"保存设置文件 {path} 时出错: {e}")
+                return False
@@ -3,14 +3,26 @@ speed_config.py
 Speed Levels Simulation
 =======================
 This module provides a class to simulate speed levels based on elapsed time and predefined levels.
+Built-in levels (`SPEED_LEVELS`, `LEVEL_TARGETS`) and custom speed programs loaded from JSON
+files in `data/programs/` are kept in one `ProgramRegistry`. Each program is validated once
+when it is registered and precomputes its cumulative per-lap time table, so the per-lap speed,
+the expected duration for a lap distance and the program target are O(1) lookups.
+A custom program file looks like:
+    {"name": "间歇跑", "level": "间歇1", "target": 4800, "speeds": [5.0, 8.0, 5.0, 8.0, 5.0]}
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; 
 Date Created: 2025-03-06
-Last Modified: 2025-03-16
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
 """
+import json
+import os
+import threading
+
+PROGRAMS_FOLDER = os.path.join("data", "programs")
+MAX_PROGRAM_SPEED = 25.0
 
 SPEED_LEVELS = {
     2: [2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.3, 5.6, 5.9, 6.2, 6.5, 6.8, 6.5, 6.0, 5.5, 5.0, 4.5, 4.0, 3.5],
@@ -24,7 +36,120 @@ SPEED_LEVELS = {
     10: [10.0, 10.5, 11.0, 11.5, 12.0, 12.5, 13.0, 13.3, 13.6, 13.9, 14.2, 14.5, 14.8, 15.1, 15.4, 15.7, 16.0, 15.5, 15.0, 14.5, 14.0, 13.5, 13.0, 12.5, 12.0, 11.5, 11.0]
 }
 
+LEVEL_TARGETS = {2: 4000, 3: 4200, 4: 4600, 5: 5000, 6: 5200, 7: 5200, 8: 5400, 9: 5400, 10: 5400}
+
+
+class SpeedProgram:
+    __slots__ = ("level", "name", "speeds", "target", "cumulative_seconds_per_meter")
+
+    def __init__(self, level, speeds, target=None, name=None):
+        self.level = str(level)
+        self.name = name or self.level
+        self.speeds = tuple(float(speed) for speed in speeds)
+        self.target = target
+        # 第 i 项为前 i 圈每米所需秒数之和，乘以圈程距离即为前 i 圈的预计用时
+        cumulative = [0.0]
+        for speed in self.speeds:
+            cumulative.append(cumulative[-1] + 3.6 / speed)
+        self.cumulative_seconds_per_meter = tuple(cumulative)
+
+    def __len__(self):
+        return len(self.speeds)
+
+    def speed_for_lap(self, lap_index):
+        if 0 <= lap_index < len(self.speeds):
+            return self.speeds[lap_index]
+        return None
+
+    def expected_duration_seconds(self, lap_distance, laps=None):
+        laps = len(self.speeds) if laps is None else min(max(laps, 0), len(self.speeds))
+        return lap_distance * self.cumulative_seconds_per_meter[laps]
+
+    def expected_distance(self, lap_distance):
+        return lap_distance * len(self.speeds)
+
+
+class ProgramRegistry:
+    def __init__(self):
+        self.programs = {}
+        self.levels = []
+        self.lock = threading.Lock()
+
+    def register(self, program):
+        with self.lock:
+            if program.level not in self.programs:
+                self.levels.append(program.level)
+            self.programs[program.level] = program
+
+    def get_program(self, level):
+        program = self.programs.get(str(level))
+        if program is None:
+            raise ValueError(f"Invalid level {level}. Valid levels are {self.levels}.")
+        return program
+
+    def has_program(self, level):
+        return level in self.programs
+
+    def get_levels(self):
+        return list(self.levels)
+
+    def load_folder(self, folder=PROGRAMS_FOLDER):
+        """加载目录中的自定义速度程序，返回加载成功的数量"""
+        if not os.path.isdir(folder):
+            return 0
+        loaded = 0
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".json"):
+                continue
+            filepath = os.path.join(folder, filename)
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    definition = json.load(f)
+                self.register(validate_program_definition(definition, filename))
+                loaded += 1
+            except (OSError, ValueError) as e:
+                print(f"加载速度程序 {filename} 失败: {e}")
+        return loaded
+
+
+def validate_program_definition(definition, source="<program>"):
+    if not isinstance(definition, dict):
+        raise ValueError(f"{source}: 程序定义必须是 JSON 对象。")
+    level = definition.get("level")
+    if level is None or str(level).strip() == "":
+        raise ValueError(f"{source}: 缺少 level 字段。")
+    speeds = definition.get("speeds")
+    if not isinstance(speeds, list) or not speeds:
+        raise ValueError(f"{source}: speeds 必须是非空列表。")
+    for speed in speeds:
+        if isinstance(speed, bool) or not isinstance(speed, (int, float)) or not 0 < speed <= MAX_PROGRAM_SPEED:
+            raise ValueError(f"{source}: 速度 {speed!r} 无效，必须在 0 到 {MAX_PROGRAM_SPEED} km/h 之间。")
+    target = definition.get("target")
+    if target is not None and (isinstance(target, bool) or not isinstance(target, (int, float)) or target <= 0):
+        raise ValueError(f"{source}: target 必须是正数。")
+    name = definition.get("name")
+    return SpeedProgram(str(level).strip(), speeds, target, str(name) if name else None)
+
+
+_program_registry = None
+_program_registry_lock = threading.Lock()
+
+
+def get_program_registry():
+    global _program_registry
+    with _program_registry_lock:
+        if _program_registry is None:
+            registry = ProgramRegistry()
+            for level, speeds in SPEED_LEVELS.items():
+                registry.register(SpeedProgram(level, speeds, LEVEL_TARGETS.get(level)))
+            registry.load_folder()
+            _program_registry = registry
+        return _program_registry
+
+
+def get_program(level):
+    return get_program_registry().get_program(level)
+
+
 def get_speed_levels(level):
-    if level not in SPEED_LEVELS:
-        raise ValueError(f"Invalid level {level}. Valid levels are {list(SPEED_LEVELS.keys())}.")
-    return SPEED_LEVELS[level]
+    return list(get_program(level).speeds)
@@ -0,0 +1,322 @@
+"""
+speed_control.py
+Speed Control Policy Module
+===========================
+This module defines the pluggable speed-control policies used by `TreadmillController`.
+A policy receives the selected `speed_config.SpeedProgram`, the heart-rate samples of the
+running session and the completed laps, and decides the treadmill speed. The controller only applies its decisions, so policies
+can be swapped from the settings (`control_policy`) and evaluated without the UI.
+Available policies:
+- `LapThresholdPolicy` ("lap"): the original behaviour. Speeds follow the selected program
+  lap by lap; once a lap average exceeds the heart-rate threshold, every following lap
+  reduces the speed by 0.3 km/h (three times) and then by 0.5 km/h.
+- `PredictiveHeartRatePolicy` ("predictive"): a PI controller on a short rolling window of
+  heart rate. The heart rate is extrapolated a few seconds ahead with a least-squares trend,
+  so the controller reacts before the threshold is crossed instead of at the end of a lap.
+  The set point is a few bpm below the threshold.
+  It runs at a bounded update interval, never exceeds the program speed, and limits the
+  rate of speed change (km/h per second).
+Both policies stop the exercise only when a heart-rate reduction would bring the speed below
+`MIN_EXERCISE_SPEED`; programs that start slower than that (levels 2 and 3) run at their own
+speeds, and the predictive policy then stops only when it reduces below the program speed.
+`evaluate_policy` runs a policy against a heart-rate model (such as the physiological
+`simulator.heart_rate_model.HeartRateModel`) in simulated time, so a whole session can be
+evaluated in milliseconds:
+    python -m core.speed_control --level 5 --age 40 --lap-distance 200
+`--check` runs the low-speed levels with every policy and exits with status 1 when a policy
+ends one of them before the end of the program:
+    python -m core.speed_control --check
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import sys
+from collections import deque
+
+from core.speed_config import get_program_registry
+from simulator.heart_rate_model import HeartRateModel
+
+MIN_EXERCISE_SPEED = 3.5
+DEFAULT_CONTROL_POLICY = "lap"
+HEART_RATE_THRESHOLD_FRACTION = 0.8
+PROGRAM_FINISHED_REASON = "速度列表已结束"
+LOW_SPEED_CHECK_LEVELS = ("2", "3")
+
+
+class SpeedDecision:
+    def __init__(self, speed, reason, finished=False):
+        self.speed = speed
+        self.reason = reason
+        self.finished = finished
+
+    def __repr__(self):
+        return f"SpeedDecision(speed={self.speed}, reason={self.reason!r}, finished={self.finished})"
+
+
+class SpeedControlPolicy:
+    """速度控制策略接口；update_interval 为 None 时只在完成圈程时调整速度"""
+    name = None
+    update_interval = None
+
+    def start(self, program, heart_rate_threshold):
+        """program 为 speed_config.SpeedProgram"""
+        self.program = program
+        self.heart_rate_threshold = heart_rate_threshold
+        self.lap_index = 0
+
+    def initial_speed(self):
+        return self.program.speed_for_lap(0)
+
+    def on_heart_rate(self, elapsed_seconds, heart_rate):
+        pass
+
+    def on_lap_completed(self, elapsed_seconds, laps_completed, lap_average_heart_rate, current_speed):
+        raise NotImplementedError
+
+    def update(self, elapsed_seconds, current_speed):
+        return None
+
+    def _next_program_speed(self):
+        self.lap_index += 1
+        return self.program.speed_for_lap(self.lap_index)
+
+
+class LapThresholdPolicy(SpeedControlPolicy):
+    name = "lap"
+
+    def __init__(self, small_reduction=0.3, large_reduction=0.5, small_reduction_count=3):
+        self.small_reduction = small_reduction
+        self.large_reduction = large_reduction
+        self.small_reduction_count = small_reduction_count
+
+    def start(self, program, heart_rate_threshold):
+        super().start(program, heart_rate_threshold)
+        self.is_heart_rate_exceeded = False
+        self.reduction_counter = 0
+
+    def on_lap_completed(self, elapsed_seconds, laps_completed, lap_average_heart_rate, current_speed):
+        if lap_average_heart_rate > self.heart_rate_threshold and not self.is_heart_rate_exceeded:
+            self.is_heart_rate_exceeded = True
+            print(f"本圈平均心率 {lap_average_heart_rate:.1f} bpm 超出阈值 {self.heart_rate_threshold:.1f} bpm，下一圈程开始降速")
+        if not self.is_heart_rate_exceeded:
+            new_speed = self._next_program_speed()
+            if new_speed is None:
+                return SpeedDecision(current_speed, PROGRAM_FINISHED_REASON, finished=True)
+            return SpeedDecision(new_speed, "程序速度")
+        if self.reduction_counter < self.small_reduction_count:
+            new_speed = current_speed - self.small_reduction
+            self.reduction_counter += 1
+            reduction_type = "小降速"
+        else:
+            new_speed = current_speed - self.large_reduction
+            reduction_type = "大降速"
+        if new_speed < MIN_EXERCISE_SPEED:
+            return SpeedDecision(0.0, reduction_type, finished=True)
+        return SpeedDecision(new_speed, reduction_type)
+
+
+class PredictiveHeartRatePolicy(SpeedControlPolicy):
+    name = "predictive"
+
+    def __init__(self, proportional_gain=0.04, integral_gain=0.002, window_seconds=20.0, prediction_seconds=15.0,
+                 update_interval=2.0, max_speed_change_rate=0.1, speed_step=0.1, setpoint_margin=3.0):
+        self.proportional_gain = proportional_gain
+        self.integral_gain = integral_gain
+        self.window_seconds = window_seconds
+        self.prediction_seconds = prediction_seconds
+        self.update_interval = update_interval
+        self.max_speed_change_rate = max_speed_change_rate
+        self.speed_step = speed_step
+        self.setpoint_margin = setpoint_margin
+
+    def start(self, program, heart_rate_threshold):
+        super().start(program, heart_rate_threshold)
+        self.program_speed = self.initial_speed()
+        self.samples = deque()
+        self.integral = 0.0
+        self.last_update_time = None
+        self.commanded_speed = self.program_speed
+
+    def on_heart_rate(self, elapsed_seconds, heart_rate):
+        if heart_rate <= 0:
+            return
+        self.samples.append((elapsed_seconds, heart_rate))
+        while self.samples and self.samples[0][0] < elapsed_seconds - self.window_seconds:
+            self.samples.popleft()
+
+    def on_lap_completed(self, elapsed_seconds, laps_completed, lap_average_heart_rate, current_speed):
+        program_speed = self._next_program_speed()
+        if program_speed is None:
+            return SpeedDecision(current_speed, PROGRAM_FINISHED_REASON, finished=True)
+        self.program_speed = program_speed
+        return None
+
+    def predict_heart_rate(self, elapsed_seconds):
+        """用窗口内心率的最小二乘趋势外推 prediction_seconds 秒后的心率"""
+        count = len(self.samples)
+        if count == 0:
+            return None
+        mean_time = sum(t for t, _ in self.samples) / count
+        mean_rate = sum(hr for _, hr in self.samples) / count
+        if count < 3:
+            return mean_rate
+        covariance = sum((t - mean_time) * (hr - mean_rate) for t, hr in self.samples)
+        variance = sum((t - mean_time) ** 2 for t, _ in self.samples)
+        slope = covariance / variance if variance > 0 else 0.0
+        return mean_rate + slope * (elapsed_seconds + self.prediction_seconds - mean_time)
+
+    def update(self, elapsed_seconds, current_speed):
+        predicted_heart_rate = self.predict_heart_rate(elapsed_seconds)
+        if predicted_heart_rate is None:
+            return None
+        dt = self.update_interval if self.last_update_time is None else elapsed_seconds - self.last_update_time
+        self.last_update_time = elapsed_seconds
+
+        error = predicted_heart_rate - (self.heart_rate_threshold - self.setpoint_margin)
+        # 积分项只在超过阈值时累积，低于阈值时逐渐回落，并限制在可降速的范围内 (抗积分饱和)
+        max_integral = self.program_speed / self.integral_gain if self.integral_gain > 0 else 0.0
+        self.integral = min(max(self.integral + error * dt, 0.0), max_integral)
+        reduction = self.proportional_gain * error + self.integral_gain * self.integral
+        target_speed = self.program_speed - max(reduction, 0.0)
+
+        # 连续的指令速度按变化率限制逐步逼近目标，输出时再按跑步机的调速步长取整
+        max_change = self.max_speed_change_rate * dt
+        self.commanded_speed += min(max(target_speed - self.commanded_speed, -max_change), max_change)
+        new_speed = round(round(self.commanded_speed / self.speed_step) * self.speed_step, 2)
+        # 只有因心率降速且低于最低速度 (程序速度本身更低时以程序速度为下限) 才结束运动
+        if target_speed < self.program_speed and new_speed < min(self.program_speed, MIN_EXERCISE_SPEED):
+            return SpeedDecision(0.0, "预测降速", finished=True)
+        self.commanded_speed = min(self.commanded_speed, self.program_speed)
+        new_speed = min(new_speed, self.program_speed)
+        if abs(new_speed - current_speed) < self.speed_step / 2:
+            return None
+        return SpeedDecision(new_speed, "预测降速" if new_speed < current_speed else "预测恢复")
+
+
+CONTROL_POLICIES = {
+    LapThresholdPolicy.name: LapThresholdPolicy,
+    PredictiveHeartRatePolicy.name: PredictiveHeartRatePolicy,
+}
+
+
+def create_control_policy(name=DEFAULT_CONTROL_POLICY, **options):
+    policy_class = CONTROL_POLICIES.get(name)
+    if policy_class is None:
+        print(f"未知的速度控制策略 {name}，将使用 {DEFAULT_CONTROL_POLICY}。")
+        policy_class = CONTROL_POLICIES[DEFAULT_CONTROL_POLICY]
+    return policy_class(**options)
+
+
+def evaluate_policy(policy, program, lap_distance, heart_rate_threshold, heart_rate_model, dt=1.0, max_seconds=4 * 3600):
+    """在模拟时间中运行一次完整的运动，返回评估指标
+
+    heart_rate_model 需提供 step(speed_kmh, dt) 方法，返回该时刻的心率。
+    """
+    policy.start(program, heart_rate_threshold)
+    current_speed = policy.initial_speed()
+    elapsed = 0.0
+    distance = 0.0
+    lap_start_distance = 0.0
+    lap_heart_rates = []
+    laps_completed = 0
+    next_update_time = 0.0
+    time_above_threshold = 0.0
+    heart_rate_total = 0.0
+    max_heart_rate = 0
+    speed_changes = 0
+    stop_reason = "max_seconds"
+    sample_count = 0
+
+    while elapsed < max_seconds:
+        heart_rate = heart_rate_model.step(current_speed, dt)
+        elapsed += dt
+        distance += current_speed * dt / 3.6
+        sample_count += 1
+        heart_rate_total += heart_rate
+        max_heart_rate = max(max_heart_rate, heart_rate)
+        if heart_rate > heart_rate_threshold:
+            time_above_threshold += dt
+        lap_heart_rates.append(heart_rate)
+        policy.on_heart_rate(elapsed, heart_rate)
+
+        decision = None
+        if distance - lap_start_distance >= lap_distance:
+            laps_completed += 1
+            lap_start_distance += lap_distance
+            decision = policy.on_lap_completed(elapsed, laps_completed, sum(lap_heart_rates) / len(lap_heart_rates), current_speed)
+            lap_heart_rates = []
+        if decision is None and policy.update_interval is not None and elapsed >= next_update_time:
+            next_update_time = elapsed + policy.update_interval
+            decision = policy.update(elapsed, current_speed)
+        if decision is not None:
+            if decision.finished:
+                stop_reason = decision.reason
+                break
+            if decision.speed != current_speed:
+                speed_changes += 1
+            current_speed = decision.speed
+
+    return {
+        "policy": policy.name,
+        "duration_seconds": elapsed,
+        "expected_duration_seconds": program.expected_duration_seconds(lap_distance),
+        "distance_meters": distance,
+        "laps_completed": laps_completed,
+        "average_heart_rate": heart_rate_total / sample_count if sample_count else 0.0,
+        "max_heart_rate": max_heart_rate,
+        "time_above_threshold_seconds": time_above_threshold,
+        "speed_changes": speed_changes,
+        "stop_reason": stop_reason,
+    }
+
+
+def check_program_completion(policy_names, age, lap_distance, seed=0, levels=LOW_SPEED_CHECK_LEVELS):
+    """低速等级的程序速度本身低于最低运动速度，各策略都应跑完整个速度程序"""
+    heart_rate_threshold = (220 - age) * HEART_RATE_THRESHOLD_FRACTION
+    passed = True
+    for level in levels:
+        program = get_program_registry().get_program(level)
+        for name in policy_names:
+            result = evaluate_policy(create_control_policy(name), program, lap_distance, heart_rate_threshold,
+                                     HeartRateModel(age, seed=seed))
+            finished = result["stop_reason"] == PROGRAM_FINISHED_REASON and result["laps_completed"] == len(program)
+            passed = passed and finished
+            print(f"等级 {level} {name:>10}: 圈数 {result['laps_completed']}/{len(program)}, "
+                  f"结束原因 {result['stop_reason']} {'通过' if finished else '未通过'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在模拟时间中评估速度控制策略")
+    parser.add_argument("--level", default="5", help="运动等级或自定义速度程序")
+    parser.add_argument("--age", type=int, default=40, help="年龄")
+    parser.add_argument("--lap-distance", type=float, default=200, help="圈程距离 (米)")
+    parser.add_argument("--policy", choices=sorted(CONTROL_POLICIES), action="append", help="要评估的策略，可重复指定")
+    parser.add_argument("--seed", type=int, default=0, help="心率模型随机种子")
+    parser.add_argument("--check", action="store_true", help="检查各策略能否跑完低速等级的速度程序")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check_program_completion(args.policy or sorted(CONTROL_POLICIES), args.age, args.lap_distance,
+                                               args.seed) else 1)
+
+    program = get_program_registry().get_program(args.level)
+    heart_rate_threshold = (220 - args.age) * HEART_RATE_THRESHOLD_FRACTION
+    print(f"等级 {program.level}: {len(program)} 圈 {program.expected_distance(args.lap_distance):.0f} 米, "
+          f"按程序速度预计 {program.expected_duration_seconds(args.lap_distance):.0f} 秒")
+    for name in args.policy or sorted(CONTROL_POLICIES):
+        result = evaluate_policy(create_control_policy(name), program, args.lap_distance, heart_rate_threshold,
+                                 HeartRateModel(args.age, seed=args.seed))
+        print(f"{name:>10}: 时长 {result['duration_seconds']:.0f} 秒, 距离 {result['distance_meters']:.0f} 米, "
+              f"圈数 {result['laps_completed']}, 平均心率 {result['average_heart_rate']:.1f}, "
+              f"最高心率 {result['max_heart_rate']}, 超阈值 {result['time_above_threshold_seconds']:.0f} 秒, "
+              f"调速 {result['speed_changes']} 次, 结束原因 {result['stop_reason']}")
+
+
+if __name__ == "__main__":
+    main()
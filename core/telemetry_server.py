@@ -0,0 +1,263 @@
+"""
+telemetry_server.py
+Telemetry Server Module
+=======================
+This module embeds a small asyncio HTTP/WebSocket server (standard library only) that
+exposes the live exercise state to external dashboards such as the front-desk display:
+- `GET /snapshot`: the current state as JSON (heart rate and averages from the
+  `HeartRateCollector`; running state, level, speed, distance, laps and threshold from
+  the `TreadmillController`).
+- `GET /stream` (WebSocket upgrade): the same state pushed as JSON text messages
+  whenever it changes. Clients can pass `?interval=<seconds>` to lower their rate.
+The acquisition path stays cheap: the collector listener only bumps a version counter.
+A single broadcaster task on the server's event loop builds the JSON snapshot at most once
+per `update_interval` and encodes the WebSocket frame once for all clients. Each client
+task sends only the newest frame (older updates are coalesced) no more often than its own
+interval, and clients that cannot keep up for `SEND_TIMEOUT_SECONDS` are disconnected.
+The server runs in its own thread and listens on localhost by default.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from core import metrics
+from core.heart_rate_collector import HeartRateListener
+
+DEFAULT_TELEMETRY_HOST = "127.0.0.1"
+DEFAULT_TELEMETRY_PORT = 8765
+DEFAULT_UPDATE_INTERVAL = 0.5
+SEND_TIMEOUT_SECONDS = 5.0
+MAX_REQUEST_HEADER_BYTES = 8192
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def encode_websocket_frame(payload, opcode=0x1):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack(">H", length)
+    else:
+        header += bytes([127]) + struct.pack(">Q", length)
+    return header + payload
+
+
+async def read_websocket_frame(reader):
+    """读取一帧客户端消息，返回 (opcode, payload)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return opcode, payload
+
+
+class TelemetryServer(HeartRateListener):
+    def __init__(self, collector, controller=None, host=DEFAULT_TELEMETRY_HOST, port=DEFAULT_TELEMETRY_PORT,
+                 update_interval=DEFAULT_UPDATE_INTERVAL):
+        self.collector = collector
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.update_interval = update_interval
+        self.version = 0
+        self.frame = None
+        self.snapshot_json = None
+        self.changed_event = None
+        self.client_count = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started_event = threading.Event()
+
+    def on_heart_rate_received(self, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate):
+        # 采集线程只递增版本号，快照的构建与推送都在服务器线程中完成
+        self.version += 1
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.started_event.clear()
+        self.thread = threading.Thread(target=self._run, name="TelemetryServer", daemon=True)
+        self.thread.start()
+        self.started_event.wait(timeout=5)
+        if self.server is None:
+            self.thread = None
+            raise OSError(f"无法在 {self.host}:{self.port} 上启动遥测服务")
+        self.collector.add_listener(self)
+        print(f"遥测服务已启动: http://{self.host}:{self.port}/snapshot")
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.collector.remove_listener(self)
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        self.thread.join(timeout=5)
+        self.thread = None
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._handle_connection, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            print(f"启动遥测服务失败: {e}")
+            self.started_event.set()
+            self.loop.close()
+            return
+        self.changed_event = asyncio.Event()
+        self.broadcaster = self.loop.create_task(self._broadcast())
+        self.started_event.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+            self.server = None
+
+    async def _shutdown(self):
+        self.server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop.stop()
+
+    def build_snapshot(self):
+        collector = self.collector
+        snapshot = {
+            "heart_rate": collector.get_current_heart_rate(),
+            "average_heart_rate": round(collector.get_average_heart_rate(), 1),
+            "lap_average_heart_rate": round(collector.get_lap_average_heart_rate(), 1),
+            "last_lap_average_heart_rate": round(collector.last_lap_average_rate, 1),
+        }
+        controller = self.controller
+        if controller is not None:
+            snapshot.update({
+                "running": controller.is_running,
+                "level": controller.current_level,
+                "speed": controller.simulator.get_current_speed(),
+                "distance": round(controller.simulator.get_distance_covered(), 2),
+                "laps": controller.laps_completed,
+                "lap_distance": controller.lap_distance,
+                "heart_rate_threshold": controller.heart_rate_threshold,
+            })
+        return snapshot
+
+    async def _broadcast(self):
+        last_version = None
+        while True:
+            version = self.version
+            snapshot = self.build_snapshot()
+            snapshot_json = json.dumps(snapshot, ensure_ascii=False)
+            # 心率不变时速度、距离等仍可能变化，因此以快照内容判断是否需要推送
+            if version != last_version or snapshot_json != self.snapshot_json:
+                last_version = version
+                self.snapshot_json = snapshot_json
+                self.frame = encode_websocket_frame(json.dumps({**snapshot, "timestamp": time.time()}).encode("utf-8"))
+                changed_event, self.changed_event = self.changed_event, asyncio.Event()
+                changed_event.set()
+            await asyncio.sleep(self.update_interval)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        if len(request) > MAX_REQUEST_HEADER_BYTES:
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(parts[1] if len(parts) > 1 else "/")
+        try:
+            if parts[0] == "GET" and url.path == "/snapshot":
+                await self._send_http(writer, "200 OK", json.dumps(self.build_snapshot(), ensure_ascii=False).encode("utf-8"))
+            elif parts[0] == "GET" and url.path == "/stream" and headers.get("upgrade", "").lower() == "websocket":
+                await self._stream(reader, writer, headers, parse_qs(url.query))
+            else:
+                await self._send_http(writer, "404 Not Found", b'{"error": "not found"}')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send_http(self, writer, status, body):
+        writer.write((f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\n"
+                      "Cache-Control: no-store\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream(self, reader, writer, headers, query):
+        key = headers.get("sec-websocket-key", "").encode("latin-1")
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest()).decode("latin-1")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+        try:
+            interval = max(float(query.get("interval", [self.update_interval])[0]), self.update_interval)
+        except ValueError:
+            interval = self.update_interval
+
+        self.client_count += 1
+        metrics.set_gauge("telemetry_clients", self.client_count)
+        receiver = asyncio.ensure_future(self._receive(reader, writer))
+        try:
+            last_sent = 0.0
+            while not receiver.done():
+                if self.frame is not None:
+                    writer.write(self.frame)
+                    await asyncio.wait_for(writer.drain(), SEND_TIMEOUT_SECONDS)
+                    last_sent = self.loop.time()
+                    metrics.increment("telemetry_messages_total")
+                waiter = asyncio.ensure_future(self.changed_event.wait())
+                await asyncio.wait([receiver, waiter], return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if receiver.done():
+                    break
+                # 客户端限速：在间隔内到达的更新合并为最新的一条
+                delay = interval - (self.loop.time() - last_sent)
+                if delay > 0:
+                    await asyncio.wait([receiver], timeout=delay)
+        finally:
+            receiver.cancel()
+            self.client_count -= 1
+            metrics.set_gauge("telemetry_clients", self.client_count)
+
+    async def _receive(self, reader, writer):
+        """处理客户端的关闭与 ping 消息；连接关闭时返回"""
+        try:
+            while True:
+                opcode, payload = await read_websocket_frame(reader)
+                if opcode == 0x8:
+                    writer.write(encode_websocket_frame(payload[:2], opcode=0x8))
+                    return
+                if opcode == 0x9:
+                    writer.write(encode_websocket_frame(payload, opcode=0xA))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
@@ -9,8 +9,15 @@ The module integrates with:
 - `TreadmillSimulator`: To control the simulated treadmill speed and distance.
 - UI elements (via tkinter): To receive user inputs like exercise level, lap distance, and age,
   and to update UI labels displaying current speed, distance, laps, and post-exercise heart rate.
+- `lap_records`: The per-lap segment table (times, distance, speeds, heart rate, speed
+  reduction type) recorded at each lap boundary and saved with the session.
+- `recovery_measurement`: Heart-rate recovery after the exercise (post-exercise average,
+  HRR at 60 s and 120 s), measured on the collector's readings and saved with the session.
 - `HeartRateCollector`: To receive real-time heart rate data for monitoring and speed adjustments.
-- `exercise_data_manager`: To save exercise session data to CSV files for historical records.
+- `session_store`: To save exercise session data (CSV files or SQLite) for historical records.
+- `session_journal`: To journal the session in progress so it can be recovered after a crash.
+- `speed_control`: The speed-control policy that decides speed changes from laps and heart rate.
+- `user_profiles`: The selected member's profile (maximum heart rate) and per-user session index.
 Key functionalities include:
 - Starting and stopping exercise sessions.
 - Setting exercise level and lap distance.
@@ -22,7 +29,7 @@ Key functionalities include:
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-06
-Last Modified: 2025-03-24
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -32,8 +39,13 @@ import tkinter as tk
 import threading
 from tkinter import messagebox
 import datetime
-from core.exercise_data_manager import save_exercise_data, update_exercise_data_feedback
-from core.speed_config import SPEED_LEVELS, get_speed_levels
+from core import metrics
+from core.lap_records import make_lap_record
+from core.session_store import CsvSessionStore
+from core.session_journal import SessionJournal, DEFAULT_FSYNC_INTERVAL
+from core.speed_config import get_program_registry
+from core.speed_control import HEART_RATE_THRESHOLD_FRACTION, MIN_EXERCISE_SPEED, PROGRAM_FINISHED_REASON, create_control_policy
+from core.user_profiles import get_max_heart_rate
 
 class TreadmillController:
     def __init__(self,
@@ -46,7 +58,11 @@ class TreadmillController:
                 exercise_completion_callback,
                 heart_rate_collector,
                 age_entry,
-                post_exercise_average_rate_label):
+                post_exercise_average_rate_label,
+                session_store=None,
+                journal_fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                control_policy=None,
+                user_profiles=None):
         self.simulator = treadmill_simulator
         self.level_var = level_var
         self.distance_entry = distance_entry
@@ -56,10 +72,14 @@ class TreadmillController:
         self.age_entry = age_entry
         self.post_exercise_average_rate_label = post_exercise_average_rate_label
 
-        self.speed_levels = []
-        self.current_speed_index = 0
+        self.speed_program = None
+        self.control_policy = control_policy if control_policy is not None else create_control_policy()
+        self.next_policy_update_time = 0.0
         self.lap_distance = 0
         self.laps_completed = 0
+        self.lap_records = []
+        self.lap_start_time = 0.0
+        self.lap_start_sample = 0
         self.speed_update_interval = 1
         self.is_running = False
         self.last_distance = 0
@@ -67,17 +87,22 @@ class TreadmillController:
         self.lock = threading.Lock()
         self.exercise_completion_callback = exercise_completion_callback
         self.heart_rate_collector = heart_rate_collector
+        self.session_store = session_store if session_store is not None else CsvSessionStore()
+        self.journal_fsync_interval = journal_fsync_interval
+        self.session_journal = None
+        self.user_profiles = user_profiles
+        self.current_user_id = None
+        self.session_user_id = None
 
         self.max_heart_rate = 0
         self.heart_rate_threshold = 0
-        self.is_heart_rate_exceeded = False
-        self.reduction_counter = 0
-        self.reduction_stage = "small"
-        self.post_exercise_heart_rates = []
         self.post_exercise_collection_active = False
+        self.recovery_filename = None
+        self.recovery_lock = threading.Lock()
         self.exercise_start_time = None
         self.total_distance_meters = 0.0
         self.current_filename = None # 初始化 current_filename
+        self.current_level = None
 
 
     def start_exercise(self):
@@ -102,39 +127,47 @@ class TreadmillController:
                 messagebox.showerror("错误", "年龄必须是正整数。")
                 return False
             self.max_heart_rate = 220 - age
-            self.heart_rate_threshold = self.max_heart_rate * 0.8
+            profile = self._get_current_profile()
+            if profile is not None and profile.get("max_heart_rate"):
+                # 档案中记录了实测最大心率时优先使用
+                self.max_heart_rate = get_max_heart_rate(profile)
+            self.heart_rate_threshold = self.max_heart_rate * HEART_RATE_THRESHOLD_FRACTION
         except ValueError:
             messagebox.showerror("错误", "年龄必须是整数。")
             return False
 
 
         try:
-            self.speed_levels = get_speed_levels(int(level))
+            self.speed_program = get_program_registry().get_program(level)
         except ValueError as e:
             messagebox.showerror("错误", str(e))
             return False
 
-        if not self.speed_levels:
+        if not len(self.speed_program):
             messagebox.showerror("错误", "该等级没有预设速度。")
             return False
 
         self.lap_distance = distance_per_lap
-        self.current_speed_index = 0
+        self.current_level = level
         self.laps_completed = 0
+        self.lap_records = []
+        self.lap_start_time = 0.0
+        self.lap_start_sample = 0
         self.last_distance = 0
         self.is_running = True
-        self.is_heart_rate_exceeded = False
-        self.reduction_counter = 0
-        self.reduction_stage = "small"
-        self.post_exercise_collection_active = False
+        self.control_policy.start(self.speed_program, self.heart_rate_threshold)
+        self.next_policy_update_time = 0.0
+        self.finish_recovery_measurement()
         self.exercise_start_time = datetime.datetime.now()
         self.total_distance_meters = 0.0 
 
         timestamp_str = self.exercise_start_time.strftime("%Y%m%d-%H%M%S")
         self.current_filename = f"heart_rate_log_{timestamp_str}.csv" # 生成并保存文件名
+        self.session_user_id = profile["user_id"] if profile is not None else None
+        self._open_session_journal(level, distance_per_lap, age)
 
-        self.simulator.distance_covered = 0.0
-        initial_speed = self.speed_levels[0]
+        self.simulator.reset_distance()
+        initial_speed = self.control_policy.initial_speed()
         self.simulator.set_speed(initial_speed)
         self.simulator.start()
         self._update_ui_labels()
@@ -145,6 +178,7 @@ class TreadmillController:
         if self.is_running:
             self.is_running = False
             self.simulator.stop()
+            self._record_partial_lap()
             self._update_ui_labels()
             self._start_post_exercise_heart_rate_collection()
 
@@ -158,48 +192,102 @@ class TreadmillController:
                 exercise_end_time = datetime.datetime.now()
                 exercise_duration_seconds = int((exercise_end_time - self.exercise_start_time).total_seconds())
 
+            saved = False
             if session_data:
                 timestamp_str = self.exercise_start_time.strftime("%Y%m%d-%H%M%S")
                 filename = f"heart_rate_log_{timestamp_str}.csv"
-                save_exercise_data(filename, session_data, level, lap_distance, age, exercise_duration_seconds, self.laps_completed, self.total_distance_meters) 
-                print(f"运动数据已保存到: {filename}")
+                saved = self.session_store.save(filename, session_data, level, lap_distance, age, exercise_duration_seconds, self.laps_completed, self.total_distance_meters) 
+                if saved:
+                    print(f"运动数据已保存到: {filename}")
+                    self.recovery_filename = filename
+                    if self.lap_records:
+                        self.session_store.save_laps(filename, list(self.lap_records))
+                    if self.user_profiles is not None and self.session_user_id:
+                        self.user_profiles.add_session(self.session_user_id, filename)
             else:
+                saved = True
                 print("没有心率数据需要保存。")
+            self._close_session_journal(discard=saved)
 
-
-    def _start_post_exercise_heart_rate_collection(self):
-        self.post_exercise_heart_rates = []
-        self.post_exercise_collection_active = True
-        self._collect_post_exercise_heart_rate(60)
-
-    def _collect_post_exercise_heart_rate(self, seconds_left):
-        if not self.post_exercise_collection_active:
+    def _record_partial_lap(self):
+        # 运动在圈程中途停止时记录未完成的最后一圈，使圈程表覆盖整个会话
+        end_sample = self.heart_rate_collector.get_sample_count()
+        if end_sample <= self.lap_start_sample:
             return
+        self.lap_records.append(make_lap_record(
+            self.laps_completed + 1, self.lap_start_time, self.heart_rate_collector.get_session_time(), self.lap_start_sample,
+            end_sample, self.simulator.get_distance_covered() - self.last_distance, self.simulator.get_current_speed(), None,
+            self.heart_rate_collector.get_lap_average_heart_rate(), self.heart_rate_collector.get_lap_max_heart_rate(), None,
+            completed=False))
 
-        current_heart_rate = self.heart_rate_collector.get_current_heart_rate()
-        if current_heart_rate is not None:
-            self.post_exercise_heart_rates.append(current_heart_rate)
+    def _open_session_journal(self, level, lap_distance, age):
+        try:
+            self.session_journal = SessionJournal(self.current_filename, level, lap_distance, age, self.journal_fsync_interval,
+                                                  user_id=self.session_user_id)
+        except OSError as e:
+            print(f"创建会话日志时出错: {e}")
+            self.session_journal = None
+        self.heart_rate_collector.start_collection()
+        self.heart_rate_collector.set_journal(self.session_journal)
+
+    def _get_current_profile(self):
+        if self.user_profiles is None or not self.current_user_id:
+            return None
+        return self.user_profiles.get_profile(self.current_user_id)
 
-        if self.post_exercise_heart_rates:
-            average_post_exercise_heart_rate = sum(self.post_exercise_heart_rates) / len(self.post_exercise_heart_rates)
-            self.post_exercise_average_rate_label.config(text=f"{average_post_exercise_heart_rate:.1f} bpm")
-        else:
-            self.post_exercise_average_rate_label.config(text="等待心率数据...")
+    def _close_session_journal(self, discard):
+        self.heart_rate_collector.stop_collection()
+        self.heart_rate_collector.set_journal(None)
+        if self.session_journal is not None:
+            self.session_journal.close(discard=discard)
+            self.session_journal = None
 
 
-        if seconds_left > 0:
-            self.post_exercise_average_rate_label.after(1000, self._collect_post_exercise_heart_rate, seconds_left - 1)
-        else:
-            self.post_exercise_collection_active = False
-            if self.post_exercise_heart_rates:
-                average_post_exercise_heart_rate = sum(self.post_exercise_heart_rates) / len(self.post_exercise_heart_rates)
-                self.post_exercise_average_rate_label.config(text=f"{average_post_exercise_heart_rate:.1f} bpm")
-            else:
-                self.post_exercise_average_rate_label.config(text="无法获取心率数据")
+    def _start_post_exercise_heart_rate_collection(self):
+        self.finish_recovery_measurement()
+        self.post_exercise_collection_active = True
+        self._set_post_exercise_text("等待心率数据...")
+        # 恢复测量由心率采集器的读数驱动，不依赖 Tk 定时器，无界面时同样可用
+        self.heart_rate_collector.start_recovery_measurement(on_update=self._on_recovery_update,
+                                                             on_complete=self._on_recovery_complete)
+
+    def _on_recovery_update(self, recovery_measurement):
+        average_post_exercise_heart_rate = recovery_measurement.get_average()
+        if average_post_exercise_heart_rate is None:
+            return
+        text = f"{average_post_exercise_heart_rate:.1f} bpm"
+        hrr_60 = recovery_measurement.get_hrr(60)
+        if hrr_60 is not None:
+            text += f" (1分钟恢复 {hrr_60:.1f} bpm)"
+        self._set_post_exercise_text(text)
+
+    def _on_recovery_complete(self, recovery_measurement):
+        self.finish_recovery_measurement()
+
+    def finish_recovery_measurement(self):
+        """结束心率恢复测量并保存已测得的结果；开始新的运动或退出程序时也会调用"""
+        # 可能在圈程线程持有 self.lock 时经 _exercise_completed 调用，因此使用单独的锁
+        with self.recovery_lock:
+            recovery_measurement = self.heart_rate_collector.stop_recovery_measurement()
+            filename, self.recovery_filename = self.recovery_filename, None
+        if recovery_measurement is None:
+            return
+        self.post_exercise_collection_active = False
+        if not recovery_measurement.has_data():
+            self._set_post_exercise_text("无法获取心率数据")
+            return
+        if filename:
+            self.session_store.save_recovery(filename, recovery_measurement.to_dict())
+            metrics.increment("recovery_measurements_total")
+            print(f"心率恢复数据已保存到: {filename}")
+
+    def _set_post_exercise_text(self, text):
+        if self.post_exercise_average_rate_label is not None:
+            metrics.tk_after(self.post_exercise_average_rate_label, self.post_exercise_average_rate_label.config, {"text": text})
 
 
     def _start_speed_update_thread(self):
-        self.update_speed_after_lap_thread = threading.Thread(target=self._update_speed_after_lap, daemon=True)
+        self.update_speed_after_lap_thread = threading.Thread(target=self._update_speed_after_lap, name="LapMonitor", daemon=True)
         self.update_speed_after_lap_thread.start()
 
     def _update_speed_after_lap(self):
@@ -207,59 +295,81 @@ class TreadmillController:
             time.sleep(self.speed_update_interval)
             current_distance = self.simulator.get_distance_covered()
             distance_since_last_update = current_distance - self.last_distance
+            elapsed_seconds = (datetime.datetime.now() - self.exercise_start_time).total_seconds()
+            current_heart_rate = self.heart_rate_collector.get_current_heart_rate()
+            self.control_policy.on_heart_rate(elapsed_seconds, current_heart_rate)
             if distance_since_last_update >= self.lap_distance:
+                lap_processing_start = time.perf_counter()
+                self._record_lap_detection_lag(distance_since_last_update)
                 lap_average_heart_rate = self.heart_rate_collector.get_lap_average_heart_rate()
+                lap_max_heart_rate = self.heart_rate_collector.get_lap_max_heart_rate()
+                lap_end_time = self.heart_rate_collector.get_session_time()
+                lap_end_sample = self.heart_rate_collector.get_sample_count()
 
                 with self.lock:
                     self.laps_completed += 1
                     self.last_distance = current_distance
                     self.heart_rate_collector.start_new_lap()
-                    if lap_average_heart_rate > self.heart_rate_threshold and not self.is_heart_rate_exceeded:
-                        self.is_heart_rate_exceeded = True
-                        print(f"本圈平均心率 {lap_average_heart_rate:.1f} bpm 超出阈值 {self.heart_rate_threshold:.1f} bpm，下一圈程开始降速")
-                    if self.is_heart_rate_exceeded:
-                        current_speed = self.simulator.get_current_speed()
-                        if self.reduction_counter < 3:
-                            new_speed = current_speed - 0.3
-                            self.reduction_counter += 1
-                            reduction_type = "小降速"
-                        else:
-                            new_speed = current_speed - 0.5
-                            reduction_type = "大降速"
-                        if new_speed < 3.5:
-                            new_speed = 0.0
-                            self._exercise_completed(reason="heart_rate_stop")
-                            print(f"{reduction_type}, 速度降至低于3.5km/h，运动停止。")
-                        else:
-                            self.simulator.set_speed(new_speed)
-                            print(f"完成圈程 {self.laps_completed}, {reduction_type} 速度调整为 {new_speed} km/h，本圈平均心率{lap_average_heart_rate:.1f}bpm，阈值{self.heart_rate_threshold:.1f}bpm")
-                    else:
-                        self.current_speed_index += 1
-                        if self.current_speed_index < len(self.speed_levels):
-                            new_speed = self.speed_levels[self.current_speed_index]
-                            self.simulator.set_speed(new_speed)
-                            print(f"完成圈程 {self.laps_completed}, 速度调整为 {new_speed} km/h, 本圈平均心率{lap_average_heart_rate:.1f}bpm，阈值{self.heart_rate_threshold:.1f}bpm")
-                        else:
-                            print("速度列表已结束，停止运动。")
-                            self._exercise_completed()
+                    if self.session_journal is not None:
+                        self.session_journal.record_progress(self.laps_completed, current_distance)
+                    lap_speed = self.simulator.get_current_speed()
+                    decision = self.control_policy.on_lap_completed(elapsed_seconds, self.laps_completed, lap_average_heart_rate, lap_speed)
+                    # 先记录本圈再执行调速，调速可能结束运动并保存会话
+                    self.lap_records.append(make_lap_record(
+                        self.laps_completed, self.lap_start_time, lap_end_time, self.lap_start_sample, lap_end_sample,
+                        distance_since_last_update, lap_speed,
+                        decision.speed if decision is not None else None, lap_average_heart_rate, lap_max_heart_rate,
+                        decision.reason if decision is not None else None))
+                    self.lap_start_time = lap_end_time
+                    self.lap_start_sample = lap_end_sample
+                    self._apply_speed_decision(decision, f"完成圈程 {self.laps_completed}, 本圈平均心率{lap_average_heart_rate:.1f}bpm，阈值{self.heart_rate_threshold:.1f}bpm")
+                metrics.increment("laps_completed_total")
+                metrics.observe("lap_processing_seconds", time.perf_counter() - lap_processing_start)
+            if self.is_running and self.control_policy.update_interval is not None and elapsed_seconds >= self.next_policy_update_time:
+                self.next_policy_update_time = elapsed_seconds + self.control_policy.update_interval
+                with self.lock:
+                    decision = self.control_policy.update(elapsed_seconds, self.simulator.get_current_speed())
+                    self._apply_speed_decision(decision, f"心率 {current_heart_rate} bpm，阈值{self.heart_rate_threshold:.1f}bpm")
             self._update_distance_label()
             self._schedule_ui_update()
 
 
+    def _apply_speed_decision(self, decision, detail):
+        if decision is None or not self.is_running:
+            return
+        if decision.finished:
+            if decision.reason != PROGRAM_FINISHED_REASON:
+                print(f"{decision.reason}, 速度降至低于{MIN_EXERCISE_SPEED}km/h，运动停止。")
+                self._exercise_completed(reason="heart_rate_stop")
+            else:
+                print(f"{decision.reason}，停止运动。")
+                self._exercise_completed()
+            return
+        self.simulator.set_speed(decision.speed)
+        print(f"{decision.reason}: 速度调整为 {decision.speed:.1f} km/h，{detail}")
+
+    def _record_lap_detection_lag(self, distance_since_last_update):
+        # 圈程检测按固定间隔轮询，越过圈程终点的距离换算成检测滞后时间
+        if not metrics.enabled:
+            return
+        speed_meters_per_second = self.simulator.get_current_speed() / 3.6
+        if speed_meters_per_second > 0:
+            metrics.observe("lap_detection_lag_seconds", (distance_since_last_update - self.lap_distance) / speed_meters_per_second)
+
     def _update_distance_label(self): 
         if self.is_running:
             distance_covered = self.simulator.get_distance_covered()
             self.total_distance_meters = distance_covered 
             distance_text = f"{distance_covered:.2f} 米"
-            self.distance_label.after(0, self.distance_label.config, {"text": distance_text})
+            metrics.tk_after(self.distance_label, self.distance_label.config, {"text": distance_text})
 
 
     def _exercise_completed(self, reason = None):
         level = self._get_selected_level()
         if reason == "heart_rate_stop":
-            message = f"本次等级{level}运动结束，运动距离{self.total_distance_meters:.2f}米，因心率超过阈值停止，共完成{self.laps_completed}圈，平均心率{self.heart_rate_collector.get_average_heart_rate():.1f}bpm，最高心率{max(self.heart_rate_collector.get_all_heart_rates())}bpm。\n\n心率过高，建议适当减少运动强度喔。"
+            message = f"本次等级{level}运动结束，运动距离{self.total_distance_meters:.2f}米，因心率超过阈值停止，共完成{self.laps_completed}圈，平均心率{self.heart_rate_collector.get_average_heart_rate():.1f}bpm，最高心率{self.heart_rate_collector.get_max_heart_rate()}bpm。\n\n心率过高，建议适当减少运动强度喔。"
         elif level:
-            message = f"等级{level}运动已完成，运动距离{self.total_distance_meters:.2f}米，共完成{self.laps_completed}圈，平均心率{self.heart_rate_collector.get_average_heart_rate():.1f}bpm，最高心率{max(self.heart_rate_collector.get_all_heart_rates())}bpm。\n\n运动强度达标，状态良好，继续保持！！"
+            message = f"等级{level}运动已完成，运动距离{self.total_distance_meters:.2f}米，共完成{self.laps_completed}圈，平均心率{self.heart_rate_collector.get_average_heart_rate():.1f}bpm，最高心率{self.heart_rate_collector.get_max_heart_rate()}bpm。\n\n运动强度达标，状态良好，继续保持！！"
         else:
             message = "运动结束！"
 
@@ -276,7 +386,7 @@ class TreadmillController:
 
         def record_feedback(feedback_value):
             if self.current_filename:
-                update_exercise_data_feedback(self.current_filename, feedback_value) 
+                self.session_store.update_feedback(self.current_filename, feedback_value)
                 print(f"反馈 '{feedback_value}' 已保存到文件: {self.current_filename}")
             else:
                 print("错误: 无法获取当前文件名，反馈未保存。")
@@ -304,7 +414,7 @@ class TreadmillController:
 
     def _schedule_ui_update(self):
         if self.is_running:
-            self.current_speed_label.after(0, self._update_ui_labels)
+            metrics.tk_after(self.current_speed_label, self._update_ui_labels)
 
 
     def _update_ui_labels(self):
@@ -325,9 +435,9 @@ class TreadmillController:
         else:
             lap_text = "0 圈"
 
-        self.current_speed_label.after(0, self.current_speed_label.config, {"text": current_speed_text})
-        self.distance_label.after(0, self.distance_label.config, {"text": distance_text})
-        self.lap_label.after(0, self.lap_label.config, {"text": lap_text})
+        metrics.tk_after(self.current_speed_label, self.current_speed_label.config, {"text": current_speed_text})
+        metrics.tk_after(self.distance_label, self.distance_label.config, {"text": distance_text})
+        metrics.tk_after(self.lap_label, self.lap_label.config, {"text": lap_text})
 
 
     def _get_selected_level(self):
@@ -335,7 +445,7 @@ class TreadmillController:
         if not level_str:
             messagebox.showerror("错误", "请选择运动等级。")
             return None
-        if level_str not in [str(l) for l in SPEED_LEVELS.keys()]:
+        if not get_program_registry().has_program(level_str):
             messagebox.showerror("错误", "选择的运动等级无效。")
             return None
         return level_str
@@ -0,0 +1,186 @@
+"""
+user_profiles.py
+User Profile Module
+===================
+This module keeps the profiles of the gym members using the treadmill, so age and the
+usual exercise parameters do not have to be typed in for every run, and indexes each
+member's sessions so their history can be looked up without scanning all records.
+Profiles and the per-user session index are stored together in
+`data/user_profiles.json`:
+    {"version": 1,
+     "profiles": {user_id: {"user_id", "name", "age", "max_heart_rate", "preferred_level", "lap_distance"}},
+     "sessions": {user_id: [session filename, ...]}}
+`max_heart_rate` is optional; when it is missing the usual estimate (220 - age) is used.
+The store is loaded lazily, guarded by a lock and rewritten atomically (temporary file +
+`os.replace`) whenever it changes. Session lookups use an in-memory reverse index.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import json
+import os
+import threading
+import uuid
+
+from core import exercise_data_manager
+
+USER_PROFILES_FILENAME = "user_profiles.json"
+USER_PROFILES_VERSION = 1
+
+
+def get_max_heart_rate(profile):
+    return profile.get("max_heart_rate") or 220 - profile["age"]
+
+
+class UserProfileStore:
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.profiles = None
+        self.sessions = None
+        self.session_users = None
+
+    def _get_path(self):
+        return self.path or os.path.join(exercise_data_manager.DATA_FOLDER, USER_PROFILES_FILENAME)
+
+    def _load(self):
+        if self.profiles is not None:
+            return
+        self.profiles = {}
+        self.sessions = {}
+        path = self._get_path()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = json.load(f)
+                if content.get("version") == USER_PROFILES_VERSION:
+                    self.profiles = content.get("profiles", {})
+                    self.sessions = {user_id: set(filenames) for user_id, filenames in content.get("sessions", {}).items()}
+            except (OSError, ValueError) as e:
+                print(f"读取用户档案时出错: {e}")
+        self.session_users = {filename: user_id for user_id, filenames in self.sessions.items() for filename in filenames}
+
+    def list_profiles(self):
+        with self.lock:
+            self._load()
+            return sorted((dict(profile) for profile in self.profiles.values()), key=lambda profile: profile["name"])
+
+    def get_profile(self, user_id):
+        with self.lock:
+            self._load()
+            profile = self.profiles.get(user_id)
+            return dict(profile) if profile else None
+
+    def find_by_name(self, name):
+        with self.lock:
+            self._load()
+            for profile in self.profiles.values():
+                if profile["name"] == name:
+                    return dict(profile)
+            return None
+
+    def save_profile(self, name, age, max_heart_rate=None, preferred_level=None, lap_distance=None):
+        """按姓名新建或更新用户档案，返回保存后的档案；参数无效时抛出 ValueError"""
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("用户名不能为空。")
+        age = int(age)
+        if age <= 0:
+            raise ValueError("年龄必须是正整数。")
+        if max_heart_rate is not None:
+            max_heart_rate = int(max_heart_rate)
+            if max_heart_rate <= 0:
+                raise ValueError("最大心率必须是正整数。")
+        if lap_distance is not None:
+            lap_distance = float(lap_distance)
+            if lap_distance <= 0:
+                raise ValueError("圈程距离必须是正数。")
+        with self.lock:
+            self._load()
+            existing = self.find_by_name(name)
+            user_id = existing["user_id"] if existing else uuid.uuid4().hex[:12]
+            profile = {
+                "user_id": user_id,
+                "name": name,
+                "age": age,
+                "max_heart_rate": max_heart_rate,
+                "preferred_level": preferred_level or None,
+                "lap_distance": lap_distance,
+            }
+            self.profiles[user_id] = profile
+            self._save()
+            return dict(profile)
+
+    def delete_profile(self, user_id):
+        """删除用户档案，其运动记录保留但不再归属该用户"""
+        with self.lock:
+            self._load()
+            if self.profiles.pop(user_id, None) is None:
+                return False
+            for filename in self.sessions.pop(user_id, ()):
+                self.session_users.pop(filename, None)
+            self._save()
+            return True
+
+    def add_session(self, user_id, filename):
+        with self.lock:
+            self._load()
+            if user_id not in self.profiles:
+                return
+            self.sessions.setdefault(user_id, set()).add(filename)
+            self.session_users[filename] = user_id
+            self._save()
+
+    def remove_session(self, filename):
+        with self.lock:
+            self._load()
+            user_id = self.session_users.pop(filename, None)
+            if user_id is not None:
+                self.sessions[user_id].discard(filename)
+                self._save()
+
+    def remove_sessions(self, filenames):
+        """批量删除记录时使用，只写一次档案文件"""
+        with self.lock:
+            self._load()
+            removed = False
+            for filename in filenames:
+                user_id = self.session_users.pop(filename, None)
+                if user_id is not None:
+                    self.sessions[user_id].discard(filename)
+                    removed = True
+            if removed:
+                self._save()
+
+    def get_session_filenames(self, user_id):
+        """返回用户的运动记录文件名，最新的在前 (文件名中的时间戳可直接排序)"""
+        with self.lock:
+            self._load()
+            return sorted(self.sessions.get(user_id, ()), reverse=True)
+
+    def get_user_for_session(self, filename):
+        with self.lock:
+            self._load()
+            return self.session_users.get(filename)
+
+    def _save(self):
+        path = self._get_path()
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        content = {
+            "version": USER_PROFILES_VERSION,
+            "profiles": self.profiles,
+            "sessions": {user_id: sorted(filenames) for user_id, filenames in self.sessions.items()},
+        }
+        temp_path = path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(content, f, ensure_ascii=False, indent=4)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入用户档案时出错: {e}")
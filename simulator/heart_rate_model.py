@@ -0,0 +1,97 @@
+"""
+heart_rate_model.py
+Physiological Heart Rate Model
+==============================
+This module provides a physiological heart-rate model for the simulators. Instead of
+drawing readings from a fixed range, heart rate follows the treadmill speed:
+- The steady-state heart rate rises linearly from the resting heart rate to the
+  age-dependent maximum (220 - age) at `speed_at_max_heart_rate`.
+- Heart rate approaches the steady state with first-order kinetics, with a faster time
+  constant when rising than when recovering after the speed drops or the exercise stops.
+- Cardiac drift slowly raises the steady state during sustained effort.
+- Gaussian sensor noise is added to each reading.
+The model is vectorized over lanes: every parameter can be a scalar or one value per lane,
+`step` advances all lanes by one time step, and `generate` pre-generates whole sessions
+(one row of readings per lane) from a speed profile. Pass `seed` for reproducible output.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import numpy as np
+
+DEFAULT_RESTING_HEART_RATE = 70
+DEFAULT_SPEED_AT_MAX_HEART_RATE = 16.0
+DEFAULT_RISE_TIME_CONSTANT = 30.0
+DEFAULT_RECOVERY_TIME_CONSTANT = 60.0
+DEFAULT_DRIFT_BPM_PER_MINUTE = 0.2
+DEFAULT_NOISE_STD = 2.0
+DRIFT_INTENSITY_FRACTION = 0.5
+MIN_HEART_RATE = 30
+
+
+class HeartRateModel:
+    def __init__(self, ages, resting_heart_rates=DEFAULT_RESTING_HEART_RATE,
+                 speed_at_max_heart_rate=DEFAULT_SPEED_AT_MAX_HEART_RATE,
+                 rise_time_constant=DEFAULT_RISE_TIME_CONSTANT, recovery_time_constant=DEFAULT_RECOVERY_TIME_CONSTANT,
+                 drift_bpm_per_minute=DEFAULT_DRIFT_BPM_PER_MINUTE, noise_std=DEFAULT_NOISE_STD, seed=None):
+        self.ages = np.atleast_1d(np.asarray(ages, dtype=np.float64))
+        self.lanes = self.ages.size
+        self.max_heart_rates = 220.0 - self.ages
+        self.resting_heart_rates = self._per_lane(resting_heart_rates)
+        self.speed_at_max_heart_rate = self._per_lane(speed_at_max_heart_rate)
+        self.rise_time_constant = self._per_lane(rise_time_constant)
+        self.recovery_time_constant = self._per_lane(recovery_time_constant)
+        self.drift_bpm_per_minute = self._per_lane(drift_bpm_per_minute)
+        self.noise_std = self._per_lane(noise_std)
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def _per_lane(self, value):
+        return np.broadcast_to(np.asarray(value, dtype=np.float64), (self.lanes,)).copy()
+
+    def reset(self):
+        self.heart_rates = self.resting_heart_rates.copy()
+        self.effort_seconds = np.zeros(self.lanes)
+
+    def steady_state(self, speeds):
+        reserve = self.max_heart_rates - self.resting_heart_rates
+        intensity = np.clip(speeds / self.speed_at_max_heart_rate, 0.0, 1.0)
+        drift = self.drift_bpm_per_minute * self.effort_seconds / 60.0
+        return np.minimum(self.resting_heart_rates + reserve * intensity + drift, self.max_heart_rates)
+
+    def step(self, speeds, dt=1.0):
+        """推进 dt 秒并返回各通道的心率读数；单通道模型传入标量速度时返回 int"""
+        scalar = np.ndim(speeds) == 0 and self.lanes == 1
+        readings = self._advance(np.broadcast_to(np.asarray(speeds, dtype=np.float64), (self.lanes,)), dt,
+                                 self.rng.standard_normal(self.lanes))
+        return int(readings[0]) if scalar else readings
+
+    def generate(self, speeds, dt=1.0):
+        """按速度曲线预先生成整段会话，返回 (通道数, 采样数) 的心率数组
+
+        speeds 可以是所有通道共用的一维曲线，也可以是每个通道一行的二维数组。
+        """
+        speeds = np.asarray(speeds, dtype=np.float64)
+        sample_count = speeds.shape[-1]
+        speeds = np.broadcast_to(speeds, (self.lanes, sample_count))
+        noise = self.rng.standard_normal((self.lanes, sample_count))
+        readings = np.empty((self.lanes, sample_count), dtype=np.int64)
+        for index in range(sample_count):
+            readings[:, index] = self._advance(speeds[:, index], dt, noise[:, index])
+        return readings
+
+    def _advance(self, speeds, dt, standard_noise):
+        target = self.steady_state(speeds)
+        # 一阶动力学：心率上升与恢复使用不同的时间常数
+        time_constants = np.where(target > self.heart_rates, self.rise_time_constant, self.recovery_time_constant)
+        self.heart_rates += (target - self.heart_rates) * (1.0 - np.exp(-dt / time_constants))
+        reserve_fraction = (self.heart_rates - self.resting_heart_rates) / (self.max_heart_rates - self.resting_heart_rates)
+        # 中等以上强度持续运动时累积心率漂移，停止运动后漂移随恢复逐渐消失
+        self.effort_seconds = np.where(reserve_fraction >= DRIFT_INTENSITY_FRACTION, self.effort_seconds + dt,
+                                       np.maximum(self.effort_seconds - dt, 0.0))
+        readings = np.rint(self.heart_rates + standard_noise * self.noise_std)
+        return np.clip(readings, MIN_HEART_RATE, self.max_heart_rates).astype(np.int64)
@@ -3,17 +3,21 @@ heart_rate_simulator.py
 Heart Rate Simulation Module
 ==============================
 This module provides a simulator for heart rate data. It is designed to generate
-realistic heart rate readings within a specified range and feed them to a
-HeartRateCollector. This simulation is useful for testing and development
-purposes when a real heart rate sensor is not available.
-The module includes the HeartRateSimulator class, which allows setting a heart
-rate range, starting and stopping the simulation, and generating random heart
-rate values within that range at one-second intervals. The simulator notifies
-a HeartRateCollector instance with each generated heart rate reading.
+realistic heart rate readings and feed them to a HeartRateCollector. This simulation
+is useful for testing and development purposes when a real heart rate sensor is not
+available.
+The module includes the HeartRateSimulator class, which generates a heart rate value
+at one-second intervals in one of two modes:
+- Range mode: random values within a heart rate range chosen with `set_rate_range`.
+- Model mode: `follow_speed` drives a physiological `HeartRateModel` with the current
+  speed of a treadmill, so heart rate rises and recovers with the exercise.
+`MultiLaneHeartRateSimulator` drives many lanes (one collector and one speed source per
+lane) from a single thread with one vectorized model step per tick, for load tests.
+Both simulators accept a `seed` for reproducible sessions.
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-06
-Last Modified: 2025-03-17
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -24,19 +28,32 @@ import random
 import time
 import threading
 
+from simulator.heart_rate_model import HeartRateModel
+
 class HeartRateSimulator:
-    def __init__(self, collector):
+    def __init__(self, collector, seed=None):
         self.running = False
         self.rate_range = None
         self.rate = 0
         self.collector = collector
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.model = None
+        self.speed_source = None
 
     def set_rate_range(self, rate_range):
+        self.model = None
         self.rate_range = rate_range
 
+    def follow_speed(self, speed_source, age, **model_options):
+        """切换到模型模式，心率随 speed_source.get_current_speed() 变化"""
+        self.speed_source = speed_source
+        self.model = HeartRateModel(age, seed=self.seed, **model_options)
+        self.rate_range = None
+
     def start(self):
         self.running = True
-        threading.Thread(target=self._simulate).start()
+        threading.Thread(target=self._simulate, name="HeartRateSimulator").start()
 
     def stop(self):
         self.running = False
@@ -44,10 +61,51 @@ class HeartRateSimulator:
         self.collector._notify_listeners(0)
         
     def _simulate(self):
-        while self.running and self.rate_range:
-            self.rate = random.randint(self.rate_range[0], self.rate_range[1])
-            self.collector._notify_listeners(self.rate)
+        while self.running and (self.rate_range or self.model):
+            self._tick()
             time.sleep(1)
 
+    def _tick(self):
+        if self.model is not None:
+            self.rate = self.model.step(self.speed_source.get_current_speed(), 1.0)
+        else:
+            self.rate = self.random.randint(self.rate_range[0], self.rate_range[1])
+        self.collector._notify_listeners(self.rate)
+
     def get_rate(self):
-        return self.rate
\ No newline at end of file
+        return self.rate
+
+
+class MultiLaneHeartRateSimulator:
+    def __init__(self, collectors, speed_sources, ages, interval=1.0, seed=None, **model_options):
+        self.collectors = collectors
+        self.speed_sources = speed_sources
+        self.interval = interval
+        self.model = HeartRateModel(ages, seed=seed, **model_options)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._simulate, name="MultiLaneHeartRateSimulator", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _simulate(self):
+        next_tick = time.monotonic()
+        while self.running:
+            self._tick()
+            next_tick += self.interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def _tick(self):
+        speeds = [speed_source.get_current_speed() for speed_source in self.speed_sources]
+        rates = self.model.step(speeds, self.interval)
+        for collector, rate in zip(self.collectors, rates.tolist()):
+            collector._notify_listeners(rate)
+        return rates
@@ -0,0 +1,135 @@
+"""
+sensor_load_generator.py
+Sensor Gateway Load Generator
+=============================
+This module provides a client for the local sensor gateway (`core.sensor_gateway`) and a
+load generator that saturates it. Each connection streams frames of synthetic heart-rate
+samples for its lanes as fast as the gateway accepts them (or at a fixed per-lane rate),
+so the gateway's throughput and backpressure can be measured.
+With `--with-gateway` an in-process gateway with one collector per lane is started, and
+the number of samples actually delivered to the collectors is reported as well:
+    python -m simulator.sensor_load_generator --with-gateway --lanes 8 --connections 4 --duration 5
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import random
+import socket
+import threading
+import time
+
+from core.heart_rate_collector import HeartRateCollector, HeartRateListener
+from core.sensor_gateway import (
+    DEFAULT_GATEWAY_HOST,
+    DEFAULT_GATEWAY_PORT,
+    MAX_SAMPLES_PER_FRAME,
+    SensorGateway,
+    encode_frame,
+)
+
+
+class SensorGatewayClient:
+    def __init__(self, host=DEFAULT_GATEWAY_HOST, port=DEFAULT_GATEWAY_PORT):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send_samples(self, lane, samples):
+        for start in range(0, len(samples), MAX_SAMPLES_PER_FRAME):
+            self.socket.sendall(encode_frame(lane, samples[start:start + MAX_SAMPLES_PER_FRAME]))
+
+    def close(self):
+        self.socket.close()
+
+
+class _CountingListener(HeartRateListener):
+    def __init__(self):
+        self.count = 0
+
+    def on_heart_rate_received(self, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate):
+        self.count += 1
+
+
+def run_connection(host, port, lanes, batch_size, duration, rate, seed, sent_counts, index):
+    rng = random.Random(seed)
+    client = SensorGatewayClient(host, port)
+    heart_rates = [rng.randint(60, 190) for _ in range(1024)]
+    sent = 0
+    start_time = time.monotonic()
+    try:
+        while time.monotonic() - start_time < duration:
+            timestamp_ms = int((time.monotonic() - start_time) * 1000)
+            for lane in lanes:
+                offset = rng.randrange(len(heart_rates) - batch_size)
+                samples = [(timestamp_ms, heart_rate) for heart_rate in heart_rates[offset:offset + batch_size]]
+                client.send_samples(lane, samples)
+                sent += batch_size
+            if rate:
+                # 按每通道的目标采样率发送；未指定时不等待，尽量压满网关
+                delay = start_time + sent / (rate * len(lanes)) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        client.close()
+    sent_counts[index] = sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="传感器网关压力测试客户端")
+    parser.add_argument("--host", default=DEFAULT_GATEWAY_HOST, help="网关地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_GATEWAY_PORT, help="网关端口")
+    parser.add_argument("--lanes", type=int, default=4, help="通道数量")
+    parser.add_argument("--connections", type=int, default=2, help="并发连接数，通道平均分配给各连接")
+    parser.add_argument("--batch-size", type=int, default=16, help="每帧采样数")
+    parser.add_argument("--duration", type=float, default=5.0, help="持续时间（秒）")
+    parser.add_argument("--rate", type=float, default=0, help="每通道每秒采样数，0 表示尽快发送")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--with-gateway", action="store_true", help="在本进程内启动网关并统计送达的采样数")
+    args = parser.parse_args()
+
+    gateway = None
+    listeners = []
+    if args.with_gateway:
+        collectors = {}
+        for lane in range(args.lanes):
+            collectors[lane] = HeartRateCollector()
+            listeners.append(_CountingListener())
+            collectors[lane].add_listener(listeners[-1])
+        gateway = SensorGateway(collectors, host=args.host, port=0)
+        gateway.start()
+
+    port = gateway.port if gateway else args.port
+    sent_counts = [0] * args.connections
+    threads = []
+    for index in range(args.connections):
+        lanes = list(range(index, args.lanes, args.connections))
+        if not lanes:
+            continue
+        threads.append(threading.Thread(target=run_connection, name=f"SensorLoad{index}",
+                                        args=(args.host, port, lanes, args.batch_size, args.duration, args.rate,
+                                              args.seed + index, sent_counts, index)))
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    sent = sum(sent_counts)
+    print(f"发送 {sent} 个采样，用时 {elapsed:.2f} 秒，{sent / elapsed:.0f} 采样/秒")
+
+    if gateway:
+        deadline = time.monotonic() + 10
+        while sum(listener.count for listener in listeners) < sent and time.monotonic() < deadline:
+            time.sleep(0.05)
+        delivered = sum(listener.count for listener in listeners)
+        elapsed = time.perf_counter() - start_time
+        print(f"网关送达 {delivered} 个采样，{delivered / elapsed:.0f} 采样/秒")
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+session_replay.py
+Session Replay Module
+=====================
+This module replays recorded sessions through a `HeartRateCollector`, in place of
+`HeartRateSimulator`, so field issues can be reproduced and the collector, controller and
+UI paths can be load-tested with production-shaped data.
+Stored sessions are read through the session store (`load_stored_session`), so CSV,
+archived and SQLite sessions can all be replayed on the time axis the store returns
+(seconds since the session start, see `session_store.load_samples`); loose CSV files from
+other kiosks are read with `load_recorded_session`.
+`SessionReplaySource` streams the recorded heart-rate samples with their original timing,
+scaled by a speed factor: 1 for real time, N for N times faster, or `None` (command line
+`--speed max`) to push the samples as fast as possible. Samples are scheduled against the
+monotonic clock from the start of the replay, so sleep overshoot does not accumulate.
+The replay can loop, and exposes the same `start`/`stop`/`get_rate` interface as the
+heart-rate simulator. From the command line it reports the achieved sample rate:
+    python -m simulator.session_replay heart_rate_log_20250316-211806.csv --speed max --loops 100
+    python -m simulator.session_replay heart_rate_log_20250316-211806.csv --backend sqlite --db data/sessions.db
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import argparse
+import os
+import threading
+import time
+
+from core.exercise_data_manager import read_session_samples
+from core.heart_rate_collector import HeartRateCollector
+from core.session_store import DEFAULT_SQLITE_PATH, create_session_store
+
+
+def load_stored_session(session_store, filename):
+    """通过会话存储读取会话，返回 [(相对会话开始的秒数, 心率), ...]"""
+    session_samples = session_store.load_samples(filename)
+    if session_samples is None:
+        raise ValueError(f"无法读取会话 {filename}。")
+    with session_samples:
+        return list(zip(session_samples.timestamps.tolist(), session_samples.heart_rates.tolist()))
+
+
+def load_recorded_session(filepath):
+    """读取不在会话存储中的 CSV 记录文件，返回 [(秒, 心率), ...]"""
+    with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
+        try:
+            timestamps, heart_rates = read_session_samples(csvfile)
+        except ValueError as e:
+            raise ValueError(f"{filepath} 不是有效的心率记录文件: {e}")
+    return list(zip(timestamps, heart_rates))
+
+
+class SessionReplaySource:
+    def __init__(self, collector, session_data, speed=1.0, loop=False):
+        self.collector = collector
+        self.session_data = session_data
+        self.speed = speed
+        self.loop = loop
+        self.running = False
+        self.rate = 0
+        self.samples_replayed = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.running or not self.session_data:
+            return
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="SessionReplay", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.rate = 0
+        self.collector._notify_listeners(0)
+
+    def run(self):
+        """在当前线程中回放，直到回放结束或调用 stop()"""
+        self.running = True
+        while self.running:
+            self._replay_once()
+            if not self.loop:
+                break
+        self.running = False
+
+    def _replay_once(self):
+        first_second = self.session_data[0][0]
+        replay_start = time.monotonic()
+        for second, heart_rate in self.session_data:
+            if not self.running:
+                return
+            if self.speed:
+                delay = replay_start + (second - first_second) / self.speed - time.monotonic()
+                if delay > 0 and self.stop_event.wait(delay):
+                    return
+            self.rate = heart_rate
+            self.samples_replayed += 1
+            self.collector._notify_listeners(heart_rate)
+
+    def get_rate(self):
+        return self.rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放已记录的心率会话")
+    parser.add_argument("session", help="会话文件名 (从会话存储读取) 或心率记录 CSV 文件路径")
+    parser.add_argument("--backend", choices=("csv", "sqlite"), default="csv", help="会话存储后端")
+    parser.add_argument("--db", default=DEFAULT_SQLITE_PATH, help="SQLite 数据库路径")
+    parser.add_argument("--speed", default="1", help="回放倍速，max 表示不等待、尽快回放")
+    parser.add_argument("--loops", type=int, default=1, help="回放次数")
+    args = parser.parse_args()
+
+    if os.path.dirname(args.session) and os.path.isfile(args.session):
+        session_data = load_recorded_session(args.session)
+    else:
+        store = create_session_store(args.backend, args.db)
+        try:
+            session_data = load_stored_session(store, args.session)
+        finally:
+            store.close()
+    speed = None if args.speed == "max" else float(args.speed)
+    collector = HeartRateCollector()
+    replay = SessionReplaySource(collector, session_data, speed=speed)
+    start_time = time.perf_counter()
+    for _ in range(args.loops):
+        replay.run()
+    elapsed = time.perf_counter() - start_time
+    print(f"回放 {replay.samples_replayed} 个采样，用时 {elapsed:.3f} 秒，"
+          f"{replay.samples_replayed / elapsed if elapsed > 0 else 0:.0f} 采样/秒")
+
+
+if __name__ == "__main__":
+    main()
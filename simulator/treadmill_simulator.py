@@ -3,10 +3,22 @@ treadmill_simulator.py
 Treadmill Simulator Module
 ==========================
 This module provides a treadmill simulation with speed control and distance tracking capabilities.
+The simulator state is one immutable tuple `(speed, distance, updated_at)` that is replaced
+as a whole on every change. Readers (`get_current_speed`, `get_distance_covered`,
+`snapshot`) read that tuple without taking the lock and always see a consistent state;
+only the writers (the one-second tick and `set_speed`) are serialized by the lock.
+`set_speed` first credits the distance covered at the previous speed, so speed changes
+between two ticks do not distort the distance.
+`TreadmillSimulatorBatch` simulates many lanes at once for multi-lane hosts: the lane
+states are NumPy arrays advanced in one vectorized step per tick from a single thread,
+and `lane(index)` returns a view with the same API as `TreadmillSimulator`, so a lane can
+be used wherever a simulator is expected (controller, heart-rate simulators). Stopping a
+lane keeps its speed but stops its distance, like stopping a `TreadmillSimulator`; the
+other lanes keep running.
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-06
-Last Modified: 2025-03-06
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision Technologies
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -15,91 +27,253 @@ This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for
 import threading
 import time
 
+import numpy as np
+
+KMH_TO_METERS_PER_SECOND = 1000.0 / 3600.0
+TICK_INTERVAL_SECONDS = 1.0
+
+
+def _validate_speed(speed):
+    if not isinstance(speed, (int, float)):
+        raise TypeError("Speed must be an integer or a float.")
+    if speed < 0:
+        raise ValueError("Speed must be a non-negative number.")
+    return speed
+
+
 class TreadmillSimulator:
+    __slots__ = ("_state", "_lock", "_stop_event", "_thread", "start_time")
+
     def __init__(
-            self, 
+            self,
             initial_speed=0.0
             ):
-        self.current_speed = self._validate_initial_speed(initial_speed)
-        self.distance_covered = 0.0
+        # (速度 km/h, 距离 m, 距离更新时刻)，整体替换，读取时无需加锁
+        self._state = (_validate_speed(initial_speed), 0.0, time.time())
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
         self.start_time = None
-        self.running = False
-        self.lock = threading.Lock()
 
-    def _validate_initial_speed(self,speed):
-        self._check_speed_type(speed)
-        self._check_speed_value(speed)
-        return speed
+    @property
+    def running(self):
+        return self._thread is not None and not self._stop_event.is_set()
 
-    def _check_speed_type(self,speed):
-        if not isinstance(speed,(int,float)):
-            raise TypeError("Speed must be an integer or a float.")
+    @property
+    def current_speed(self):
+        return self._state[0]
 
-    def _check_speed_value(self,speed):
-        if speed < 0:
-            raise ValueError("Speed must be a non-negative number.")
+    @property
+    def distance_covered(self):
+        return self._state[1]
 
     def start(self):
-        self.running = True
-        self.start_time = self._get_current_time()
-        self._start_thread()
+        now = time.time()
+        with self._lock:
+            speed, distance, _ = self._state
+            self._state = (speed, distance, now)
+        self.start_time = now
+        # 每次启动使用新的停止事件，刚停止的线程不会因重新启动而继续运行
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,), name="TreadmillSimulator")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread = None
+
+    def reset_distance(self):
+        with self._lock:
+            speed, _, _ = self._state
+            self._state = (speed, 0.0, time.time())
+
+    def set_speed(self, speed):
+        _validate_speed(speed)
+        now = time.time()
+        with self._lock:
+            old_speed, distance, updated_at = self._state
+            if self.running:
+                distance += old_speed * (now - updated_at) * KMH_TO_METERS_PER_SECOND
+            self._state = (speed, distance, now)
+
+    def _run(self, stop_event):
+        while not stop_event.wait(TICK_INTERVAL_SECONDS):
+            self._tick(time.time())
 
-    def _start_thread(self):
-        thread = threading.Thread(target=self._run)
-        thread.start()
+    def _tick(self, now):
+        with self._lock:
+            speed, distance, updated_at = self._state
+            self._state = (speed, distance + speed * (now - updated_at) * KMH_TO_METERS_PER_SECOND, now)
+
+    def snapshot(self):
+        """返回 (速度 km/h, 距离 m, 更新时刻) 的一致快照"""
+        return self._state
+
+    def get_elapsed_time(self):
+        return time.time() - self.start_time if self.start_time else 0
+
+    def get_current_speed(self):
+        return self._state[0]
+
+    def get_distance_covered(self):
+        return self._state[1]
+
+
+class TreadmillSimulatorBatch:
+    """多条跑道的跑步机模拟，每个周期用一次向量化运算推进所有跑道"""
+
+    __slots__ = ("_state", "_active", "_lock", "_stop_event", "_thread", "start_time", "lane_count")
+
+    def __init__(self, lane_count, initial_speed=0.0):
+        speeds = np.empty(lane_count, dtype=np.float64)
+        speeds.fill(_validate_speed(initial_speed))
+        self.lane_count = lane_count
+        # 数组只在锁内以新数组替换、从不原地修改，读取方拿到的快照不会被改写
+        self._state = (speeds, np.zeros(lane_count), time.time())
+        # 各跑道是否累计距离，与 _state 一样只在锁内整体替换
+        self._active = np.ones(lane_count, dtype=bool)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.start_time = None
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._stop_event.is_set()
+
+    def lane(self, index):
+        if not 0 <= index < self.lane_count:
+            raise IndexError(f"Lane index out of range: {index}")
+        return TreadmillLane(self, index)
+
+    def start(self):
+        now = time.time()
+        with self._lock:
+            speeds, distances, _ = self._state
+            self._state = (speeds, distances, now)
+        self.start_time = now
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,), name="TreadmillSimulatorBatch", daemon=True)
+        self._thread.start()
 
     def stop(self):
-        self.running = False
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
 
-    def set_speed(self,speed):
-        self._validate_speed(speed)
-        self._set_current_speed(speed)
+    def _run(self, stop_event):
+        next_tick = time.monotonic() + TICK_INTERVAL_SECONDS
+        while not stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            self.advance(time.time())
+            next_tick += TICK_INTERVAL_SECONDS
 
-    def _validate_speed(self,speed):
-        self._check_speed_type(speed)
-        self._check_speed_value(speed)
+    def advance(self, now):
+        """将所有运行中跑道的距离推进到 now"""
+        with self._lock:
+            speeds, distances, updated_at = self._state
+            self._state = (speeds, distances + speeds * self._active * ((now - updated_at) * KMH_TO_METERS_PER_SECOND), now)
 
-    def _set_current_speed(self,speed):
-        with self.lock:
-            self.current_speed = speed
+    def _settle(self, now):
+        """锁内调用：返回 (速度数组, 结算到 now 的新距离数组)"""
+        speeds, distances, updated_at = self._state
+        if self.running:
+            return speeds, distances + speeds * self._active * ((now - updated_at) * KMH_TO_METERS_PER_SECOND)
+        return speeds, distances.copy()
 
-    def _run(self):
-        last_time = self._get_current_time()
-        while self.running:
-            self._update_distance_covered(last_time)
-            last_time = self._get_current_time()
-            self._sleep_one_second()
+    def set_speed(self, index, speed):
+        _validate_speed(speed)
+        now = time.time()
+        with self._lock:
+            speeds, distances, updated_at = self._state
+            elapsed = (now - updated_at) * KMH_TO_METERS_PER_SECOND if self.running and self._active[index] else 0.0
+            # 其余跑道仍从 updated_at 开始累计：该跑道先按旧速度结算到现在，
+            # 并预先扣除下次推进时会按新速度多算的 updated_at 到现在这一段
+            distances = distances.copy()
+            distances[index] += (speeds[index] - speed) * elapsed
+            speeds = speeds.copy()
+            speeds[index] = speed
+            self._state = (speeds, distances, updated_at)
 
-    def _update_distance_covered(self,last_time):
-        with self.lock:
-            current_time = self._get_current_time()
-            elapsed_time = self._calculate_elapsed_time(last_time,current_time)
-            self.distance_covered += self._calculate_distance(elapsed_time)
+    def set_speeds(self, speeds):
+        """一次设置所有跑道的速度"""
+        speeds = np.array(speeds, dtype=np.float64)
+        if speeds.shape != (self.lane_count,):
+            raise ValueError("Speeds must contain one value per lane.")
+        if (speeds < 0).any():
+            raise ValueError("Speed must be a non-negative number.")
+        now = time.time()
+        with self._lock:
+            _, distances = self._settle(now)
+            self._state = (speeds, distances, now)
 
-    def _calculate_elapsed_time(self,last_time,current_time):
-        return current_time - last_time
+    def set_lane_running(self, index, running):
+        """启动或停止一条跑道：停止的跑道保留速度，但不再累计距离"""
+        now = time.time()
+        with self._lock:
+            if self._active[index] == running:
+                return
+            speeds, distances = self._settle(now)
+            active = self._active.copy()
+            active[index] = running
+            self._active = active
+            self._state = (speeds, distances, now)
 
-    def _calculate_distance(self, elapsed_time):
-        return self.current_speed * elapsed_time * (1000.0 / 3600.0)
+    def is_lane_running(self, index):
+        return self.running and bool(self._active[index])
+
+    def reset_distance(self, index):
+        # 先结算所有跑道并更新时刻，下次推进不会把重置前的时间计入该跑道
+        now = time.time()
+        with self._lock:
+            speeds, distances = self._settle(now)
+            distances[index] = 0.0
+            self._state = (speeds, distances, now)
+
+    def snapshot(self):
+        """返回 (速度数组, 距离数组, 更新时刻) 的一致快照，数组只读"""
+        return self._state
 
     def get_elapsed_time(self):
-        return self._calculate_elapsed_time_since_start() if self.start_time else 0
+        return time.time() - self.start_time if self.start_time else 0
 
-    def _calculate_elapsed_time_since_start(self):
-        return self._get_current_time() - self.start_time
 
-    def get_current_speed(self):
-        return self._get_value_with_lock(self.current_speed)
+class TreadmillLane:
+    """TreadmillSimulatorBatch 中一条跑道的视图，接口与 TreadmillSimulator 相同"""
 
-    def get_distance_covered(self):
-        return self._get_value_with_lock(self.distance_covered)
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
 
-    def _get_value_with_lock(self,value):
-        with self.lock:
-            return value
+    @property
+    def running(self):
+        return self.batch.is_lane_running(self.index)
 
-    def _get_current_time(self):
-        return time.time()
+    def start(self):
+        if not self.batch.running:
+            self.batch.start()
+        self.batch.set_lane_running(self.index, True)
+
+    def stop(self):
+        self.batch.set_lane_running(self.index, False)
+
+    def reset_distance(self):
+        self.batch.reset_distance(self.index)
+
+    def set_speed(self, speed):
+        self.batch.set_speed(self.index, speed)
+
+    def snapshot(self):
+        speeds, distances, updated_at = self.batch._state
+        return float(speeds[self.index]), float(distances[self.index]), updated_at
 
-    def _sleep_one_second(self):
-        time.sleep(1)
\ No newline at end of file
+    def get_elapsed_time(self):
+        return self.batch.get_elapsed_time()
+
+    def get_current_speed(self):
+        return float(self.batch._state[0][self.index])
+
+    def get_distance_covered(self):
+        return float(self.batch._state[1][self.index])
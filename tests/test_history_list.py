@@ -0,0 +1,87 @@
+"""
+test_history_list.py
+History Record List Tests
+=========================
+Tests of HistoryList with a list-backed stand-in for the Tkinter listbox, so they run
+without a display.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import tkinter as tk
+import unittest
+
+from ui_elements.history_list import EMPTY_HISTORY_TEXT, HistoryList
+
+
+class FakeListbox:
+    def __init__(self):
+        self.rows = []
+
+    def winfo_exists(self):
+        return True
+
+    def size(self):
+        return len(self.rows)
+
+    def insert(self, index, text):
+        if index == tk.END:
+            self.rows.append(text)
+        else:
+            self.rows.insert(index, text)
+
+    def delete(self, first, last=None):
+        if last is None:
+            del self.rows[first]
+        else:
+            del self.rows[first:]
+
+    def itemconfig(self, index, **options):
+        pass
+
+
+def make_preview(filename):
+    datetime_str = filename[len("heart_rate_log_"):-len(".csv")]
+    return {"filename": filename, "datetime": datetime_str, "level": "1", "lap_distance": "400", "age": "30"}
+
+
+class HistoryListTest(unittest.TestCase):
+    def setUp(self):
+        self.previews = [make_preview("heart_rate_log_20250101-080000.csv"),
+                         make_preview("heart_rate_log_20250301-080000.csv"),
+                         make_preview("heart_rate_log_20250201-080000.csv")]
+        self.listbox = FakeListbox()
+
+    def test_remove_from_search_results(self):
+        # 搜索结果没有差异信息，列表整体重建
+        history_list = HistoryList(self.listbox, lambda version: (None, self.previews, None))
+        history_list.refresh()
+        self.assertIsNone(history_list.sort_keys)
+
+        self.assertTrue(history_list.remove("heart_rate_log_20250301-080000.csv"))
+        self.assertEqual([preview["filename"] for preview in history_list.previews],
+                         ["heart_rate_log_20250101-080000.csv", "heart_rate_log_20250201-080000.csv"])
+        self.assertEqual(len(self.listbox.rows), 2)
+        self.assertFalse(history_list.remove("heart_rate_log_20250301-080000.csv"))
+
+    def test_remove_last_search_result_shows_placeholder(self):
+        history_list = HistoryList(self.listbox, lambda version: (None, self.previews[:1], None))
+        history_list.refresh()
+        history_list.remove("heart_rate_log_20250101-080000.csv")
+        self.assertEqual(self.listbox.rows, [EMPTY_HISTORY_TEXT])
+
+    def test_remove_from_sorted_list(self):
+        history_list = HistoryList(self.listbox, lambda version: (1, self.previews, None))
+        history_list.refresh()
+        self.assertTrue(history_list.remove("heart_rate_log_20250201-080000.csv"))
+        self.assertEqual(len(history_list.sort_keys), 2)
+        self.assertEqual([preview["filename"] for preview in history_list.previews],
+                         ["heart_rate_log_20250301-080000.csv", "heart_rate_log_20250101-080000.csv"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,12 +9,16 @@ simulated heart rate.
 
 The HeartRateUI class integrates a HeartRateSimulator instance to generate
 simulated heart rate data and displays it in real-time. Users can select
-predefined heart rate ranges by clicking buttons, and the UI continuously
+predefined heart rate ranges by clicking buttons, or let the heart rate follow the
+treadmill speed through the physiological model, or replay a recorded session,
+and the UI continuously
 updates the displayed heart rate to reflect the simulator's output.
 
 Key features:
 - GUI control for starting and stopping heart rate simulation.
 - Buttons for selecting predefined heart rate ranges for simulation.
+- A button to make the simulated heart rate follow the treadmill speed.
+- Replay of recorded sessions from the session store (CSV, archived or SQLite) in real time.
 - Real-time display of the simulated heart rate.
 - Integration with HeartRateSimulator for data generation.
 - Icon support for the application window.
@@ -22,7 +26,7 @@ Key features:
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-06
-Last Modified: 2025-03-17
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -30,10 +34,15 @@ This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for
 
 
 import tkinter as tk
+from tkinter import messagebox
+from core.session_store import CsvSessionStore
 from simulator.heart_rate_simulator import HeartRateSimulator
+from simulator.session_replay import SessionReplaySource, load_stored_session
+
+DEFAULT_SIMULATED_AGE = 30
 
 class HeartRateUI:
-    def __init__(self, root, collector):
+    def __init__(self, root, collector, treadmill_simulator=None, get_age=None, session_store=None):
         self.root = root
         self.root.title("心率模拟器")
 
@@ -45,6 +54,10 @@ class HeartRateUI:
 
         self.collector = collector 
         self.simulator = HeartRateSimulator(collector)  
+        self.treadmill_simulator = treadmill_simulator
+        self.get_age = get_age
+        self.session_store = session_store if session_store is not None else CsvSessionStore()
+        self.replay = None
 
         self.rate_label = tk.Label(root, text="心率: 0 bpm", font=("Arial", 24))
         self.rate_label.pack(pady=20)
@@ -58,6 +71,13 @@ class HeartRateUI:
                             command=lambda l=low, h=high: self.set_rate_range((l, h)))
             button.pack(side=tk.LEFT, padx=5)
 
+        if treadmill_simulator is not None:
+            follow_button = tk.Button(root, text="跟随跑步机速度", command=self.follow_treadmill_speed)
+            follow_button.pack(pady=5)
+
+        replay_button = tk.Button(root, text="回放历史记录", command=self.replay_recorded_session)
+        replay_button.pack(pady=5)
+
         stop_button = tk.Button(root, text="停止模拟", command=self.stop_simulation)
         stop_button.pack(pady=10)
 
@@ -66,15 +86,71 @@ class HeartRateUI:
         self.root.protocol("WM_DELETE_WINDOW", self.stop_ui)  
 
     def set_rate_range(self, rate_range):
+        self.stop_replay()
         self.simulator.set_rate_range(rate_range)
         if not self.simulator.running:
             self.simulator.start()
 
+    def follow_treadmill_speed(self):
+        self.stop_replay()
+        age = self.get_age() if self.get_age else None
+        self.simulator.follow_speed(self.treadmill_simulator, age or DEFAULT_SIMULATED_AGE)
+        if not self.simulator.running:
+            self.simulator.start()
+
+    def replay_recorded_session(self):
+        filename = self._choose_stored_session()
+        if not filename:
+            return
+        try:
+            session_data = load_stored_session(self.session_store, filename)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("回放失败", f"无法读取心率记录: {e}", parent=self.root)
+            return
+        if self.simulator.running:
+            self.simulator.stop()
+        self.stop_replay()
+        self.replay = SessionReplaySource(self.collector, session_data)
+        self.replay.start()
+
+    def _choose_stored_session(self):
+        """从会话存储的历史记录中选择要回放的会话，返回文件名或 None"""
+        previews = self.session_store.preview()
+        if not previews:
+            messagebox.showinfo("回放历史记录", "没有可回放的历史记录。", parent=self.root)
+            return None
+        dialog = tk.Toplevel(self.root)
+        dialog.title("选择心率记录")
+        listbox = tk.Listbox(dialog, width=50, height=15)
+        listbox.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        for preview in previews:
+            listbox.insert(tk.END, f"{preview['datetime']}  等级 {preview['level']}  时长 {preview['duration_seconds']} 秒")
+        selected = []
+
+        def choose(event=None):
+            selection = listbox.curselection()
+            if selection:
+                selected.append(previews[selection[0]]["filename"])
+            dialog.destroy()
+
+        listbox.bind("<Double-Button-1>", choose)
+        tk.Button(dialog, text="回放", command=choose).pack(pady=5)
+        dialog.transient(self.root)
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        return selected[0] if selected else None
+
+    def stop_replay(self):
+        if self.replay is not None:
+            self.replay.stop()
+            self.replay = None
+
     def stop_simulation(self):
+        self.stop_replay()
         self.simulator.stop()
 
     def update_rate(self):
-        rate = self.simulator.get_rate()
+        rate = self.replay.get_rate() if self.replay is not None else self.simulator.get_rate()
         self.rate_label.config(text=f"心率: {rate} bpm")
         self.root.after(1000, self.update_rate) 
 
@@ -0,0 +1,132 @@
+"""
+history_filter_bar.py
+History Filter Bar Module
+=========================
+This module implements the search and filter bar of the history window.
+The HistoryFilterBar frame lets the user filter the history records by level, age range,
+date range, duration range and feedback, and choose the column and direction to sort on.
+`get_query` validates the entries and turns them into a `history_search.HistoryQuery`,
+which the session store answers from its indexes.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import datetime
+import tkinter as tk
+from tkinter import ttk
+
+from core.history_search import HistoryQuery
+
+ALL_OPTION = "全部"
+NO_FEEDBACK_OPTION = "未反馈"
+SORT_OPTIONS = {
+    "日期": "datetime",
+    "等级": "level",
+    "年龄": "age",
+    "时长": "duration_seconds",
+    "运动距离": "exercise_distance",
+    "圈程距离": "lap_distance",
+    "反馈": "feedback",
+}
+
+
+class HistoryFilterBar(tk.Frame):
+    def __init__(self, master, levels, feedback_options, on_search):
+        super().__init__(master)
+        self.on_search = on_search
+
+        tk.Label(self, text="等级:").grid(row=0, column=0, sticky="w")
+        self.level_var = tk.StringVar(self, value=ALL_OPTION)
+        ttk.Combobox(self, textvariable=self.level_var, values=[ALL_OPTION] + list(levels), width=8, state="readonly").grid(row=0, column=1, padx=2)
+
+        tk.Label(self, text="年龄:").grid(row=0, column=2, sticky="w")
+        self.min_age_entry = self._add_entry(0, 3, 5)
+        tk.Label(self, text="-").grid(row=0, column=4)
+        self.max_age_entry = self._add_entry(0, 5, 5)
+
+        tk.Label(self, text="反馈:").grid(row=0, column=6, sticky="w")
+        self.feedback_var = tk.StringVar(self, value=ALL_OPTION)
+        ttk.Combobox(self, textvariable=self.feedback_var, values=[ALL_OPTION, NO_FEEDBACK_OPTION] + list(feedback_options),
+                     width=8, state="readonly").grid(row=0, column=7, padx=2)
+
+        tk.Label(self, text="日期:").grid(row=1, column=0, sticky="w")
+        self.start_date_entry = self._add_entry(1, 1, 10)
+        tk.Label(self, text="-").grid(row=1, column=2)
+        self.end_date_entry = self._add_entry(1, 3, 10, columnspan=3)
+
+        tk.Label(self, text="时长(分钟):").grid(row=1, column=6, sticky="w")
+        duration_frame = tk.Frame(self)
+        duration_frame.grid(row=1, column=7, sticky="w")
+        self.min_duration_entry = tk.Entry(duration_frame, width=5)
+        self.min_duration_entry.pack(side=tk.LEFT)
+        tk.Label(duration_frame, text="-").pack(side=tk.LEFT)
+        self.max_duration_entry = tk.Entry(duration_frame, width=5)
+        self.max_duration_entry.pack(side=tk.LEFT)
+
+        tk.Label(self, text="排序:").grid(row=2, column=0, sticky="w")
+        self.sort_var = tk.StringVar(self, value="日期")
+        ttk.Combobox(self, textvariable=self.sort_var, values=list(SORT_OPTIONS), width=8, state="readonly").grid(row=2, column=1, padx=2)
+        self.descending_var = tk.BooleanVar(self, value=True)
+        tk.Checkbutton(self, text="降序", variable=self.descending_var).grid(row=2, column=2, columnspan=2, sticky="w")
+        tk.Button(self, text="搜索", command=self.on_search).grid(row=2, column=6, padx=2, pady=2)
+        tk.Button(self, text="重置", command=self.reset).grid(row=2, column=7, sticky="w", padx=2, pady=2)
+
+    def _add_entry(self, row, column, width, columnspan=1):
+        entry = tk.Entry(self, width=width)
+        entry.grid(row=row, column=column, columnspan=columnspan, sticky="w", padx=2, pady=2)
+        return entry
+
+    def reset(self):
+        self.level_var.set(ALL_OPTION)
+        self.feedback_var.set(ALL_OPTION)
+        self.sort_var.set("日期")
+        self.descending_var.set(True)
+        for entry in (self.min_age_entry, self.max_age_entry, self.start_date_entry, self.end_date_entry,
+                      self.min_duration_entry, self.max_duration_entry):
+            entry.delete(0, tk.END)
+        self.on_search()
+
+    def get_query(self):
+        """根据输入构造 HistoryQuery；输入无效时抛出 ValueError"""
+        level = self.level_var.get()
+        feedback = self.feedback_var.get()
+        if feedback == NO_FEEDBACK_OPTION:
+            feedback = ""
+        min_duration = _parse_number(self.min_duration_entry.get(), "最短时长")
+        max_duration = _parse_number(self.max_duration_entry.get(), "最长时长")
+        return HistoryQuery(
+            level=None if level == ALL_OPTION else level,
+            feedback=None if feedback == ALL_OPTION else feedback,
+            min_age=_parse_number(self.min_age_entry.get(), "最小年龄"),
+            max_age=_parse_number(self.max_age_entry.get(), "最大年龄"),
+            start_date=_parse_date(self.start_date_entry.get(), "开始日期"),
+            end_date=_parse_date(self.end_date_entry.get(), "结束日期"),
+            min_duration_seconds=min_duration * 60 if min_duration is not None else None,
+            max_duration_seconds=max_duration * 60 if max_duration is not None else None,
+            sort_by=SORT_OPTIONS.get(self.sort_var.get(), "datetime"),
+            descending=self.descending_var.get(),
+        )
+
+
+def _parse_number(text, name):
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"{name}必须是数字。")
+
+
+def _parse_date(text, name):
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        return datetime.datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"{name}的格式应为 YYYY-MM-DD。")
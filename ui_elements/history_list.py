@@ -0,0 +1,128 @@
+"""
+history_list.py
+History Record List Module
+==========================
+This module implements the list of history records shown in the history window.
+The HistoryList class keeps the previews currently displayed in a Tkinter listbox,
+newest first, together with the session store version they correspond to. On refresh it
+asks the store for the changes since that version (`preview_changes`) and updates only
+the affected listbox rows: removed sessions are deleted, new or modified sessions are
+inserted at their sorted position (found by binary search) or replaced in place.
+When the store cannot provide a diff (e.g. for search results, which keep the order the
+store returned them in), the list is rebuilt from the full preview list.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import bisect
+import datetime
+import tkinter as tk
+
+from core.exercise_data_manager import get_datetime_from_filename
+
+EMPTY_HISTORY_TEXT = "没有历史跑步记录"
+
+
+def format_history_preview(preview):
+    return f"{preview['datetime']} - Level: {preview['level']}, 距离: {preview['lap_distance']}m, 年龄: {preview['age']}"
+
+
+def _sort_key(preview):
+    # 新记录在前：按距离最大日期的时间差升序排列
+    return datetime.datetime.max - get_datetime_from_filename(preview), preview["filename"]
+
+
+class HistoryList:
+    def __init__(self, listbox, load_changes):
+        """load_changes(version) 返回 (版本, 新增或修改的预览, 删除的文件名或 None)"""
+        self.listbox = listbox
+        self.load_changes = load_changes
+        self.previews = []
+        self.sort_keys = []
+        self.version = None
+
+    def refresh(self, full=False):
+        version, changed, removed = self.load_changes(None if full else self.version)
+        if removed is None:
+            self._rebuild(changed, incremental=version is not None)
+        else:
+            for filename in removed:
+                self.remove(filename)
+            for preview in changed:
+                self._upsert(preview)
+            self._update_placeholder()
+        self.version = version
+
+    def get_preview(self, index):
+        if 0 <= index < len(self.previews):
+            return self.previews[index]
+        return None
+
+    def remove(self, filename):
+        index = self._find(filename)
+        if index is None:
+            return False
+        del self.previews[index]
+        if self.sort_keys is not None:
+            del self.sort_keys[index]
+        if self.listbox.winfo_exists():  # 详情窗口删除记录时，历史窗口可能已关闭
+            self.listbox.delete(index)
+            self._update_placeholder()
+        return True
+
+    def _find(self, filename):
+        if self.sort_keys is None:
+            for index, preview in enumerate(self.previews):
+                if preview["filename"] == filename:
+                    return index
+            return None
+        index = bisect.bisect_left(self.sort_keys, _sort_key({"filename": filename}))
+        if index < len(self.previews) and self.previews[index]["filename"] == filename:
+            return index
+        return None
+
+    def _upsert(self, preview):
+        index = self._find(preview["filename"])
+        if index is not None:
+            self.previews[index] = preview
+            self.listbox.delete(index)
+        elif self.sort_keys is None:
+            # 整体重建的列表没有排序键，新记录追加到末尾
+            index = len(self.previews)
+            self.previews.append(preview)
+        else:
+            key = _sort_key(preview)
+            index = bisect.bisect_left(self.sort_keys, key)
+            self.previews.insert(index, preview)
+            self.sort_keys.insert(index, key)
+        self._insert_row(index, preview)
+
+    def _rebuild(self, previews, incremental=True):
+        if incremental:
+            self.previews = sorted(previews, key=_sort_key)
+            self.sort_keys = [_sort_key(preview) for preview in self.previews]
+        else:
+            # 搜索结果按存储后端给出的顺序显示，之后的刷新也整体替换
+            self.previews = list(previews)
+            self.sort_keys = None
+        self.listbox.delete(0, tk.END)
+        for preview in self.previews:
+            self._insert_row(tk.END, preview)
+        self._update_placeholder()
+
+    def _insert_row(self, index, preview):
+        self.listbox.insert(index, format_history_preview(preview))
+        self.listbox.itemconfig(index, foreground="blue")
+
+    def _update_placeholder(self):
+        # 列表为空时显示灰色提示行；提示行位于所有记录之后，不对应任何预览
+        has_placeholder = self.listbox.size() > len(self.previews)
+        if not self.previews and not has_placeholder:
+            self.listbox.insert(tk.END, EMPTY_HISTORY_TEXT)
+            self.listbox.itemconfig(tk.END, foreground="grey")
+        elif self.previews and has_placeholder:
+            self.listbox.delete(len(self.previews), tk.END)
@@ -0,0 +1,120 @@
+"""
+live_heart_rate_chart.py
+Live Heart Rate Chart Module
+============================
+This module provides a real-time heart-rate chart for the main window. It listens to the
+`HeartRateCollector` and shows the most recent heart-rate samples while an exercise is
+running.
+To keep CPU usage flat over long sessions on weak hardware:
+- Samples are kept in a fixed-size buffer covering the visible time window, so the cost
+  of a redraw does not grow with session length.
+- The axes are fixed (time relative to the newest sample, fixed bpm range), so the static
+  parts of the figure are rendered once and cached; each update only restores the cached
+  background and blits the heart-rate line.
+- Redraws run on the Tk thread at a bounded rate and are skipped when no new sample
+  arrived. The collector thread only appends to the buffer.
+Author: Gaopeng Huang; Hui Guo
+Email: perished_hgp@163.com; gh1848026781@163.com
+Date Created: 2026-10-19
+Last Modified: 2026-10-19
+Copyright (c) 2025 PeakVision
+All rights reserved.
+This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
+"""
+import threading
+import time
+import tkinter as tk
+from collections import deque
+
+import matplotlib
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from core import metrics
+from core.heart_rate_collector import HeartRateListener
+
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_REDRAW_INTERVAL_MS = 1000
+HEART_RATE_AXIS_RANGE = (40, 220)
+
+
+class LiveHeartRateChart(HeartRateListener):
+    def __init__(self, master, window_seconds=DEFAULT_WINDOW_SECONDS, redraw_interval_ms=DEFAULT_REDRAW_INTERVAL_MS):
+        self.window_seconds = window_seconds
+        self.redraw_interval_ms = redraw_interval_ms
+        self.lock = threading.Lock()
+        self.timestamps = deque(maxlen=window_seconds)
+        self.heart_rates = deque(maxlen=window_seconds)
+        self.has_new_samples = False
+        self.background = None
+        self.redraw_id = None
+
+        matplotlib.rcParams['font.sans-serif'] = ['SimHei']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+
+        self.frame = tk.Frame(master)
+        self.figure = Figure(figsize=(5, 3), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlim(-window_seconds, 0)
+        self.ax.set_ylim(*HEART_RATE_AXIS_RANGE)
+        self.ax.set_xlabel("时间 (秒)")
+        self.ax.set_ylabel("心率 (bpm)")
+        self.ax.grid(True)
+        self.threshold_line = self.ax.axhline(y=0, color='r', linestyle='--', visible=False)
+        self.line, = self.ax.plot([], [], color='tab:blue', animated=True)
+        self.figure.tight_layout()
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.canvas.draw()
+
+        self.redraw_id = self.frame.after(self.redraw_interval_ms, self._redraw)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def on_heart_rate_received(self, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate):
+        with self.lock:
+            self.timestamps.append(time.monotonic())
+            self.heart_rates.append(heart_rate)
+            self.has_new_samples = True
+
+    def reset(self):
+        with self.lock:
+            self.timestamps.clear()
+            self.heart_rates.clear()
+            self.has_new_samples = True
+
+    def set_threshold(self, heart_rate_threshold):
+        if heart_rate_threshold:
+            self.threshold_line.set_ydata([heart_rate_threshold, heart_rate_threshold])
+            self.threshold_line.set_visible(True)
+        else:
+            self.threshold_line.set_visible(False)
+        # 阈值线属于静态背景，需要完整重绘一次
+        self.canvas.draw_idle()
+
+    def stop(self):
+        if self.redraw_id is not None:
+            self.frame.after_cancel(self.redraw_id)
+            self.redraw_id = None
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+
+    def _redraw(self):
+        self.redraw_id = self.frame.after(self.redraw_interval_ms, self._redraw)
+        if self.background is None or not self.has_new_samples:
+            return
+        with metrics.timer("live_chart_redraw_seconds"):
+            with self.lock:
+                timestamps = list(self.timestamps)
+                heart_rates = list(self.heart_rates)
+                self.has_new_samples = False
+            latest = timestamps[-1] if timestamps else 0
+            self.line.set_data([timestamp - latest for timestamp in timestamps], heart_rates)
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+            self.canvas.blit(self.ax.bbox)
@@ -9,9 +9,12 @@ a comprehensive exercise application.
 
 The application allows users to:
 - Select exercise levels and set lap distances.
+- Select or save a member profile, which fills in age, level and lap distance and limits the
+  history window to that member's sessions.
 - Start, stop, and monitor treadmill exercises.
-- Track real-time heart rate, speed, distance, and exercise time.
-- View exercise history records and detailed session analysis, including heart rate graphs and AI-powered feedback.
+- Track real-time heart rate, speed, distance, and exercise time, with a live heart-rate chart.
+- View, search, filter and batch-delete exercise history records and detailed session analysis, including heart rate graphs, heart-rate zone
+  and drift analytics, and AI-powered feedback.
 - Configure application settings such as default lap distance and API keys.
 - Simulate heart rate data through a separate UI.
 
@@ -19,14 +22,15 @@ Key features include:
 - User-friendly graphical interface built with Tkinter.
 - Real-time exercise monitoring and display.
 - Integration with a heart rate collector and treadmill simulator.
-- Exercise data logging and historical record management.
+- Exercise data logging and historical record management, with a background retention policy
+  (maximum age, count and disk usage) that pauses while an exercise is running.
 - AI-driven exercise analysis and feedback (via OpenAI API).
 - Customizable settings and user preferences.
 
 Author: Gaopeng Huang; Hui Guo
 Email: perished_hgp@163.com; gh1848026781@163.com
 Date Created: 2025-03-06
-Last Modified: 2025-03-24
+Last Modified: 2026-10-19
 Copyright (c) 2025 PeakVision
 All rights reserved.
 This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for more information.
@@ -34,24 +38,35 @@ This software is released under the GNU GENERAL PUBLIC LICENSE, see LICENSE for
 
 import tkinter as tk
 import time
-import json
-import os
 import threading
 import matplotlib.pyplot as plt
 from tkinter import ttk, messagebox
 from core.heart_rate_collector import HeartRateCollector, HeartRateListener
 from ui_elements.heart_rate_ui import HeartRateUI
+from ui_elements.live_heart_rate_chart import LiveHeartRateChart
+from ui_elements.history_list import HistoryList
+from ui_elements.history_filter_bar import HistoryFilterBar
 from simulator.treadmill_simulator import TreadmillSimulator
 from core.treadmill_controller import TreadmillController
-from core.exercise_data_manager import get_history_record_previews, load_exercise_data, update_exercise_data_feedback
+from core import metrics
+from core.profiler import SamplingProfiler, profiling_requested_by_environment
+from core.session_store import create_session_store
+from core.heart_rate_analytics import ZONE_NAMES, get_session_analytics
+from core.lap_records import summarize_laps
+from core.session_retention import DEFAULT_RETENTION_INTERVAL_MINUTES, RetentionPolicy, RetentionWorker
+from core.session_journal import DEFAULT_FSYNC_INTERVAL, list_session_journals, recover_session_journals
+from core.speed_config import get_program_registry
+from core.speed_control import DEFAULT_CONTROL_POLICY, create_control_policy
+from core.sensor_gateway import DEFAULT_GATEWAY_PORT, SensorGateway
+from core.telemetry_server import DEFAULT_TELEMETRY_PORT, DEFAULT_UPDATE_INTERVAL, TelemetryServer
+from core.user_profiles import UserProfileStore
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from openai import OpenAI
 
 from ui_elements.settings_window import SettingsWindow
+from core.settings_service import DEFAULT_SETTINGS_FILE, SettingsService
 
 
-DEFAULT_SETTINGS_FILE = "data/app_settings.json" 
-
 class TreadmillApp(tk.Tk, HeartRateListener):
 
     def __init__(self, collector):
@@ -69,18 +84,18 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         self.protocol("WM_DELETE_WINDOW", self.stop_app)
         self.treadmill_simulator = TreadmillSimulator()
 
-        self.level_targets = {"2": 4000,
-                              "3": 4200,
-                              "4": 4600,
-                              "5": 5000,
-                              "6": 5200,
-                              "7": 5200,
-                              "8": 5400,
-                              "9": 5400,
-                              "10": 5400
-        }
+        self.program_registry = get_program_registry()
 
-        self.app_settings = self.load_settings()
+        self.settings = self.load_settings()
+        self.session_store = create_session_store(self.settings.get_str("storage_backend"),
+                                                  self.settings.get_str("sqlite_path"))
+        self.user_profiles = UserProfileStore()
+        self.metrics_exporter = self.start_metrics_export()
+        self.sensor_gateway = self.start_sensor_gateway()
+        self.profiler = SamplingProfiler()
+        self.set_profiling_enabled(self.settings.get_bool("profiling_enabled") or profiling_requested_by_environment())
+        self.start_session_recovery()
+        self.start_session_archiving()
 
         self.openai_client = self.initialize_openai_client()
 
@@ -99,9 +114,19 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                                      command=self.open_settings_window)
         settings_button.grid(row=0, column=0, sticky="nw", padx=5, pady=5) 
 
+        user_frame = tk.Frame(self)
+        user_frame.grid(row=0, column=1, columnspan=2, sticky="w", padx=10, pady=5)
+        tk.Label(user_frame, text="用户:").pack(side=tk.LEFT)
+        self.user_var = tk.StringVar(self)
+        self.user_combobox = ttk.Combobox(user_frame, textvariable=self.user_var, width=16)
+        self.user_combobox.pack(side=tk.LEFT, padx=5)
+        self.user_combobox.bind("<<ComboboxSelected>>", self.on_user_selected)
+        tk.Button(user_frame, text="保存用户", command=self.save_user_profile).pack(side=tk.LEFT, padx=5)
+        self.refresh_user_list()
+
         tk.Label(self, text="选择等级:").grid(row=1, column=0, sticky="w", padx=10, pady=5)
         self.level_var = tk.StringVar(self)
-        self.level_combobox = ttk.Combobox(self, textvariable=self.level_var, values=list(self.level_targets.keys()))
+        self.level_combobox = ttk.Combobox(self, textvariable=self.level_var, values=self.program_registry.get_levels())
         self.level_combobox.grid(row=1, column=1, padx=10, pady=5)
         self.level_combobox.bind("<<ComboboxSelected>>", self.update_target)
 
@@ -113,8 +138,8 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         tk.Label(self, text="圈程距离(米):").grid(row=3, column=0, sticky="w", padx=10, pady=5)
         self.distance_entry = tk.Entry(self)
         self.distance_entry.grid(row=3, column=1, padx=10, pady=5)
-        default_lap_distance = self.app_settings.get("default_lap_distance", 200)
-        self.distance_entry.insert(0, str(default_lap_distance)) 
+        self.distance_entry.insert(0, str(self.settings.get_int("default_lap_distance"))) 
+        self.distance_entry.bind("<KeyRelease>", self.update_target)
 
         tk.Label(self, text="目标:").grid(row=4, column=0, sticky="w", padx=10, pady=5)
         self.target_label = tk.Label(self, text="无")
@@ -161,6 +186,10 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         self.post_exercise_average_rate_label = tk.Label(self, text="等待运动停止...")
         self.post_exercise_average_rate_label.grid(row=14, column=1, padx=10, pady=5)
 
+        self.live_chart = LiveHeartRateChart(self)
+        self.live_chart.grid(row=1, column=2, rowspan=14, sticky="nsew", padx=10, pady=5)
+        self.collector.add_listener(self.live_chart)
+
         open_ui_button = tk.Button(self, text="开启心率测量", command=self.open_heart_rate_ui)
         open_ui_button.grid(row=15, column=0, columnspan=1, pady=10)
 
@@ -178,9 +207,17 @@ class TreadmillApp(tk.Tk, HeartRateListener):
             self.on_exercise_completion,
             collector,
             self.age_entry,
-            self.post_exercise_average_rate_label
+            self.post_exercise_average_rate_label,
+            session_store=self.session_store,
+            journal_fsync_interval=self.settings.get_float("journal_fsync_interval"),
+            control_policy=create_control_policy(self.settings.get_str("control_policy")),
+            user_profiles=self.user_profiles
         )
 
+        self.telemetry_server = self.start_telemetry_server()
+        self.retention_worker = self.start_session_retention()
+        self.subscribe_to_settings()
+
         self.start_time = None
         self.elapsed_time = 0
         self.timer_running = False
@@ -197,37 +234,131 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         self.openai_client = None
 
     def load_settings(self):
-        """从 JSON 文件加载设置，文件路径从设置中读取，或使用默认路径"""
+        """加载设置服务，文件路径从设置中读取，或使用默认路径"""
         default_settings = {
             "settings_file_path": DEFAULT_SETTINGS_FILE, 
             "default_lap_distance": 200,
             "api_key": "",
             "base_url": "",
-            "model": "Qwen/Qwen2.5-7B-Instruct"
+            "model": "Qwen/Qwen2.5-7B-Instruct",
+            "storage_backend": "csv",
+            "sqlite_path": "data/sessions.db",
+            "archive_after_days": 0,
+            "journal_fsync_interval": DEFAULT_FSYNC_INTERVAL,
+            "metrics_enabled": False,
+            "metrics_export_interval": metrics.DEFAULT_EXPORT_INTERVAL,
+            "profiling_enabled": False,
+            "control_policy": DEFAULT_CONTROL_POLICY,
+            "sensor_gateway_enabled": False,
+            "sensor_gateway_port": DEFAULT_GATEWAY_PORT,
+            "telemetry_enabled": False,
+            "telemetry_port": DEFAULT_TELEMETRY_PORT,
+            "telemetry_update_interval": DEFAULT_UPDATE_INTERVAL,
+            "retention_max_age_days": 0,
+            "retention_max_sessions": 0,
+            "retention_max_disk_mb": 0,
+            "retention_interval_minutes": DEFAULT_RETENTION_INTERVAL_MINUTES
         }
-        settings_file_path = DEFAULT_SETTINGS_FILE 
-        if os.path.exists(DEFAULT_SETTINGS_FILE): 
-            try:
-                with open(DEFAULT_SETTINGS_FILE, 'r') as f: 
-                    initial_settings = json.load(f)
-                    settings_file_path = initial_settings.get("settings_file_path", DEFAULT_SETTINGS_FILE) 
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass 
-        if os.path.exists(settings_file_path): 
-            try:
-                with open(settings_file_path, 'r') as f: 
-                    loaded_settings = json.load(f)
-                    return {**default_settings, **loaded_settings}
-            except (FileNotFoundError, json.JSONDecodeError):
-                messagebox.showerror("加载设置失败", f"无法加载设置文件: {settings_file_path}，将使用默认设置。") 
-                return default_settings
-        else:
-            return default_settings
+        settings = SettingsService(default_settings)
+        if not settings.load():
+            messagebox.showerror("加载设置失败", f"无法加载设置文件: {settings.path}，将使用默认设置。") 
+        return settings
+
+    def subscribe_to_settings(self):
+        self.settings.subscribe(self.on_lap_distance_setting_changed, ["default_lap_distance"])
+        self.settings.subscribe(self.on_api_setting_changed, ["api_key", "base_url"])
+        self.settings.subscribe(self.on_profiling_setting_changed, ["profiling_enabled"])
+        self.settings.subscribe(self.on_retention_setting_changed, ["retention_max_age_days", "retention_max_sessions",
+                                                                    "retention_max_disk_mb", "retention_interval_minutes"])
+
+    def on_lap_distance_setting_changed(self, changes):
+        self.distance_entry.delete(0, tk.END)
+        self.distance_entry.insert(0, str(self.settings.get_int("default_lap_distance")))
+        self.update_target(None)
+
+    def on_api_setting_changed(self, changes):
+        self.openai_client = self.initialize_openai_client()
+
+    def on_profiling_setting_changed(self, changes):
+        self.set_profiling_enabled(self.settings.get_bool("profiling_enabled"))
  
 
+    def on_retention_setting_changed(self, changes):
+        if self.retention_worker:
+            self.retention_worker.stop()
+        self.retention_worker = self.start_session_retention()
+
+    def start_metrics_export(self):
+        if self.settings.get_bool("metrics_enabled"):
+            metrics.enable()
+        if not metrics.enabled:
+            return None
+        exporter = metrics.MetricsExporter(json_path="data/metrics.json",
+                                           prometheus_path="data/metrics.prom",
+                                           interval=self.settings.get_float("metrics_export_interval"))
+        exporter.start()
+        return exporter
+
+    def start_sensor_gateway(self):
+        if not self.settings.get_bool("sensor_gateway_enabled"):
+            return None
+        # 本机只有一条跑道，外部设备桥接程序向通道 0 推送心率
+        gateway = SensorGateway({0: self.collector}, port=self.settings.get_int("sensor_gateway_port"))
+        try:
+            gateway.start()
+        except OSError as e:
+            print(f"启动传感器网关失败: {e}")
+            return None
+        return gateway
+
+    def start_telemetry_server(self):
+        if not self.settings.get_bool("telemetry_enabled"):
+            return None
+        server = TelemetryServer(self.collector, self.treadmill_controller,
+                                 port=self.settings.get_int("telemetry_port"),
+                                 update_interval=self.settings.get_float("telemetry_update_interval"))
+        try:
+            server.start()
+        except OSError as e:
+            print(f"启动遥测服务失败: {e}")
+            return None
+        return server
+
+    def set_profiling_enabled(self, enabled):
+        if enabled:
+            self.profiler.start()
+        else:
+            self.profiler.stop()
+
+    def start_session_recovery(self):
+        # 启动时先记下遗留日志，再在后台重建，避免与新会话的日志混淆
+        journal_paths = list_session_journals()
+        if journal_paths:
+            threading.Thread(target=recover_session_journals, args=(self.session_store, journal_paths, self.user_profiles), name="SessionRecovery", daemon=True).start()
+
+    def start_session_archiving(self):
+        # 归档默认关闭，只有在设置中明确指定 archive_after_days 时才打包旧记录
+        archive_after_days = self.settings.get_int("archive_after_days")
+        if not archive_after_days or archive_after_days <= 0:
+            return
+        # 在后台归档旧记录，避免阻塞界面启动
+        threading.Thread(target=self.session_store.archive_old_sessions, args=(archive_after_days,), name="SessionArchiver", daemon=True).start()
+
+    def start_session_retention(self):
+        policy = RetentionPolicy(self.settings.get_int("retention_max_age_days"),
+                                 self.settings.get_int("retention_max_sessions"),
+                                 self.settings.get_float("retention_max_disk_mb"))
+        if not policy.is_enabled():
+            return None
+        # 运动进行中时清理线程等待，不与心率采集争用磁盘
+        retention_worker = RetentionWorker(self.session_store, policy, lambda: self.treadmill_controller.is_running,
+                                           self.settings.get_float("retention_interval_minutes"), self.user_profiles)
+        retention_worker.start()
+        return retention_worker
+
     def initialize_openai_client(self):
-        api_key = self.app_settings.get("api_key")
-        base_url = self.app_settings.get("base_url")
+        api_key = self.settings.get_str("api_key")
+        base_url = self.settings.get_str("base_url")
 
         self.api_key = api_key
         self.base_url = base_url
@@ -250,13 +381,23 @@ class TreadmillApp(tk.Tk, HeartRateListener):
 
     def update_target(self, event):
         level = self.level_var.get()
-        if level in self.level_targets:
-            self.target_label.config(text=str(self.level_targets[level]))
-        else:
+        if not self.program_registry.has_program(level):
             self.target_label.config(text="无")
+            return
+        program = self.program_registry.get_program(level)
+        target_text = str(program.target) if program.target else "无"
+        try:
+            lap_distance = float(self.distance_entry.get())
+        except ValueError:
+            lap_distance = 0
+        if lap_distance > 0:
+            # 按程序速度跑完全部圈程的距离与用时，由速度程序预先计算的累计用时表得到
+            minutes, seconds = divmod(int(program.expected_duration_seconds(lap_distance)), 60)
+            target_text += f" (共 {len(program)} 圈 {program.expected_distance(lap_distance):.0f} 米，预计 {minutes:02d}:{seconds:02d})"
+        self.target_label.config(text=target_text)
 
     def on_heart_rate_received(self, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate):
-        self.after(0, self._update_heart_rate_label, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate)
+        metrics.tk_after(self, self._update_heart_rate_label, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate)
 
 
     def _update_heart_rate_label(self, heart_rate, average_heart_rate, lap_average_heart_rate, last_lap_average_rate):
@@ -268,13 +409,74 @@ class TreadmillApp(tk.Tk, HeartRateListener):
             self.last_lap_average_rate_label.config(text=f"{last_lap_average_rate:.1f} bpm")
 
 
+    def refresh_user_list(self):
+        self.user_combobox["values"] = [profile["name"] for profile in self.user_profiles.list_profiles()]
+
+    def get_selected_user_id(self):
+        profile = self.user_profiles.find_by_name(self.user_var.get().strip())
+        return profile["user_id"] if profile else None
+
+    def on_user_selected(self, event=None):
+        profile = self.user_profiles.find_by_name(self.user_var.get().strip())
+        if profile is None:
+            return
+        self.age_entry.delete(0, tk.END)
+        self.age_entry.insert(0, str(profile["age"]))
+        if profile.get("preferred_level") and self.program_registry.has_program(profile["preferred_level"]):
+            self.level_var.set(profile["preferred_level"])
+        if profile.get("lap_distance"):
+            self.distance_entry.delete(0, tk.END)
+            self.distance_entry.insert(0, f"{profile['lap_distance']:g}")
+        self.update_target(None)
+
+    def save_user_profile(self):
+        name = self.user_var.get().strip()
+        existing = self.user_profiles.find_by_name(name)
+        try:
+            profile = self.user_profiles.save_profile(
+                name,
+                self.age_entry.get(),
+                max_heart_rate=existing.get("max_heart_rate") if existing else None,
+                preferred_level=self.level_var.get() or None,
+                lap_distance=self.distance_entry.get() or None,
+            )
+        except ValueError as e:
+            messagebox.showerror("错误", f"保存用户失败: {e}")
+            return
+        self.refresh_user_list()
+        messagebox.showinfo("成功", f"用户 {profile['name']} 已保存。")
+
+    def get_history_preview_changes(self, version, filter_bar=None):
+        """有筛选条件时返回搜索结果；选中用户时只读取该用户的记录；否则取得自 version 以来的变化"""
+        query = filter_bar.get_query() if filter_bar is not None else None
+        user_id = self.get_selected_user_id()
+        if user_id is not None:
+            filenames = self.user_profiles.get_session_filenames(user_id)
+            if query is None or query.is_default():
+                return None, self.session_store.preview_sessions(filenames), None
+            query.filenames = set(filenames)
+        if query is None or query.is_default():
+            return self.session_store.preview_changes(version)
+        return None, self.session_store.search(query), None
+
     def open_heart_rate_ui(self):
         heart_rate_ui_window = tk.Toplevel(self)
-        HeartRateUI(heart_rate_ui_window, self.collector)
+        HeartRateUI(heart_rate_ui_window, self.collector, self.treadmill_simulator, self.get_entered_age, self.session_store)
+
+    def get_entered_age(self):
+        try:
+            age = int(self.age_entry.get())
+        except ValueError:
+            return None
+        return age if age > 0 else None
 
     def start_treadmill(self):
+        # 以开始时用户框中的姓名为准，清空用户框即为匿名运动
+        self.treadmill_controller.current_user_id = self.get_selected_user_id()
         start_success = self.treadmill_controller.start_exercise()
         if start_success:
+            self.live_chart.reset()
+            self.live_chart.set_threshold(self.treadmill_controller.heart_rate_threshold)
             self.start_button.config(state=tk.DISABLED)
             self.stop_button.config(state=tk.NORMAL)
             self.distance_label.config(text="0 米")
@@ -318,6 +520,20 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         if hasattr(self, 'heart_rate_simulator'):
             self.heart_rate_simulator.stop()
         self.stop_treadmill()
+        self.treadmill_controller.finish_recovery_measurement()
+        if self.retention_worker:
+            self.retention_worker.stop()
+        self.session_store.close()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        if self.sensor_gateway:
+            self.sensor_gateway.stop()
+        if self.telemetry_server:
+            self.telemetry_server.stop()
+        self.profiler.stop()
+        self.settings.flush()
+        self.live_chart.stop()
+        self.collector.remove_listener(self.live_chart)
         self.destroy()
 
     def on_exercise_completion(self):
@@ -333,35 +549,29 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         except tk.TclError as e:
             print(f"加载历史记录窗口图标失败: {e}")
 
-        refresh_button = tk.Button(history_window, text="刷新", command=lambda: self.refresh_history_record_list(listbox))
-        refresh_button.grid(row=0, column=1, sticky='ne', padx=10, pady=10)
-
         list_frame = tk.Frame(history_window) 
         list_frame.grid(row=1, column=0, sticky='nsew', padx=10, pady=10, columnspan=2) 
 
-        history_previews = get_history_record_previews()
-
-        if not history_previews:
-            tk.Label(list_frame, text="没有历史跑步记录").pack(padx=20, pady=20) 
-            return
-
-        listbox = tk.Listbox(list_frame, width=80, selectmode=tk.SINGLE) 
+        listbox = tk.Listbox(list_frame, width=80, selectmode=tk.EXTENDED) 
         listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True) 
 
         scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=listbox.yview) 
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y) 
         listbox.config(yscrollcommand=scrollbar.set) 
 
+        filter_bar = HistoryFilterBar(history_window, self.program_registry.get_levels(), self.feedback_static_text,
+                                      lambda: self.refresh_history_record_list(history_list, full=True))
+        filter_bar.grid(row=0, column=0, sticky='nw', padx=10, pady=5)
 
-        for index, preview in enumerate(history_previews):
-            display_text = f"{preview['datetime']} - Level: {preview['level']}, 距离: {preview['lap_distance']}m, 年龄: {preview['age']}"
-            listbox.insert(tk.END, display_text)
-            listbox.itemconfig(tk.END, fg="blue")
-            listbox.itemconfig(tk.END, foreground="blue")
+        history_list = HistoryList(listbox, lambda version: self.get_history_preview_changes(version, filter_bar))
+        history_list.refresh()
 
-        listbox.bind("<Double-Button-1>", lambda event: self.show_history_detail(history_previews, listbox.curselection()))
+        refresh_button = tk.Button(history_window, text="刷新", command=lambda: self.refresh_history_record_list(history_list))
+        refresh_button.grid(row=0, column=1, sticky='ne', padx=10, pady=10)
 
-        delete_button = tk.Button(history_window, text="删除记录", command=lambda: self.delete_history_record(history_previews, listbox))
+        listbox.bind("<Double-Button-1>", lambda event: self.show_history_detail(history_list, listbox.curselection()))
+
+        delete_button = tk.Button(history_window, text="删除记录", command=lambda: self.delete_history_record(history_list))
         delete_button.grid(row=2, column=0, columnspan=2, pady=10) 
 
         history_window.grid_columnconfigure(0, weight=1) 
@@ -370,55 +580,48 @@ class TreadmillApp(tk.Tk, HeartRateListener):
         list_frame.grid_rowconfigure(0, weight=1)       
 
 
-    def delete_history_record(self, history_previews, listbox): #  定义 delete_history_record 方法
-        selection_indices = listbox.curselection()
+    def delete_history_record(self, history_list): #  定义 delete_history_record 方法
+        selection_indices = history_list.listbox.curselection()
         if not selection_indices:
             messagebox.showinfo("提示", "请选择要删除的记录。")
             return
-        selected_index = int(selection_indices[0])
-        if 0 <= selected_index < len(history_previews):
-            selected_record_preview = history_previews[selected_index]
-            filename = selected_record_preview['filename']
-            filepath = os.path.join("data", filename)
-            confirm_delete = messagebox.askyesno("确认删除", f"确定要删除记录: {filename} 吗?")
-            if confirm_delete:
-                try:
-                    os.remove(filepath)
-                    history_previews.pop(selected_index) #  从列表中移除
-                    self.refresh_history_record_list(listbox) # 刷新 listbox
-                    messagebox.showinfo("成功", f"记录 {filename} 删除成功。")
-                except FileNotFoundError:
-                    messagebox.showerror("错误", f"文件 {filename} 未找到，删除失败。")
-                except Exception as e:
-                    messagebox.showerror("错误", f"删除文件 {filename} 失败: {e}")
-
-
-    def refresh_history_record_list(self, listbox):
-        history_previews = get_history_record_previews()
-
-        listbox.delete(0, tk.END) 
-
-        if not history_previews:
-            listbox.insert(tk.END, "没有历史跑步记录") 
-            listbox.itemconfig(tk.END, fg="grey") 
+        selected_previews = [history_list.get_preview(int(index)) for index in selection_indices]
+        filenames = [preview['filename'] for preview in selected_previews if preview is not None]
+        if not filenames:
             return
+        if len(filenames) == 1:
+            confirm_text = f"确定要删除记录: {filenames[0]} 吗?"
+        else:
+            confirm_text = f"确定要删除选中的 {len(filenames)} 条记录吗?"
+        if not messagebox.askyesno("确认删除", confirm_text):
+            return
+        # 批量删除只确认一次，删除后逐行移除列表项，不重新扫描历史记录
+        deleted = self.session_store.delete_batch(filenames)
+        self.user_profiles.remove_sessions(deleted)
+        for filename in deleted:
+            history_list.remove(filename)
+        failed_count = len(filenames) - len(deleted)
+        if failed_count:
+            messagebox.showerror("错误", f"已删除 {len(deleted)} 条记录，{failed_count} 条记录删除失败。")
+        else:
+            messagebox.showinfo("成功", f"已删除 {len(deleted)} 条记录。")
 
-        for index, preview in enumerate(history_previews): 
-            display_text = f"{preview['datetime']} - Level: {preview['level']}, 距离: {preview['lap_distance']}m, 年龄: {preview['age']}"
-            listbox.insert(tk.END, display_text)
-            listbox.itemconfig(tk.END, fg="blue")
-            listbox.itemconfig(tk.END, foreground="blue") 
 
-    def show_history_detail(self, history_previews, selection_indices):
+    def refresh_history_record_list(self, history_list, full=False):
+        # 没有筛选条件时只取自上次显示以来的变化，按差异更新列表
+        try:
+            history_list.refresh(full=full)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+
+    def show_history_detail(self, history_list, selection_indices):
         if not selection_indices:
             return
-        selected_index = int(selection_indices[0])
-        if 0 <= selected_index < len(history_previews):
-            selected_record_preview = history_previews[selected_index]
+        selected_record_preview = history_list.get_preview(int(selection_indices[0]))
+        if selected_record_preview is not None:
             filename = selected_record_preview['filename']
-            filepath = "data/" + filename
-            exercise_data = load_exercise_data(filename)
-            if exercise_data:
+            session_samples = self.session_store.load_samples(filename)
+            if session_samples:
                 detail_window = tk.Toplevel(self)
                 detail_window.title(f"历史记录详情 - {filename}")
 
@@ -428,8 +631,8 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                     print(f"加载历史记录详情窗口图标失败: {e}")
 
                 delete_detail_button = tk.Button(detail_window, text="删除此记录",
-                                                 command=lambda current_filename=filename, current_preview=selected_record_preview, current_detail_window=detail_window, current_index=selected_index:
-                                                 self.delete_single_history_record_from_detail(current_filename, current_preview, current_detail_window, current_index, history_previews))
+                                                 command=lambda current_filename=filename, current_preview=selected_record_preview, current_detail_window=detail_window:
+                                                 self.delete_single_history_record_from_detail(current_filename, current_preview, current_detail_window, history_list, release_detail_resources))
                 delete_detail_button.grid(row=0, column=1, sticky='ne', padx=10, pady=10)
 
                 info_frame = tk.Frame(detail_window)
@@ -449,8 +652,8 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                     duration_seconds = 0
                     exercise_distance = 0
 
-                heart_rates = [int(row[1]) for row in exercise_data]
-                average_heart_rate = sum(heart_rates) / len(heart_rates) if heart_rates else 0
+                timestamps, heart_rates = session_samples.as_arrays()
+                average_heart_rate = float(heart_rates.mean()) if len(heart_rates) else 0
 
                 minutes = duration_seconds // 60
                 seconds = duration_seconds % 60
@@ -460,16 +663,45 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                 tk.Label(info_frame, text=f"运动距离: {exercise_distance:.2f} 米").pack(anchor="w")
                 tk.Label(info_frame, text=f"平均心率: {average_heart_rate:.1f} bpm").pack(anchor="w")
 
+                analytics = None
+                try:
+                    analytics = get_session_analytics(self.session_store, filename, int(selected_record_preview['age']))
+                except (ValueError, KeyError):
+                    pass
+                if analytics and analytics.get("sample_count"):
+                    zone_text = "，".join(f"{zone_name} {zone_seconds / 60:.1f}分钟" for zone_name, zone_seconds in zip(ZONE_NAMES, analytics["time_in_zone_seconds"]) if zone_seconds)
+                    tk.Label(info_frame, text=f"心率区间时间: {zone_text}").pack(anchor="w")
+                    if analytics["drift_percent"] is not None:
+                        tk.Label(info_frame, text=f"心率漂移: {analytics['drift_percent']:+.1f}% ({analytics['drift_slope_bpm_per_min']:+.2f} bpm/分钟)").pack(anchor="w")
+                    if analytics.get("hrr_60") is not None:
+                        recovery_text = f"1分钟 {analytics['hrr_60']:.1f} bpm"
+                        if analytics.get("hrr_120") is not None:
+                            recovery_text += f"，2分钟 {analytics['hrr_120']:.1f} bpm"
+                        tk.Label(info_frame, text=f"心率恢复: {recovery_text}").pack(anchor="w")
+
+                # 圈程图表直接读取运动时记录的圈程表，无需从逐秒心率重新划分圈程
+                laps = analytics.get("laps") if analytics else None
+                if not laps:
+                    laps = self.session_store.load_laps(filename) or []
+                lap_summary = summarize_laps(laps)
+                if lap_summary:
+                    lap_text = f"{lap_summary['lap_count']} 圈，平均每圈 {lap_summary['average_lap_seconds']:.0f} 秒"
+                    if lap_summary["first_reduction_lap"] is not None:
+                        reduction_text = "，".join(f"{reduction_type}{count}次" for reduction_type, count in lap_summary["reduction_counts"].items())
+                        lap_text += f"，第 {lap_summary['first_reduction_lap']} 圈起降速 ({reduction_text})"
+                    tk.Label(info_frame, text=f"圈程: {lap_text}").pack(anchor="w")
 
                 plt.rcParams['font.sans-serif'] = ['SimHei']
                 plt.rcParams['axes.unicode_minus'] = False
 
-                timestamps = [float(row[0]) for row in exercise_data]
-
-
+                chart_render_start = time.perf_counter()
                 fig, ax = plt.subplots(figsize=(8, 6))
                 ax.plot(timestamps, heart_rates)
 
+                def release_detail_resources():
+                    plt.close(fig)
+                    session_samples.close()
+
                 try:
                     age = int(selected_record_preview['age'])
                     max_heart_rate = 220 - age
@@ -479,6 +711,20 @@ class TreadmillApp(tk.Tk, HeartRateListener):
 
                 if threshold_80_percent is not None:
                     ax.axhline(y=threshold_80_percent, color='r', linestyle='--', label=f'最大心率80%阈值 ({threshold_80_percent:.0f} bpm)')
+
+                # 圈程按采样序号定位到图表的时间轴上，与存储后端返回的时间轴无关
+                def sample_time(sample_index):
+                    return timestamps[min(max(sample_index, 0), len(timestamps) - 1)]
+
+                placed_laps = [lap for lap in laps if lap.get("end_sample") is not None] if len(timestamps) else []
+                lap_averages = [lap for lap in placed_laps if lap.get("average")]
+                if lap_averages:
+                    for lap in placed_laps:
+                        ax.axvline(x=sample_time(lap["end_sample"]), color='grey', linestyle=':', linewidth=0.8)
+                    ax.hlines([lap["average"] for lap in lap_averages], [sample_time(lap["start_sample"]) for lap in lap_averages],
+                              [sample_time(lap["end_sample"]) for lap in lap_averages], colors='orange', linewidth=2, label='每圈平均心率')
+
+                if threshold_80_percent is not None or lap_averages:
                     ax.legend()
 
                 ax.set_xlabel("运动时间 (秒)")
@@ -489,6 +735,8 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                 canvas = FigureCanvasTkAgg(fig, master=detail_window)
                 canvas_widget = canvas.get_tk_widget()
                 canvas_widget.grid(row=1, column=0, columnspan=2, sticky='ewns', padx=10, pady=10)
+                canvas.draw()
+                metrics.observe("chart_render_seconds", time.perf_counter() - chart_render_start)
 
                 feedback_frame = tk.Frame(detail_window)
                 feedback_frame.grid(row=2, column=0, columnspan=2, pady=10)
@@ -501,7 +749,7 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                     self.record_feedbacks[current_filename] = feedback_value
                     current_preview['feedback'] = feedback_value
                     update_recommendation_text(feedback_value)
-                    update_exercise_data_feedback(current_filename, feedback_value)
+                    self.session_store.update_feedback(current_filename, feedback_value)
 
                 for i, label_text in enumerate(feedback_labels):
                     btn = tk.Button(feedback_frame, text=label_text, command=lambda text=label_text: record_feedback(text))
@@ -536,9 +784,7 @@ class TreadmillApp(tk.Tk, HeartRateListener):
                 self.ai_analysis_text.config(state=tk.DISABLED)
 
 
-                csv_data_string = ""
-                for row in exercise_data:
-                    csv_data_string += ",".join(map(str, row)) + "\n"
+                csv_data_string = "\n".join(f"{timestamp:g},{heart_rate}" for timestamp, heart_rate in zip(timestamps.tolist(), heart_rates.tolist()))
 
                 prompt_content = f"""
 这是一份太极式健身跑的心率记录，请分析用户的运动心率数据，数据以 CSV 格式提供，包含时间戳 (秒) 和心率值 (bpm) 两列。
@@ -568,22 +814,25 @@ CSV 格式的心率数据:
                 """
 
                 def call_openai_api(prompt):
+                    metrics.increment("ai_requests_total")
                     try:
-                        response = self.openai_client.chat.completions.create(
-                            model=self.app_settings.get("model", "Qwen/Qwen2.5-7B-Instruct"),
-                            messages=[{'role': 'user', 'content': prompt}],
-                            stream=False
-                        )
+                        with metrics.timer("ai_request_seconds"):
+                            response = self.openai_client.chat.completions.create(
+                                model=self.settings.get_str("model"),
+                                messages=[{'role': 'user', 'content': prompt}],
+                                stream=False
+                            )
                         ai_response_text = response.choices[0].message.content
                         if ai_response_text:
                             display_ai_analysis_result(ai_response_text)
                         else:
                             display_ai_analysis_result("AI 分析未能生成有效结果。")
                     except Exception as api_error:
+                        metrics.increment("ai_request_errors_total")
                         display_ai_analysis_result(f"调用 AI API 出错: {api_error}")
 
                 def display_ai_analysis_result(analysis_text):
-                    detail_window.after(0, lambda text=analysis_text: _update_text(text))
+                    metrics.tk_after(detail_window, _update_text, analysis_text)
 
                 def _update_text(text):
                     self.ai_analysis_text.config(state=tk.NORMAL)
@@ -592,22 +841,24 @@ CSV 格式的心率数据:
                     self.ai_analysis_text.config(state=tk.DISABLED)
 
 
-                threading.Thread(target=call_openai_api, args=(prompt_content,), daemon=True).start()
+                threading.Thread(target=call_openai_api, args=(prompt_content,), name="AIAnalysis", daemon=True).start()
 
                 def on_detail_window_close():
-                    plt.close(fig)
+                    release_detail_resources()
                     detail_window.destroy()
                 detail_window.protocol("WM_DELETE_WINDOW", on_detail_window_close)
 
 
-    def delete_single_history_record_from_detail(self, filename, selected_record_preview, detail_window, selected_index, history_previews):
-        filepath = os.path.join("data", filename)
-
+    def delete_single_history_record_from_detail(self, filename, selected_record_preview, detail_window, history_list, release_detail_resources=None):
         confirm_delete = messagebox.askyesno("确认删除", f"确定要删除记录: {filename} 吗?")
         if confirm_delete:
+            if release_detail_resources:
+                # 删除前释放图表与采样文件映射，否则 Windows 下无法删除被映射的文件
+                release_detail_resources()
             try:
-                os.remove(filepath)
-                history_previews.pop(selected_index)
+                self.session_store.delete(filename)
+                self.user_profiles.remove_session(filename)
+                history_list.remove(filename)
                 messagebox.showinfo("成功", f"记录 {filename} 删除成功。")
                 detail_window.destroy()
 
@@ -618,8 +869,7 @@ CSV 格式的心率数据:
 
 
     def open_settings_window(self):
-        default_lap_distance = self.app_settings.get("default_lap_distance", 200) 
-        SettingsWindow(self, default_lap_distance, self, self.app_settings)
+        SettingsWindow(self, self.settings)
 
 
 